@@ -1,67 +1,3160 @@
-import speech_recognition as sr
-import pyttsx3
 import json
+import math
+import logging
+import logging.handlers
+import atexit
 import re
 import os
 import sqlite3
-from flask import Flask, render_template, request, jsonify
+import string
+from urllib.parse import parse_qsl, urlencode
 import threading
+import importlib
+import importlib.util
 import signal
+import argparse
+import uuid
+import struct
 import sys
 import time
 import queue
+import hashlib
+import hmac
+import ipaddress
+import secrets
+import shutil
+import subprocess
+import tempfile
+import io
+import csv
+import itertools
+from bisect import bisect_left
+from collections import OrderedDict, deque, namedtuple
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+
+
+# Tempo (ms) gasto a importar cada módulo carregado de forma preguiçosa
+IMPORT_TIMINGS = OrderedDict()
+
+
+class LazyModule:
+    """Módulo importado apenas no primeiro acesso a um atributo"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attr):
+        module = self._module
+        if module is None:
+            with self._lock:
+                if self._module is None:
+                    started = time.perf_counter()
+                    self._module = importlib.import_module(self._name)
+                    IMPORT_TIMINGS[self._name] = round((time.perf_counter() - started) * 1000, 2)
+                module = self._module
+        return getattr(module, attr)
+
+
+# Bibliotecas pesadas (áudio, servidor web, pools): só carregadas quando usadas
+sr = LazyModule('speech_recognition')
+pyttsx3 = LazyModule('pyttsx3')
+flask = LazyModule('flask')
+asyncio = LazyModule('asyncio')
+futures = LazyModule('concurrent.futures')
+np = LazyModule('numpy')
+
+
+@lru_cache(maxsize=None)
+def numpy_available():
+    return importlib.util.find_spec('numpy') is not None
+
+
+# Registo não bloqueante: quem regista só coloca o registo numa fila e a
+# thread do QueueListener escreve-o no stdout, fora do caminho dos pedidos.
+log = logging.getLogger('zeus')
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR')
+_log_lock = threading.Lock()
+_log_listener = None
+
+
+def setup_logging(level=None):
+    """Configura o registo do ZEUS (uma única vez por processo).
+
+    O nível vem de ZEUS_LOG_LEVEL (INFO por omissão); em DEBUG aparecem
+    também os detalhes de cada pedido (intenção, SQL, resultados).
+    """
+    global _log_listener
+    with _log_lock:
+        if _log_listener is not None:
+            return
+        records = queue.SimpleQueue()
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        _log_listener = logging.handlers.QueueListener(records, handler)
+        _log_listener.start()
+        atexit.register(_log_listener.stop)
+        log.addHandler(logging.handlers.QueueHandler(records))
+        log.setLevel((level or os.environ.get('ZEUS_LOG_LEVEL') or 'INFO').upper())
+        log.propagate = False
+
+
+# Limites (segundos) dos baldes dos histogramas de latência
+METRIC_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                  0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRIC_HELP = {
+    'zeus_stage_seconds': ('histogram', "Latência de cada etapa (capture, asr, text_to_sql, sql, ranking, tts)"),
+    'zeus_request_seconds': ('histogram', "Latência dos pedidos HTTP por rota"),
+    'zeus_recognition_failures_total': ('counter', "Reconhecimentos de voz falhados, por tipo de erro"),
+    'zeus_intents_total': ('counter', "Comandos interpretados, por tipo de intenção"),
+    'zeus_cache_hits_total': ('counter', "Acertos nas caches"),
+    'zeus_cache_misses_total': ('counter', "Falhas nas caches"),
+    'zeus_sessions_active': ('gauge', "Sessões de gravação abertas"),
+    'zeus_tts_pending': ('gauge', "Pedidos de síntese de voz em espera"),
+    'zeus_tts_dropped_total': ('counter', "Pedidos de síntese descartados (fila cheia)"),
+    'zeus_updates_applied_total': ('counter', "Alterações de disponibilidade/preço aplicadas"),
+    'zeus_updates_pending': ('gauge', "Alterações de disponibilidade/preço em espera"),
+    'zeus_db_connections_in_use': ('gauge', "Conexões SQLite em uso"),
+    'zeus_capture_overflows_total': ('counter', "Elocuções que excederam a duração máxima de captura"),
+    'zeus_vad_endpoints_total': ('counter', "Elocuções terminadas pela deteção de voz"),
+    'zeus_vad_trimmed_seconds_total': ('counter', "Silêncio removido antes do reconhecimento (segundos)"),
+    'zeus_rank_truncated_total': ('counter', "Intenções com mais candidatos do que RANK_MAX_CANDIDATES"),
+}
+
+
+class Histogram:
+    """Contagens por balde (não acumuladas), soma e total de observações"""
+
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(METRIC_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(METRIC_BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        """Limite superior do balde onde cai o quantil q (o último limite se o ultrapassar)"""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(METRIC_BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return METRIC_BUCKETS[-1]
+
+
+class Metrics:
+    """Histogramas de latência e contadores do processo, exportados em /metrics.
+
+    Registar custa um bisect sob um lock; o texto no formato do Prometheus só
+    é gerado quando /metrics é pedido.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(labels.items()))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def stage(self, stage):
+        """Mede uma etapa do pipeline (with METRICS.stage('asr'): ...)"""
+        return self.timer('zeus_stage_seconds', stage=stage)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(labels.items()))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def summary(self):
+        """Contagem, média e p50/p99 (ms) de cada etapa, para /stats"""
+        with self.lock:
+            return {
+                dict(labels)['stage']: {
+                    'count': histogram.count,
+                    'avg_ms': round(histogram.sum / histogram.count * 1000, 3),
+                    'p50_ms': histogram.quantile(0.5) * 1000,
+                    'p99_ms': histogram.quantile(0.99) * 1000,
+                }
+                for (name, labels), histogram in self.histograms.items()
+                if name == 'zeus_stage_seconds' and histogram.count
+            }
+
+    def render(self, samples=()):
+        """Formato de texto do Prometheus; samples junta valores lidos no momento
+        do pedido, como tuplos (nome, etiquetas, valor)"""
+        families = {}
+        with self.lock:
+            for (name, labels), histogram in self.histograms.items():
+                lines = families.setdefault(name, [])
+                cumulative = 0
+                for bound, count in zip(METRIC_BUCKETS + (math.inf,), histogram.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == math.inf else repr(bound)
+                    lines.append(f"{name}_bucket{metric_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{metric_labels(labels)} {histogram.sum!r}")
+                lines.append(f"{name}_count{metric_labels(labels)} {histogram.count}")
+            for (name, labels), value in self.counters.items():
+                families.setdefault(name, []).append(f"{name}{metric_labels(labels)} {value}")
+        for name, labels, value in samples:
+            families.setdefault(name, []).append(f"{name}{metric_labels(tuple(labels.items()))} {value}")
+
+        output = []
+        for name, lines in families.items():
+            kind, help_text = METRIC_HELP.get(name, ('untyped', ''))
+            output.append(f"# HELP {name} {help_text}")
+            output.append(f"# TYPE {name} {kind}")
+            output.extend(lines)
+        return '\n'.join(output) + '\n'
+
+
+def metric_labels(labels):
+    """{a="1",b="2"} com os valores escapados; vazio sem etiquetas"""
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+# Métricas do processo (cada processo de trabalho ASGI tem as suas)
+METRICS = Metrics()
+
+
+# Tabela de normalização de acentos (construída uma única vez)
+ACCENT_MAP = {
+    'á': 'a', 'à': 'a', 'â': 'a', 'ã': 'a',
+    'é': 'e', 'ê': 'e',
+    'í': 'i',
+    'ó': 'o', 'ô': 'o', 'õ': 'o',
+    'ú': 'u', 'ü': 'u',
+    'ç': 'c'
+}
+ACCENT_TABLE = str.maketrans(ACCENT_MAP)
+
+STATION_COLUMNS = 'id, location, address, price, power, available'
+STATION_COLUMNS_QUALIFIED = ', '.join('s.' + column for column in STATION_COLUMNS.split(', '))
+
+
+def normalize_text(text):
+    """Normaliza texto para comparação (minúsculas e sem acentos)"""
+    return text.lower().translate(ACCENT_TABLE)
+
+
+def sql_normalize(expr):
+    """Expressão SQL equivalente a normalize_text (o LOWER do SQLite só trata ASCII)"""
+    for accented, plain in ACCENT_MAP.items():
+        expr = f"REPLACE(REPLACE({expr}, '{accented}', '{plain}'), '{accented.upper()}', '{plain}')"
+    return f"LOWER({expr})"
+
+
+# Versão do esquema gravada em PRAGMA user_version depois das migrações
+SCHEMA_VERSION = 1
+
+# Migrações de esquema idempotentes: coluna calculada com a localização
+# normalizada e índices para as intenções mais comuns
+SCHEMA_COLUMNS = (
+    ('location_norm', f"TEXT GENERATED ALWAYS AS ({sql_normalize('location')}) VIRTUAL"),
+    ('address_norm', f"TEXT GENERATED ALWAYS AS ({sql_normalize('address')}) VIRTUAL"),
+    ('latitude', 'REAL'),
+    ('longitude', 'REAL'),
+)
+
+SCHEMA_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS idx_stations_location_price ON charging_stations (location_norm, price)',
+    'CREATE INDEX IF NOT EXISTS idx_stations_location_power ON charging_stations (location_norm, power DESC)',
+    'CREATE INDEX IF NOT EXISTS idx_stations_available ON charging_stations (location_norm, price) WHERE available = 1',
+    'CREATE INDEX IF NOT EXISTS idx_stations_price ON charging_stations (price)',
+    'CREATE INDEX IF NOT EXISTS idx_stations_power ON charging_stations (power DESC)',
+)
+
+# Índice de texto integral sobre os endereços normalizados. O tokenizer
+# trigram permite encontrar termos dentro de palavras compostas
+# ("LeiriaShopping", "AleShopping") e, como o conteúdo indexado já vem sem
+# acentos, "Fórum" e "forum" são equivalentes. Os triggers mantêm-no
+# sincronizado com charging_stations.
+FTS_TABLE = (
+    "CREATE VIRTUAL TABLE stations_fts USING fts5("
+    "address_norm, content='charging_stations', content_rowid='rowid', tokenize='trigram')"
+)
+
+FTS_TRIGGERS = (
+    '''CREATE TRIGGER IF NOT EXISTS stations_fts_insert AFTER INSERT ON charging_stations BEGIN
+        INSERT INTO stations_fts (rowid, address_norm) VALUES (new.rowid, new.address_norm);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS stations_fts_delete AFTER DELETE ON charging_stations BEGIN
+        INSERT INTO stations_fts (stations_fts, rowid, address_norm) VALUES ('delete', old.rowid, old.address_norm);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS stations_fts_update AFTER UPDATE OF address ON charging_stations BEGIN
+        INSERT INTO stations_fts (stations_fts, rowid, address_norm) VALUES ('delete', old.rowid, old.address_norm);
+        INSERT INTO stations_fts (rowid, address_norm) VALUES (new.rowid, new.address_norm);
+    END''',
+)
+
+# Índice espacial R*Tree com as coordenadas de cada carregador (id = rowid
+# de charging_stations), mantido pelos triggers
+RTREE_TABLE = 'CREATE VIRTUAL TABLE stations_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon)'
+
+RTREE_TRIGGERS = (
+    '''CREATE TRIGGER IF NOT EXISTS stations_rtree_insert AFTER INSERT ON charging_stations
+    WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL BEGIN
+        INSERT OR REPLACE INTO stations_rtree VALUES (new.rowid, new.latitude, new.latitude, new.longitude, new.longitude);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS stations_rtree_delete AFTER DELETE ON charging_stations BEGIN
+        DELETE FROM stations_rtree WHERE id = old.rowid;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS stations_rtree_update AFTER UPDATE OF latitude, longitude ON charging_stations BEGIN
+        DELETE FROM stations_rtree WHERE id = old.rowid;
+        INSERT INTO stations_rtree SELECT new.rowid, new.latitude, new.latitude, new.longitude, new.longitude
+        WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+    END''',
+)
+
+# Coordenadas aproximadas dos carregadores da carga inicial
+SEED_COORDINATES = {
+    'MOBI-LIS-001': (38.7206, -9.1455), 'MOBI-LIS-002': (38.7292, -9.1530),
+    'MOBI-LIS-003': (38.7232, -9.1616), 'MOBI-LIS-004': (38.7633, -9.0950),
+    'MOBI-LIS-005': (38.7540, -9.1885),
+    'MOBI-POR-001': (41.1483, -8.6064), 'MOBI-POR-002': (41.1620, -8.6030),
+    'MOBI-POR-003': (41.1580, -8.6340), 'MOBI-POR-004': (41.1530, -8.6380),
+    'MOBI-POR-005': (41.2370, -8.6700),
+    'MOBI-MAT-001': (41.1830, -8.6930), 'MOBI-MAT-002': (41.1770, -8.6880),
+    'MOBI-MAT-003': (41.1850, -8.6880), 'MOBI-MAT-004': (41.1690, -8.6770),
+    'MOBI-COI-001': (40.2090, -8.4290), 'MOBI-COI-002': (40.2140, -8.4330),
+    'MOBI-COI-003': (40.1860, -8.4160), 'MOBI-COI-004': (40.2110, -8.4400),
+    'MOBI-BRG-001': (41.5510, -8.4220), 'MOBI-BRG-002': (41.5500, -8.4250),
+    'MOBI-BRG-003': (41.5560, -8.4060), 'MOBI-BRG-004': (41.5610, -8.3970),
+    'MOBI-AVE-001': (40.6420, -8.6520), 'MOBI-AVE-002': (40.6410, -8.6530),
+    'MOBI-AVE-003': (40.6310, -8.6590),
+    'MOBI-FAR-001': (37.0170, -7.9350), 'MOBI-FAR-002': (37.0140, -7.9710),
+    'MOBI-FAR-003': (37.0270, -7.9460),
+    'MOBI-EVO-001': (38.5710, -7.9090), 'MOBI-EVO-002': (38.5730, -7.9050),
+    'MOBI-EVO-003': (38.5600, -7.9200),
+    'MOBI-SET-001': (38.5220, -8.8920), 'MOBI-SET-002': (38.5300, -8.8800),
+    'MOBI-LEI-001': (39.7440, -8.8070), 'MOBI-LEI-002': (39.7580, -8.8080),
+    'MOBI-VIS-001': (40.6570, -7.9130), 'MOBI-VIS-002': (40.6480, -7.9290),
+}
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE_LAT = 111.32
+
+# Raio inicial e máximo (km) da pesquisa expansiva do carregador mais próximo
+NEAREST_START_RADIUS_KM = 5.0
+NEAREST_MAX_RADIUS_KM = 2000.0
+
+NEAREST_SQL = (
+    f'SELECT {STATION_COLUMNS_QUALIFIED}, s.latitude, s.longitude '
+    'FROM stations_rtree r JOIN charging_stations s ON s.rowid = r.id '
+    'WHERE r.min_lat <= ? AND r.max_lat >= ? AND r.min_lon <= ? AND r.max_lon >= ? '
+    'AND s.available = 1 AND s.power >= ? AND s.price <= ?'
+)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distância em km entre dois pontos (lat/lon em graus)"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def row_to_station(row):
+    """Converte uma linha da tabela charging_stations num dicionário"""
+    return {
+        'id': row[0],
+        'location': row[1],
+        'address': row[2],
+        'price': row[3],
+        'power': row[4],
+        'available': bool(row[5])
+    }
+
+
+KNOWN_CITIES = {
+    normalize_text(city): city
+    for city in ('Lisboa', 'Porto', 'Matosinhos', 'Coimbra', 'Braga', 'Aveiro',
+                 'Faro', 'Évora', 'Setúbal', 'Leiria', 'Viseu')
+}
+
+# Intenção estruturada extraída de um comando de voz
+#   city   - cidade (nome canónico se conhecida) ou None
+#   sort   - coluna de ordenação ('price' ou 'power')
+#   limit  - número máximo de resultados (None = todos)
+#   min_kw - potência mínima pedida em kW, ou None
+#   poi    - categoria de ponto de interesse ('universidade', 'shopping', 'aeroporto') ou None
+# profile: perfil de pesos usado na ordenação multicritério (RANKING_PROFILES)
+# charge: pedido de estimativa de carregamento (ChargeRequest) ou None
+Intent = namedtuple('Intent', ['city', 'sort', 'limit', 'min_kw', 'poi', 'profile', 'charge'],
+                    defaults=('balanced', None))
+
+# Carregamento a estimar; campos não indicados ficam None (valores por omissão)
+#   energy_kwh - energia a carregar
+#   soc, target_soc - estado de carga inicial e final, em %
+#   battery_kwh - capacidade da bateria
+#   vehicle_kw - potência máxima de carga aceite pelo veículo
+ChargeRequest = namedtuple('ChargeRequest', ['energy_kwh', 'soc', 'target_soc', 'battery_kwh', 'vehicle_kw'],
+                           defaults=(None,) * 5)
+
+# Termos de endereço associados a cada categoria de ponto de interesse
+POI_TERMS = {
+    'universidade': ('universidade', 'campus', 'faculdade', 'polo'),
+    'shopping': ('shopping', 'forum', 'centro comercial', 'plaza'),
+    'aeroporto': ('aeroporto', 'airport'),
+}
+
+
+def fts_query(terms):
+    """Expressão MATCH do FTS5 (OR de termos entre aspas)"""
+    return ' OR '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+# Expressões MATCH de cada categoria, construídas uma única vez
+POI_QUERIES = {poi: fts_query(terms) for poi, terms in POI_TERMS.items()}
+
+# Gramática de intenções compilada uma única vez. Aplica-se ao comando já
+# normalizado (sem acentos), numa só passagem com finditer. A alternativa das
+# preposições usa lookahead para não consumir a palavra seguinte, que volta a
+# ser classificada pelas restantes alternativas.
+INTENT_RE = re.compile(r"""
+      \bbateria\s+(?:de\s+)?(?P<battery>\d+(?:[.,]\d+)?)\s*kwh\b
+    | \b(?:carro|veiculo|viatura)\b\D{0,30}?(?P<vehicle>\d+)\s*kw\b
+    | (?P<kwh>\d+(?:[.,]\d+)?)\s*(?:kwh|(?:kilo|quilo)watts?[\s-]hora)\b
+    | \b(?:ate|para)\s+(?P<target>\d{1,3})\s*(?:%|por\s+cento)
+    | (?P<soc>\d{1,3})\s*(?:%|por\s+cento)
+    | \b(?P<estimate>quanto\s+(?:custa|custaria|tempo|demora)|custo|preco\s+de\s+carregar|estimativa)\b
+    | (?P<kw>\d+)\s*(?:kw|kilowatts?|quilowatts?)\b
+    | \b(?P<cheap>barato|economico|menor\s+preco)\b
+    | \b(?P<fast>rapido|potente|alta\s+potencia)\b
+    | \b(?P<best>melhor|bom)\b
+    | \b(?P<universidade>universidade|campus|faculdade)\b
+    | \b(?P<shopping>shopping|centro\s+comercial|mall|forum)\b
+    | \b(?P<aeroporto>aeroporto|airport)\b
+    | \b(?:em|no|na|de|para|do|da)\s+(?=(?P<place>[^\W\d]\w*))
+    | (?P<word>\w+)
+""", re.VERBOSE)
+
+# Grupos da gramática que preenchem o pedido de estimativa de carregamento
+CHARGE_GROUPS = {
+    'kwh': 'energy_kwh',
+    'soc': 'soc',
+    'target': 'target_soc',
+    'battery': 'battery_kwh',
+    'vehicle': 'vehicle_kw',
+}
+
+# Palavras que nunca são interpretadas como nome de cidade
+NON_PLACE_WORDS = frozenset((
+    'carregador', 'carregadores', 'posto', 'postos', 'carregamento', 'mais', 'um', 'uma',
+    'o', 'a', 'os', 'as', 'barato', 'economico', 'rapido', 'potente', 'melhor', 'bom',
+    'universidade', 'campus', 'faculdade', 'shopping', 'mall', 'forum', 'aeroporto',
+    'airport', 'menor', 'alta', 'preco', 'potencia', 'carregar', 'carro', 'bateria', 'quanto',
+    'custa', 'custo', 'tempo',
+))
+
+# Nomes comuns de endereços: nem eles nem o que os segue ("avenida da
+# liberdade", "centro de saude") são o nome de uma cidade
+PLACE_NOUNS = frozenset((
+    'avenida', 'av', 'rua', 'praca', 'largo', 'travessa', 'estrada', 'alameda', 'rotunda',
+    'centro', 'estacao', 'hospital', 'parque', 'bairro', 'zona', 'quinta', 'urbanizacao',
+))
+
+# Palavras ignoradas na pesquisa livre de endereços
+FREE_TEXT_STOPWORDS = frozenset((
+    'carregador', 'carregadores', 'posto', 'postos', 'carregamento', 'mais', 'uma',
+    'para', 'perto', 'onde', 'quero', 'qual', 'com', 'dos', 'das', 'nos', 'nas',
+))
+
+
+def parse_intent(command):
+    """Converte um comando em linguagem natural numa Intent estruturada"""
+    text = normalize_text(command.strip())
+    features = set()
+    min_kw = None
+    poi = None
+    city = None
+    place = None
+    words = []
+    word_starts = set()
+    last_word = (None, -1)
+    place_candidates = []
+    charge = {}
+
+    for match in INTENT_RE.finditer(text):
+        group = match.lastgroup
+        if group == 'word':
+            word = match.group('word')
+            words.append(word)
+            word_starts.add(match.start())
+            last_word = (word, match.end())
+            if city is None and word in KNOWN_CITIES:
+                city = KNOWN_CITIES[word]
+        elif group == 'place':
+            # Decidido no fim: o nome pode ser apanhado por outra característica
+            word, end = last_word
+            after_noun = word in PLACE_NOUNS and not text[end:match.start()].strip()
+            place_candidates.append((match.start('place'), match.group('place'), after_noun))
+        elif group == 'kw':
+            if min_kw is None:
+                min_kw = int(match.group('kw'))
+        elif group in CHARGE_GROUPS:
+            field = CHARGE_GROUPS[group]
+            if group == 'soc' and 'soc' in charge:
+                # Segunda percentagem ("de 20% a 80%"): estado de carga final
+                field = 'target_soc'
+            charge.setdefault(field, float(match.group(group).replace(',', '.')))
+        elif group in POI_TERMS:
+            poi = poi or group
+        else:
+            features.add(group)
+
+    for start, candidate, after_noun in place_candidates:
+        if (start in word_starts and not after_noun
+                and candidate not in NON_PLACE_WORDS and candidate not in PLACE_NOUNS):
+            place = candidate
+            break
+
+    if city is None:
+        if place is not None:
+            city = place
+        elif len(words) == 1 and not features and not poi and min_kw is None:
+            # Busca genérica por cidade ("porto")
+            city = words[0]
+
+    # Energia ou percentagens indicadas, ou "quanto custa": estimativa de carregamento
+    charge = ChargeRequest(**charge) if charge or 'estimate' in features else None
+
+    # Precedência: potência mínima > preço > potência > melhor
+    if min_kw is not None:
+        return Intent(city, 'price', None, min_kw, poi, 'cheap', charge)
+    if 'cheap' in features:
+        return Intent(city, 'price', 1, None, poi, 'cheap', charge)
+    if 'fast' in features:
+        return Intent(city, 'power', 1, None, poi, 'fast', charge)
+    if 'best' in features:
+        return Intent(city, 'price', 1, None, poi, charge=charge)
+    if city is None and poi is None:
+        # Fallback: busca genérica
+        return Intent(None, 'price', 5, None, None, charge=charge)
+    return Intent(city, 'price', None, None, poi, charge=charge)
+
+
+# Plano de execução: SQL fixo com placeholders e os valores a associar
+QueryPlan = namedtuple('QueryPlan', ['sql', 'params'])
+
+CANONICAL_CITIES = frozenset(KNOWN_CITIES.values())
+
+
+@lru_cache(maxsize=None)
+def plan_sql(city_match, has_min_kw, poi, sort, has_limit, with_coordinates=False):
+    """Devolve o texto SQL (com '?') de uma forma de intenção.
+
+    O conjunto de textos possíveis é pequeno e fixo, pelo que o SQLite
+    reutiliza as instruções preparadas através da cache da conexão.
+    Intenções com ponto de interesse são resolvidas pelo índice FTS5 dos
+    endereços e ordenadas por relevância (BM25).
+    """
+    conditions = []
+    if poi:
+        conditions.append('stations_fts MATCH ?')
+    if city_match == 'equal':
+        conditions.append('s.location_norm = ?')
+    elif city_match == 'prefix':
+        conditions.append('s.location_norm >= ? AND s.location_norm < ?')
+    if has_min_kw:
+        conditions.append('s.power >= ?')
+
+    columns = STATION_COLUMNS_QUALIFIED
+    if with_coordinates:
+        columns += ', s.latitude, s.longitude'
+    sql_query = f'SELECT {columns} FROM charging_stations s'
+    if poi:
+        sql_query += ' JOIN stations_fts ON stations_fts.rowid = s.rowid'
+    if conditions:
+        sql_query += ' WHERE ' + ' AND '.join(conditions)
+
+    order = 's.power DESC' if sort == 'power' else 's.price ASC'
+    if poi:
+        # Superlativos ("o mais barato no shopping") ordenam primeiro pelo critério pedido
+        order = f'{order}, bm25(stations_fts)' if has_limit else f'bm25(stations_fts), {order}'
+    sql_query += f' ORDER BY {order}'
+    if has_limit:
+        sql_query += ' LIMIT ?'
+    return sql_query
+
+
+def intent_to_plan(intent, with_coordinates=False):
+    """Converte uma Intent num QueryPlan parametrizado"""
+    params = []
+    if intent.poi:
+        params.append(POI_QUERIES[intent.poi])
+    if not intent.city:
+        city_match = None
+    elif intent.city in CANONICAL_CITIES:
+        # Cidade conhecida: igualdade na coluna normalizada (indexada)
+        city_match = 'equal'
+        params.append(normalize_text(intent.city))
+    else:
+        # Cidade desconhecida: intervalo de prefixo, também resolvido pelo índice
+        city_match = 'prefix'
+        prefix = normalize_text(intent.city)
+        params.extend((prefix, prefix + '\uffff'))
+    if intent.min_kw is not None:
+        params.append(intent.min_kw)
+    if intent.limit:
+        params.append(intent.limit)
+
+    sql_query = plan_sql(city_match, intent.min_kw is not None, intent.poi,
+                         intent.sort, bool(intent.limit), with_coordinates)
+    return QueryPlan(sql_query, tuple(params))
+
+
+def intent_cache_tags(intent):
+    """Etiquetas de cache: intenções numa cidade conhecida só dependem dela"""
+    if intent.city in CANONICAL_CITIES:
+        return (('city', normalize_text(intent.city)),)
+    return (CACHE_GLOBAL_TAG,)
+
+
+# Estimativa de carregamento. A potência aceite pela bateria desce perto do
+# fim da carga, mais cedo e mais depressa nos carregadores de maior potência:
+# cada classe de potência tem uma curva (fração da potência nominal em função
+# do estado de carga), integrada uma única vez em tabelas de 1% de SoC.
+#   (limite superior da classe em kW, SoC onde a potência começa a descer,
+#    fração da potência que resta a 100%)
+CHARGE_POWER_CLASSES = (
+    (22.0, 95.0, 0.5),           # AC
+    (50.0, 80.0, 0.3),           # DC
+    (150.0, 75.0, 0.2),          # DC rápido
+    (float('inf'), 60.0, 0.15),  # DC ultrarrápido
+)
+CHARGE_CLASS_LIMITS = tuple(limit for limit, _, _ in CHARGE_POWER_CLASSES)
+CHARGE_EFFICIENCY = 0.9
+CHARGE_BATTERY_KWH = 60.0
+CHARGE_VEHICLE_MAX_KW = 150.0
+CHARGE_START_SOC = 20.0
+CHARGE_TARGET_SOC = 80.0
+
+# Carregamento concreto, depois de aplicados os valores por omissão
+ChargeWindow = namedtuple('ChargeWindow', ['energy_kwh', 'soc', 'target_soc', 'battery_kwh', 'vehicle_kw'])
+
+
+@lru_cache(maxsize=None)
+def charge_curve_table():
+    """Tempo acumulado até cada % de SoC, por classe de potência.
+
+    table[c][k] é o tempo (h) para levar 1 kWh de bateria de 0 a k% a 1 kW
+    nominal; o tempo real é battery_kwh * (table[c][alvo] - table[c][inicio]) / kW.
+    """
+    table = []
+    for _, knee, floor in CHARGE_POWER_CLASSES:
+        cumulative = [0.0]
+        for step in range(100):
+            soc = step + 0.5
+            fraction = 1.0 if soc <= knee else 1.0 - (1.0 - floor) * (soc - knee) / (100.0 - knee)
+            cumulative.append(cumulative[-1] + 0.01 / fraction)
+        table.append(tuple(cumulative))
+    return tuple(table)
+
+
+@lru_cache(maxsize=1024)
+def charge_curve_deltas(soc, target_soc):
+    """Diferença das tabelas entre dois estados de carga, para cada classe"""
+    def at(row, value):
+        low = min(int(value), 99)
+        return row[low] + (row[low + 1] - row[low]) * (value - low)
+    return tuple(at(row, target_soc) - at(row, soc) for row in charge_curve_table())
+
+
+def charge_window(charge):
+    """Aplica os valores por omissão a um ChargeRequest.
+
+    Com energia indicada, o estado final resulta da energia; sem capacidade
+    nem estado inicial indicados, a bateria assumida cresce o necessário para
+    a receber.
+    """
+    soc = CHARGE_START_SOC if charge.soc is None else charge.soc
+    battery_kwh = charge.battery_kwh or CHARGE_BATTERY_KWH
+    if charge.energy_kwh:
+        energy_kwh = charge.energy_kwh
+        if charge.battery_kwh is None and charge.soc is None:
+            battery_kwh = max(battery_kwh, energy_kwh * 100.0 / (100.0 - soc))
+        target_soc = soc + energy_kwh * 100.0 / battery_kwh
+    else:
+        target_soc = CHARGE_TARGET_SOC if charge.target_soc is None else charge.target_soc
+        energy_kwh = battery_kwh * (target_soc - soc) / 100.0
+    if not 0 <= soc < target_soc <= 100 + 1e-9:
+        raise ValueError(f"Carregamento impossível: de {soc:g}% a {target_soc:g}% "
+                         f"numa bateria de {battery_kwh:g} kWh")
+    return ChargeWindow(energy_kwh, soc, min(target_soc, 100.0), battery_kwh,
+                        charge.vehicle_kw or CHARGE_VEHICLE_MAX_KW)
+
+
+def estimate_charging(power, price, window):
+    """Duração (minutos) e custo (euros) estimados do carregamento.
+
+    power e price podem ser arrays NumPy (todos os candidatos numa só
+    passagem, sem ciclos em Python) ou números de um único posto.
+    """
+    deltas = charge_curve_deltas(window.soc, window.target_soc)
+    if isinstance(power, (int, float)):
+        effective_kw = max(min(power, window.vehicle_kw), 0.1)
+        delta = deltas[bisect_left(CHARGE_CLASS_LIMITS, effective_kw)]
+    else:
+        effective_kw = np.maximum(np.minimum(power, window.vehicle_kw), 0.1)
+        delta = np.asarray(deltas)[np.searchsorted(CHARGE_CLASS_LIMITS, effective_kw)]
+    minutes = 60.0 * window.battery_kwh * delta / (effective_kw * CHARGE_EFFICIENCY)
+    # Paga-se a energia entregue pelo posto, incluindo as perdas
+    euros = window.energy_kwh / CHARGE_EFFICIENCY * price
+    return minutes, euros
+
+
+def format_duration(minutes):
+    """Duração legível para a resposta falada"""
+    hours, minutes = divmod(max(int(round(minutes)), 1), 60)
+    text = f"{minutes} minuto" + ('s' if minutes > 1 else '')
+    if not hours:
+        return text
+    hours = f"{hours} hora" + ('s' if hours > 1 else '')
+    return f"{hours} e {text}" if minutes else hours
+
+
+def format_range(low, high, fmt):
+    """'X' ou 'entre X e Y' conforme os valores difiram na forma apresentada"""
+    low, high = fmt(low), fmt(high)
+    return low if low == high else f"entre {low} e {high}"
+
+
+# Ordenação multicritério: pesos de cada critério por perfil. Critérios sem
+# dados (distância sem origem, tempo de carga sem energia pedida) são
+# ignorados e os restantes pesos renormalizados.
+RANK_CRITERIA = ('price', 'power', 'availability', 'distance', 'charge_time')
+
+RANKING_PROFILES = {
+    'cheap': {'price': 0.45, 'power': 0.05, 'availability': 0.35, 'distance': 0.15, 'charge_time': 0.0},
+    'fast': {'price': 0.05, 'power': 0.35, 'availability': 0.35, 'distance': 0.10, 'charge_time': 0.15},
+    'balanced': {'price': 0.25, 'power': 0.20, 'availability': 0.35, 'distance': 0.15, 'charge_time': 0.05},
+    'nearby': {'price': 0.10, 'power': 0.05, 'availability': 0.35, 'distance': 0.50, 'charge_time': 0.0},
+}
+
+# Superlativos ("o mais barato", "o mais rápido"): o critério do perfil é a
+# chave principal (depois da disponibilidade) e a pontuação só desempata
+SUPERLATIVE_KEYS = {'cheap': 'price', 'fast': 'power'}
+
+# Candidatos pontuados por intenção, já cortados pela ordem do SQL (preço ou
+# potência). Acima deste número a ordenação é aproximada: com origem ou
+# energia pedida, o posto mais próximo ou de carga mais rápida pode ficar de
+# fora se não estiver entre os primeiros pela ordem do SQL
+RANK_MAX_CANDIDATES = 20000
+RANK_DISTANCE_SCALE_KM = 10.0   # a esta distância o critério vale metade
+
+
+class CandidateSet:
+    """Candidatos de uma intenção em arrays NumPy, prontos a pontuar"""
+
+    def __init__(self, rows):
+        count = len(rows)
+        self.stations = [row_to_station(row) for row in rows]
+        self.price = np.fromiter((row[3] for row in rows), dtype=float, count=count)
+        self.power = np.fromiter((row[4] for row in rows), dtype=float, count=count)
+        self.available = np.fromiter((bool(row[5]) for row in rows), dtype=float, count=count)
+        self.latitude = np.fromiter((row[6] if row[6] is not None else np.nan for row in rows),
+                                    dtype=float, count=count)
+        self.longitude = np.fromiter((row[7] if row[7] is not None else np.nan for row in rows),
+                                     dtype=float, count=count)
+
+    def __len__(self):
+        return len(self.stations)
+
+
+def normalized(values, higher_is_better=True):
+    """Escala min-max para [0, 1] (todos iguais: 1)"""
+    low, high = values.min(), values.max()
+    if high == low:
+        return np.ones_like(values)
+    scaled = (values - low) / (high - low)
+    return scaled if higher_is_better else 1.0 - scaled
+
+
+def superlative_key(intent):
+    """Critério principal de uma intenção superlativa ('price'/'power'), ou None"""
+    if intent.limit == 1 and intent.min_kw is None:
+        return SUPERLATIVE_KEYS.get(intent.profile)
+    return None
+
+
+def rank_candidates(candidates, profile='balanced', origin=None, window=None, limit=5, primary=None):
+    """Os limit melhores candidatos, com a pontuação e o contributo de cada critério.
+
+    Com window (ChargeWindow), pontua também o tempo de carga e junta a cada
+    resultado a duração e o custo estimados. Com primary ('price' ou 'power'),
+    esse critério ordena primeiro e a pontuação só desempata.
+    """
+    if not len(candidates):
+        return []
+    weights = dict(RANKING_PROFILES[profile])
+    scores = {
+        'price': normalized(candidates.price, higher_is_better=False),
+        'power': normalized(candidates.power),
+        'availability': candidates.available,
+    }
+    distance = None
+    if origin is not None:
+        lat, lon = np.radians(origin[0]), np.radians(origin[1])
+        lats, lons = np.radians(candidates.latitude), np.radians(candidates.longitude)
+        a = (np.sin((lats - lat) / 2) ** 2
+             + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2)
+        distance = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+        # Sem coordenadas: pior pontuação de distância
+        scores['distance'] = np.nan_to_num(1.0 / (1.0 + distance / RANK_DISTANCE_SCALE_KM), nan=0.0)
+    else:
+        weights['distance'] = 0.0
+    minutes = None
+    if window is not None:
+        minutes, euros = estimate_charging(candidates.power, candidates.price, window)
+        scores['charge_time'] = minutes.min() / minutes
+    else:
+        weights['charge_time'] = 0.0
+
+    total = sum(weights.values())
+    active = [(criterion, weights[criterion] / total) for criterion in RANK_CRITERIA if weights[criterion]]
+    contributions = {criterion: weight * scores[criterion] for criterion, weight in active}
+    score = sum(contributions.values())
+    # Os livres vêm sempre antes dos ocupados (por mais baratos que estes sejam);
+    # dentro de cada grupo, pelo critério principal (se houver) e pela
+    # pontuação. lexsort é estável: em empate mantém-se a ordem do SQL
+    keys = [-score]
+    if primary == 'price':
+        keys.append(candidates.price)
+    elif primary == 'power':
+        keys.append(-candidates.power)
+    order = np.lexsort((*keys, -candidates.available))[:limit]
+
+    ranked = []
+    for i in order:
+        station = dict(candidates.stations[i])
+        station['score'] = round(float(score[i]), 4)
+        station['breakdown'] = {criterion: round(float(values[i]), 4)
+                                for criterion, values in contributions.items()}
+        if distance is not None and not np.isnan(distance[i]):
+            station['distance_km'] = round(float(distance[i]), 3)
+        if minutes is not None:
+            station['charge_minutes'] = round(float(minutes[i]), 1)
+            station['charge_cost'] = round(float(euros[i]), 2)
+        ranked.append(station)
+    return ranked
+
+
+class ConnectionManager:
+    """Pool limitado de conexões SQLite persistentes, partilhado pelas threads do Flask"""
+
+    PRAGMAS = (
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        'PRAGMA mmap_size=268435456',   # 256 MB de I/O mapeado em memória
+        'PRAGMA cache_size=-16000',     # ~16 MB de cache de páginas por conexão
+        'PRAGMA temp_store=MEMORY',
+    )
+
+    def __init__(self, db_path, max_connections=8, timeout=5.0):
+        self.db_path = db_path
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.pool = queue.LifoQueue()
+        self.lock = threading.Lock()
+        self.opened = 0
+        self.metrics = {
+            'acquires': 0,
+            'connections_opened': 0,
+            'acquire_time_total': 0.0,
+            'acquire_time_max': 0.0,
+            'open_time_total': 0.0,
+        }
+
+    def open_connection(self):
+        """Abre uma nova conexão já configurada com os PRAGMAs do pool"""
+        start = time.perf_counter()
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=256)
+        for pragma in self.PRAGMAS:
+            conn.execute(pragma)
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.metrics['connections_opened'] += 1
+            self.metrics['open_time_total'] += elapsed
+        return conn
+
+    def acquire(self):
+        start = time.perf_counter()
+        try:
+            conn = self.pool.get_nowait()
+        except queue.Empty:
+            with self.lock:
+                can_open = self.opened < self.max_connections
+                if can_open:
+                    self.opened += 1
+            if can_open:
+                try:
+                    conn = self.open_connection()
+                except Exception:
+                    with self.lock:
+                        self.opened -= 1
+                    raise
+            else:
+                try:
+                    conn = self.pool.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise Exception("Timeout ao obter conexão à base de dados")
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.metrics['acquires'] += 1
+            self.metrics['acquire_time_total'] += elapsed
+            self.metrics['acquire_time_max'] = max(self.metrics['acquire_time_max'], elapsed)
+        return conn
+
+    def release(self, conn):
+        self.pool.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Empresta uma conexão do pool; faz commit/rollback no fim"""
+        conn = self.acquire()
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self.release(conn)
+
+    def get_metrics(self):
+        """Métricas de aquisição de conexões (tempos em milissegundos)"""
+        with self.lock:
+            metrics = dict(self.metrics)
+            metrics['pool_size'] = self.opened
+            metrics['idle'] = self.pool.qsize()
+        acquires = metrics['acquires'] or 1
+        metrics['acquire_time_avg_ms'] = metrics['acquire_time_total'] / acquires * 1000
+        metrics['acquire_time_max_ms'] = metrics.pop('acquire_time_max') * 1000
+        metrics['acquire_time_total_ms'] = metrics.pop('acquire_time_total') * 1000
+        metrics['open_time_total_ms'] = metrics.pop('open_time_total') * 1000
+        return metrics
+
+    def close_all(self):
+        """Fecha todas as conexões inativas do pool"""
+        while True:
+            try:
+                conn = self.pool.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self.lock:
+                self.opened -= 1
+
+
+# Etiqueta das entradas da cache que podem depender de qualquer carregador
+CACHE_GLOBAL_TAG = 'global'
+
+
+class ResultCache:
+    """Cache LRU limitada com TTL para resultados de pesquisa.
+
+    Cada entrada tem etiquetas (ex.: ('city', 'lisboa')) que permitem invalidar
+    só as entradas afetadas por uma alteração, em vez de limpar a cache toda.
+    """
+
+    MISSING = object()
+
+    def __init__(self, maxsize=1024, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.tags = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.tag_invalidations = 0
+
+    def get(self, key):
+        """Devolve o valor guardado ou ResultCache.MISSING"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return self.MISSING
+            value, expires_at, _ = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return self.MISSING
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, tags=(CACHE_GLOBAL_TAG,)):
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (value, time.monotonic() + self.ttl, tags)
+            for tag in tags:
+                self.tags.setdefault(tag, set()).add(key)
+            while len(self.entries) > self.maxsize:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, _, tags = self.entries.pop(key)
+        for tag in tags:
+            keys = self.tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tags[tag]
+
+    def invalidate_tags(self, tags):
+        """Remove apenas as entradas com alguma das etiquetas"""
+        with self.lock:
+            for tag in tags:
+                for key in self.tags.pop(tag, ()):
+                    if key in self.entries:
+                        self._remove(key)
+                        self.tag_invalidations += 1
+
+    def clear(self):
+        """Invalida todas as entradas (chamado quando a tabela muda)"""
+        with self.lock:
+            self.entries.clear()
+            self.tags.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'tag_invalidations': self.tag_invalidations,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Textos das respostas (web, consola e API), compilados uma única vez
+RESPONSE_TEMPLATES = {
+    'cheap': ("O carregador mais barato encontrado está em {location}, localizado em {address}, "
+              "com um preço de {price} euros por kWh"),
+    'fast': ("O carregador mais rápido encontrado está em {location}, localizado em {address}, "
+             "com {power} kW de potência e preço de {price} euros por kWh"),
+    'universidade': ("Encontrei um carregador na universidade em {location}, localizado em {address}, "
+                     "com preço de {price} euros por kWh"),
+    'shopping': ("Encontrei um carregador no shopping em {location}, localizado em {address}, "
+                 "com preço de {price} euros por kWh"),
+    'aeroporto': ("Encontrei um carregador no aeroporto em {location}, localizado em {address}, "
+                  "com preço de {price} euros por kWh"),
+    'best': ("O melhor carregador encontrado está em {location}, localizado em {address}, "
+             "com um preço de {price} euros por kWh"),
+    'estimate': ("Carregar {energy} kWh, de {soc}% a {target_soc}%,{where} custa {cost} euros "
+                 "e demora {duration}. A melhor opção está em {location}, localizado em {address}, "
+                 "com {power} kW: {charge_cost} euros e cerca de {charge_duration}"),
+    'not_found': "Desculpe, não encontrei nenhum carregador que corresponda ao seu pedido",
+    'empty_command': "Por favor, diga um comando válido",
+    'error': "Erro ao processar comando: {error}",
+}
+
+RESPONSE_CACHE_SIZE = 4096
+# A chave inclui todos os valores usados, pelo que o texto nunca fica desatualizado
+RESPONSE_CACHE_TTL = 24 * 3600.0
+
+
+class ResponseRenderer:
+    """Texto das respostas a partir da intenção e do resultado estruturados.
+
+    Cada modelo é compilado no arranque (format_map e campos usados); os
+    textos gerados ficam numa cache LRU comum à web, à consola e à API,
+    indexada pelo modelo e pelos valores dos seus campos.
+    """
+
+    def __init__(self, templates=RESPONSE_TEMPLATES, cache_size=RESPONSE_CACHE_SIZE):
+        formatter = string.Formatter()
+        self.templates = {
+            name: (template.format_map,
+                   tuple(field for _, field, _, _ in formatter.parse(template) if field))
+            for name, template in templates.items()
+        }
+        self.cache = ResultCache(maxsize=cache_size, ttl=RESPONSE_CACHE_TTL)
+
+    def render(self, name, values=None):
+        render, fields = self.templates[name]
+        if not fields:
+            return render({})
+        key = (name,) + tuple(values[field] for field in fields)
+        text = self.cache.get(key)
+        if text is ResultCache.MISSING:
+            text = render(values)
+            self.cache.put(key, text, ())
+        return text
+
+    def template_for(self, intent):
+        """Modelo da resposta: superlativos primeiro, depois o ponto de interesse"""
+        if intent.profile == 'cheap' and intent.min_kw is None:
+            return 'cheap'
+        if intent.sort == 'power':
+            return 'fast'
+        return intent.poi or 'best'
+
+    def charger(self, intent, station):
+        """Resposta para o carregador escolhido (None: nada encontrado)"""
+        if station is None:
+            return self.render('not_found')
+        return self.render(self.template_for(intent), station)
+
+    def batch(self, intent, stations):
+        """Uma resposta por resultado, com o mesmo modelo"""
+        name = self.template_for(intent)
+        return [self.render(name, station) for station in stations]
+
+    def estimate(self, intent, estimate):
+        """Resposta a um pedido de estimativa de carregamento"""
+        charge, cost, minutes, best = estimate['charge'], estimate['cost'], estimate['minutes'], estimate['best']
+        return self.render('estimate', {
+            'energy': f"{round(charge['energy_kwh'], 1):g}",
+            'soc': f"{charge['soc']:.0f}",
+            'target_soc': f"{charge['target_soc']:.0f}",
+            'where': f" em {intent.city}" if intent.city else '',
+            'cost': format_range(cost['min'], cost['max'], '{:.2f}'.format),
+            'duration': format_range(minutes['min'], minutes['max'], format_duration),
+            'location': best['location'],
+            'address': best['address'],
+            'power': best['power'],
+            'charge_cost': f"{best['charge_cost']:.2f}",
+            'charge_duration': format_duration(best['charge_minutes']),
+        })
+
+    def stats(self):
+        return self.cache.stats()
+
+
+class StationIndex:
+    """Índice em memória dos carregadores, por localização normalizada e por id"""
+
+    def __init__(self, db):
+        self.db = db
+        self.by_location = {}
+        self.by_id = {}
+        self.lock = threading.Lock()
+        # Funções chamadas sempre que o índice é recarregado (ex.: invalidar caches)
+        self.listeners = []
+        # Conexão dedicada apenas para detetar alterações na tabela
+        self._version_conn = db.open_connection()
+        self._data_version = None
+
+    def _current_version(self):
+        return self._version_conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def load(self, conn=None):
+        """(Re)carrega o índice completo a partir da base de dados.
+
+        Com conn, usa essa conexão em vez de pedir outra ao pool (quem já tem
+        uma, como os pedidos em lote, não fica à espera de uma segunda).
+        """
+        with self.lock:
+            by_location = {}
+            by_id = {}
+            with self.db.connection() if conn is None else nullcontext(conn) as conn:
+                for row in conn.execute(f'SELECT {STATION_COLUMNS} FROM charging_stations'):
+                    station = row_to_station(row)
+                    by_id[station['id']] = station
+                    by_location.setdefault(normalize_text(station['location']), []).append(station)
+            self.by_location = by_location
+            self.by_id = by_id
+            self._data_version = self._current_version()
+        log.info("📇 Índice de carregadores carregado (%d carregadores)", len(by_id))
+        for listener in self.listeners:
+            listener()
+
+    def apply_updates(self, updates):
+        """Aplica alterações já gravadas ({id: campos}) sem recarregar o índice.
+
+        Os dicionários são substituídos (não alterados), pelo que quem já os
+        recebeu continua a ver um estado consistente. Devolve as localizações
+        normalizadas afetadas.
+        """
+        with self.lock:
+            changed = {}
+            for station_id, fields in updates.items():
+                station = self.by_id.get(station_id)
+                if station is not None:
+                    changed[station_id] = self.by_id[station_id] = dict(station, **fields)
+            locations = {normalize_text(station['location']) for station in changed.values()}
+            for location in locations:
+                self.by_location[location] = [changed.get(station['id'], station)
+                                              for station in self.by_location[location]]
+            # A alteração já está refletida: marcar a versão para não recarregar
+            self._data_version = self._current_version()
+        return locations
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def refresh_if_changed(self, conn=None):
+        """Recarrega o índice se a tabela foi alterada por outra conexão"""
+        with self.lock:
+            changed = self._current_version() != self._data_version
+        if changed:
+            self.load(conn)
+
+    def get_by_location(self, location):
+        self.refresh_if_changed()
+        return list(self.by_location.get(normalize_text(location), ()))
+
+    def get_by_id(self, station_id):
+        self.refresh_if_changed()
+        return self.by_id.get(station_id)
+
+
+# Deteção de voz (VAD) por frames de PCM 16 bits mono
+VAD_FRAME_MS = 30
+VAD_MARGIN_DB = 10.0         # energia acima do ruído para o frame contar como voz
+VAD_FRICATIVE_ZCR = 0.3      # cruzamentos por zero por amostra típicos de fricativas (s, f, x)
+VAD_MIN_NOISE_DB = -60.0     # piso do ruído (silêncio digital não baixa o limiar)
+VAD_START_MS = 90            # voz contínua necessária para iniciar a elocução
+VAD_END_MS = 700             # silêncio que termina a elocução
+VAD_PADDING_MS = 210         # áudio mantido antes e depois da voz
+VAD_CALIBRATION_MS = 500
+VAD_NO_SPEECH_TIMEOUT = 10.0
+VAD_NOISE_PERCENTILE = 10    # sem calibração: o ruído é estimado pelos frames mais silenciosos
+
+NoiseProfile = namedtuple('NoiseProfile', ['energy_db', 'zcr'])
+
+
+def frame_features(pcm, sample_rate):
+    """Energia (dBFS) e taxa de cruzamentos por zero de cada frame completo"""
+    samples = np.frombuffer(pcm, dtype='<i2', count=len(pcm) // 2)
+    size = sample_rate * VAD_FRAME_MS // 1000
+    count = len(samples) // size
+    frames = samples[:count * size].reshape(count, size).astype(np.float32)
+    rms = np.sqrt(np.mean(frames * frames, axis=1)) / 32768.0
+    energy_db = 20.0 * np.log10(np.maximum(rms, 1e-6))
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (size - 1)
+    return energy_db, zcr
+
+
+def calibrate_noise(pcm, sample_rate):
+    """Perfil de ruído a partir de áudio sem fala"""
+    energy_db, zcr = frame_features(pcm, sample_rate)
+    if not len(energy_db):
+        return NoiseProfile(VAD_MIN_NOISE_DB, 0.0)
+    return NoiseProfile(float(np.median(energy_db)), float(np.median(zcr)))
+
+
+def voiced_frames(energy_db, zcr, noise):
+    """Máscara dos frames com voz: energia acima do ruído, ou energia moderada
+    com muitos cruzamentos por zero (fricativas, fracas mas ruidosas)"""
+    threshold = max(noise.energy_db, VAD_MIN_NOISE_DB) + VAD_MARGIN_DB
+    return (energy_db > threshold) | (
+        (energy_db > threshold - VAD_MARGIN_DB / 2) & (zcr > max(VAD_FRICATIVE_ZCR, noise.zcr * 2)))
+
+
+def speech_bounds(pcm, sample_rate, noise=None):
+    """Início e fim (em bytes) da fala no áudio, com VAD_PADDING_MS de margem;
+    (0, 0) se não houver fala"""
+    energy_db, zcr = frame_features(pcm, sample_rate)
+    if not len(energy_db):
+        return 0, 0
+    if noise is None:
+        noise = NoiseProfile(float(np.percentile(energy_db, VAD_NOISE_PERCENTILE)),
+                             float(np.percentile(zcr, VAD_NOISE_PERCENTILE)))
+    voiced = np.flatnonzero(voiced_frames(energy_db, zcr, noise))
+    if not len(voiced):
+        return 0, 0
+    frame_bytes = sample_rate * VAD_FRAME_MS // 1000 * 2
+    padding = VAD_PADDING_MS // VAD_FRAME_MS
+    start = max(int(voiced[0]) - padding, 0) * frame_bytes
+    end = min((int(voiced[-1]) + 1 + padding) * frame_bytes, len(pcm) - len(pcm) % 2)
+    return start, end
+
+
+class Endpointer:
+    """Início e fim de uma elocução num fluxo PCM de 16 bits mono.
+
+    As características são calculadas com NumPy para todos os frames de cada
+    chunk; só a decisão (voz/silêncio) percorre os frames. Antes do início
+    guarda VAD_PADDING_MS de áudio para não cortar a primeira sílaba e, no
+    fim, descarta o silêncio além dessa margem.
+    """
+
+    def __init__(self, noise, sample_rate):
+        self.noise = noise
+        self.sample_rate = sample_rate
+        self.frame_bytes = sample_rate * VAD_FRAME_MS // 1000 * 2
+        self.start_frames = max(VAD_START_MS // VAD_FRAME_MS, 1)
+        self.end_frames = max(VAD_END_MS // VAD_FRAME_MS, 1)
+        self.padding_frames = VAD_PADDING_MS // VAD_FRAME_MS
+        self.pending = bytearray()
+        self.preroll = deque(maxlen=self.padding_frames + self.start_frames)
+        self.silence = []
+        self.voiced_run = 0
+        self.started = False
+        self.ended = False
+        self.frames = 0
+        self.sent = 0
+
+    @property
+    def elapsed(self):
+        """Segundos de áudio analisados"""
+        return self.frames * VAD_FRAME_MS / 1000.0
+
+    @property
+    def trimmed(self):
+        """Segundos de silêncio que não foram enviados ao reconhecimento"""
+        return (self.frames - self.sent) * VAD_FRAME_MS / 1000.0
+
+    def feed(self, chunk):
+        """Analisa um chunk; devolve os bytes de fala a enviar ao reconhecimento"""
+        if self.ended:
+            return b''
+        self.pending += chunk
+        usable = len(self.pending) - len(self.pending) % self.frame_bytes
+        if not usable:
+            return b''
+        data = bytes(self.pending[:usable])
+        del self.pending[:usable]
+        voiced = voiced_frames(*frame_features(data, self.sample_rate), self.noise)
+
+        output = []
+        size = self.frame_bytes
+        for index, is_voiced in enumerate(voiced.tolist()):
+            frame = data[index * size:(index + 1) * size]
+            self.frames += 1
+            if not self.started:
+                self.preroll.append(frame)
+                self.voiced_run = self.voiced_run + 1 if is_voiced else 0
+                if self.voiced_run >= self.start_frames:
+                    self.started = True
+                    output.extend(self.preroll)
+                    self.preroll.clear()
+            elif is_voiced:
+                output.extend(self.silence)
+                self.silence = []
+                output.append(frame)
+            else:
+                self.silence.append(frame)
+                if len(self.silence) >= self.end_frames:
+                    output.extend(self.silence[:self.padding_frames])
+                    self.silence = []
+                    self.ended = True
+                    break
+        self.sent += len(output)
+        return b''.join(output)
+
+
+class FrameRingBuffer:
+    """Buffer circular limitado de frames de áudio entre a captura e o reconhecimento"""
+
+    def __init__(self, max_frames=512):
+        self.frames = deque(maxlen=max_frames)
+        self.condition = threading.Condition()
+        self.closed = False
+        self.dropped = 0
+
+    def put(self, frame):
+        """Acrescenta um frame; se o buffer estiver cheio descarta o mais antigo"""
+        with self.condition:
+            if len(self.frames) == self.frames.maxlen:
+                self.dropped += 1
+            self.frames.append(frame)
+            self.condition.notify()
+
+    def get(self):
+        """Devolve o próximo frame, ou None quando o buffer foi fechado e está vazio"""
+        with self.condition:
+            while not self.frames and not self.closed:
+                self.condition.wait()
+            return self.frames.popleft() if self.frames else None
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class RecognizerBackend:
+    """Interface dos motores de reconhecimento de voz.
+
+    recognize(audio) reconhece um sr.AudioData completo. open_stream devolve
+    um objeto com accept(frame), partial() e finish(), alimentado
+    incrementalmente enquanto o utilizador ainda está a falar. Ambos lançam
+    sr.UnknownValueError / sr.RequestError, como o speech_recognition.
+    """
+
+    name = None
+    # True se o motor processa o áudio à medida que chega (reconhecimento parcial)
+    incremental = False
+
+    def open_stream(self, sample_rate, sample_width):
+        raise NotImplementedError
+
+    def recognize(self, audio):
+        stream = self.open_stream(audio.sample_rate, audio.sample_width)
+        stream.accept(audio.frame_data)
+        return stream.finish()
+
+    def close(self):
+        pass
+
+
+class BufferedStream:
+    """Stream para motores que só reconhecem o áudio completo (ex.: Google)"""
+
+    def __init__(self, recognize, sample_rate, sample_width):
+        self.recognize = recognize
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.data = bytearray()
+
+    def accept(self, frame):
+        self.data += frame
+
+    def partial(self):
+        return ''
+
+    def finish(self):
+        return self.recognize(sr.AudioData(bytes(self.data), self.sample_rate, self.sample_width))
+
+
+class GoogleRecognizerBackend(RecognizerBackend):
+    """Reconhecimento através da API Google Speech Recognition"""
+
+    name = 'google'
+
+    def __init__(self, recognizer, language='pt-PT'):
+        self.recognizer = recognizer
+        self.language = language
+
+    def recognize(self, audio):
+        return self.recognizer.recognize_google(audio, language=self.language)
+
+    def open_stream(self, sample_rate, sample_width):
+        return BufferedStream(self.recognize, sample_rate, sample_width)
+
+
+class VoskStream:
+    """Stream incremental sobre um KaldiRecognizer do Vosk"""
+
+    def __init__(self, recognizer):
+        self.recognizer = recognizer
+
+    def accept(self, frame):
+        # O Vosk (cffi) só aceita bytes, não memoryview
+        self.recognizer.AcceptWaveform(frame if isinstance(frame, bytes) else bytes(frame))
+
+    def partial(self):
+        return json.loads(self.recognizer.PartialResult()).get('partial', '')
+
+    def finish(self):
+        text = json.loads(self.recognizer.FinalResult()).get('text', '')
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+class VoskRecognizerBackend(RecognizerBackend):
+    """Reconhecimento local e offline com um modelo Vosk pt-PT.
+
+    O modelo é carregado uma única vez na construção e aquecido com um
+    segundo de silêncio, para que o primeiro pedido não pague esse custo.
+    """
+
+    name = 'vosk'
+    incremental = True
+
+    def __init__(self, model_path=None, sample_rate=16000):
+        try:
+            import vosk
+        except ImportError:
+            raise Exception("Motor 'vosk' indisponível: instale com 'pip install vosk'")
+        model_path = model_path or os.environ.get('ZEUS_VOSK_MODEL')
+        if not model_path:
+            raise Exception("Indique o modelo Vosk com --asr-model ou ZEUS_VOSK_MODEL")
+        vosk.SetLogLevel(-1)
+        self.vosk = vosk
+        self.sample_rate = sample_rate
+        log.info("🧠 A carregar modelo Vosk: %s", model_path)
+        self.model = vosk.Model(model_path)
+        warmup = vosk.KaldiRecognizer(self.model, sample_rate)
+        warmup.AcceptWaveform(bytes(sample_rate * 2))
+        warmup.FinalResult()
+
+    def open_stream(self, sample_rate, sample_width):
+        if sample_width != 2:
+            raise sr.RequestError("O Vosk requer áudio PCM de 16 bits")
+        return VoskStream(self.vosk.KaldiRecognizer(self.model, sample_rate))
+
+    def recognize(self, audio):
+        data = audio.get_raw_data(convert_rate=self.sample_rate, convert_width=2)
+        stream = self.open_stream(self.sample_rate, 2)
+        stream.accept(data)
+        return stream.finish()
+
+
+# Motor de reconhecimento de cada processo do pool (ver ProcessPoolRecognizerBackend)
+_worker_backend = None
+
+
+def _init_recognizer_worker(backend_class, backend_kwargs):
+    global _worker_backend
+    setup_logging()
+    _worker_backend = backend_class(**backend_kwargs)
+
+
+def _recognize_in_worker(frame_data, sample_rate, sample_width):
+    return _worker_backend.recognize(sr.AudioData(frame_data, sample_rate, sample_width))
+
+
+class ProcessPoolRecognizerBackend(RecognizerBackend):
+    """Distribui o reconhecimento por vários processos, cada um com o seu
+    motor (e modelo) carregado e quente, para sessões web concorrentes
+    usarem vários núcleos"""
+
+    def __init__(self, backend_class, backend_kwargs=None, workers=2):
+        self.name = f'{backend_class.name}x{workers}'
+        self.executor = futures.ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_recognizer_worker,
+            initargs=(backend_class, backend_kwargs or {})
+        )
+        # Arrancar já todos os processos para carregar os modelos
+        for future in [self.executor.submit(time.sleep, 0) for _ in range(workers)]:
+            future.result()
+
+    def recognize(self, audio):
+        # Um memoryview não atravessa processos (o áudio é copiado de qualquer forma)
+        return self.executor.submit(
+            _recognize_in_worker, bytes(audio.frame_data), audio.sample_rate, audio.sample_width
+        ).result()
+
+    def open_stream(self, sample_rate, sample_width):
+        # O áudio não atravessa processos frame a frame: reconhece-se no fim
+        return BufferedStream(self.recognize, sample_rate, sample_width)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class StubStream:
+    """Stream de teste: revela uma palavra do texto fixo a cada N frames"""
+
+    def __init__(self, text, frames_per_word):
+        self.words = text.split()
+        self.frames_per_word = frames_per_word
+        self.frames = 0
+
+    def accept(self, frame):
+        self.frames += 1
+
+    def partial(self):
+        return ' '.join(self.words[:self.frames // self.frames_per_word])
+
+    def finish(self):
+        if not self.words:
+            raise sr.UnknownValueError()
+        return ' '.join(self.words)
+
+
+class StubRecognizerBackend(RecognizerBackend):
+    """Motor de teste que devolve sempre o mesmo texto, sem rede nem modelo"""
+
+    name = 'stub'
+    incremental = True
+
+    def __init__(self, text='carregador mais barato em lisboa', frames_per_word=5):
+        self.text = text
+        self.frames_per_word = frames_per_word
+
+    def open_stream(self, sample_rate, sample_width):
+        return StubStream(self.text, self.frames_per_word)
+
+
+RECOGNIZER_BACKENDS = {
+    'google': GoogleRecognizerBackend,
+    'vosk': VoskRecognizerBackend,
+    'stub': StubRecognizerBackend,
+}
+
+
+def create_recognizer_backend(name, recognizer, model_path=None, workers=1):
+    """Cria o motor de reconhecimento escolhido na linha de comando"""
+    if name not in RECOGNIZER_BACKENDS:
+        raise Exception(f"Motor de reconhecimento desconhecido: {name}")
+    if name == 'google':
+        # A API Google já é remota: não precisa de pool de processos
+        return GoogleRecognizerBackend(recognizer)
+    kwargs = {'model_path': model_path} if name == 'vosk' else {}
+    if workers > 1:
+        return ProcessPoolRecognizerBackend(RECOGNIZER_BACKENDS[name], kwargs, workers)
+    return RECOGNIZER_BACKENDS[name](**kwargs)
+
+
+class StreamingRecognition:
+    """Pipeline de reconhecimento em streaming.
+
+    A captura coloca frames no FrameRingBuffer e uma thread consumidora
+    alimenta o motor à medida que chegam, mantendo a transcrição parcial
+    atualizada. Ao parar, só falta processar o que ainda está no buffer.
+    """
+
+    def __init__(self, backend, sample_rate, sample_width, max_frames=512):
+        self.buffer = FrameRingBuffer(max_frames)
+        self.stream = backend.open_stream(sample_rate, sample_width)
+        self.partial_text = ''
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self._consume, daemon=True)
+        self.thread.start()
+
+    def feed(self, frame):
+        self.buffer.put(frame)
+
+    def _consume(self):
+        try:
+            while True:
+                frame = self.buffer.get()
+                if frame is None:
+                    break
+                self.stream.accept(frame)
+                self.partial_text = self.stream.partial()
+            self.result = self.stream.finish()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done.set()
+
+    def finish(self, timeout=10):
+        """Fecha o buffer e devolve o texto final reconhecido"""
+        self.buffer.close()
+        if not self.done.wait(timeout):
+            raise Exception("Timeout no reconhecimento em streaming")
+        if self.buffer.dropped:
+            log.warning("⚠️ %d frames descartados (buffer cheio)", self.buffer.dropped)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class PCMBuffer:
+    """Buffer PCM pré-alocado.
+
+    O áudio recebido é escrito diretamente nele com readinto e entregue ao
+    reconhecimento como memoryview, sem concatenações nem cópias por chunk.
+    """
+
+    def __init__(self, capacity):
+        self.data = bytearray(capacity)
+        self.view = memoryview(self.data)
+        self.length = 0
+
+    def reset(self):
+        self.length = 0
+
+    def fill_from(self, stream, chunk_size=16384):
+        """Lê o stream até ao fim para o buffer; devolve o número de bytes lidos"""
+        total = 0
+        readinto = getattr(stream, 'readinto', None)
+        while True:
+            free = len(self.data) - self.length
+            if free == 0:
+                if stream.read(1):
+                    raise BufferError("Áudio excede a duração máxima permitida")
+                return total
+            target = self.view[self.length:self.length + min(chunk_size, free)]
+            if readinto is not None:
+                count = readinto(target)
+            else:
+                chunk = stream.read(len(target))
+                count = len(chunk)
+                target[:count] = chunk
+            if not count:
+                return total
+            self.length += count
+            total += count
+
+
+# Captura do microfone do servidor: duração máxima de uma elocução e o que
+# fazer quando é ultrapassada
+CAPTURE_MAX_SECONDS = 30
+CAPTURE_OVERFLOW_POLICIES = ('stop', 'drop_oldest', 'error')
+
+
+class CaptureBuffer(PCMBuffer):
+    """PCMBuffer circular para a captura do microfone.
+
+    Ao encher aplica a política de overflow: 'stop' termina a elocução,
+    'drop_oldest' sobrescreve o áudio mais antigo (fica o fim da fala) e
+    'error' falha a captura. O áudio é entregue como memoryview.
+    """
+
+    def __init__(self, capacity, overflow='stop'):
+        if overflow not in CAPTURE_OVERFLOW_POLICIES:
+            raise ValueError(f"Política de overflow desconhecida: {overflow}")
+        super().__init__(capacity)
+        self.overflow = overflow
+        self.start = 0      # início do áudio quando o anel já deu a volta
+        self.dropped = 0    # bytes descartados
+
+    def reset(self):
+        super().reset()
+        self.start = 0
+        self.dropped = 0
+
+    def write(self, chunk):
+        """Acrescenta áudio; devolve False quando a captura deve terminar"""
+        capacity = len(self.data)
+        size = len(chunk)
+        free = capacity - self.length
+        if size <= free:
+            self.view[self.length:self.length + size] = chunk
+            self.length += size
+            return True
+        if self.overflow == 'error':
+            raise BufferError("Áudio excede a duração máxima permitida")
+        self.dropped += size - free
+        chunk = memoryview(chunk)
+        if free:
+            self.view[self.length:] = chunk[:free]
+            self.length = capacity
+        if self.overflow == 'stop':
+            return False
+        # drop_oldest: escrever por cima do mais antigo, dando a volta ao anel
+        chunk = chunk[free:][-capacity:]
+        end = self.start + len(chunk)
+        if end <= capacity:
+            self.view[self.start:end] = chunk
+        else:
+            split = capacity - self.start
+            self.view[self.start:] = chunk[:split]
+            self.view[:end - capacity] = chunk[split:]
+        self.start = end % capacity
+        return True
+
+    def contents(self):
+        """Áudio capturado, por ordem, sem cópia do buffer"""
+        if self.start:
+            # O anel deu a volta: pôr o áudio por ordem no próprio buffer
+            # (só com drop_oldest; copia-se apenas a parte mais recente)
+            newest = bytes(self.view[:self.start])
+            self.view[:len(self.data) - self.start] = self.view[self.start:]
+            self.view[len(self.data) - self.start:] = newest
+            self.start = 0
+        return self.view[:self.length]
+
+
+class PCMBufferPool:
+    """Conjunto de PCMBuffers alocados no arranque e reutilizados entre pedidos"""
+
+    def __init__(self, count, capacity):
+        self.capacity = capacity
+        self.buffers = queue.LifoQueue()
+        for _ in range(count):
+            self.buffers.put(PCMBuffer(capacity))
+
+    def acquire(self):
+        try:
+            buffer = self.buffers.get_nowait()
+        except queue.Empty:
+            raise Exception("Servidor ocupado: nenhum buffer de áudio livre")
+        buffer.reset()
+        return buffer
+
+    def release(self, buffer):
+        self.buffers.put(buffer)
+
+    def available(self):
+        return self.buffers.qsize()
+
+
+# Áudio enviado pelos clientes: PCM 16 bits mono (audio/l16) ou WAV
+UPLOAD_SAMPLE_RATE = 16000
+UPLOAD_MIN_RATE = 8000
+UPLOAD_MAX_RATE = 48000
+UPLOAD_MAX_SECONDS = 30
+UPLOAD_BUFFERS = 8
+# Envio em pedaços sem novo pedaço há mais do que isto: o buffer volta ao
+# conjunto (clientes que desistem a meio não o esgotam até expirar a sessão)
+UPLOAD_IDLE_TIMEOUT = 10.0
+
+
+class AudioUpload:
+    """Áudio enviado por um cliente, em um ou vários pedidos a /recognize.
+
+    Com motores incrementais cada pedaço é entregue ao reconhecimento logo
+    que chega; com os restantes o buffer completo é reconhecido no fim.
+    """
+
+    def __init__(self, pool, backend, sample_rate, sample_width=2):
+        self.pool = pool
+        self.buffer = pool.acquire()
+        self.backend = backend
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.data_offset = None
+        self.fed = 0
+        self.stream = None
+        self.last_chunk = time.monotonic()
+
+    def _parse_header(self):
+        """Deteta um cabeçalho WAV no início do áudio; devolve False se faltam bytes"""
+        view = self.buffer.view[:self.buffer.length]
+        if len(view) < 12:
+            return False
+        if bytes(view[:4]) != b'RIFF' or bytes(view[8:12]) != b'WAVE':
+            self.data_offset = 0
+            return True
+        position = 12
+        while position + 8 <= len(view):
+            chunk_id = bytes(view[position:position + 4])
+            chunk_size = struct.unpack_from('<I', view, position + 4)[0]
+            if chunk_id == b'data':
+                self.data_offset = position + 8
+                return True
+            if chunk_id == b'fmt ':
+                if position + 24 > len(view):
+                    return False
+                channels, sample_rate = struct.unpack_from('<HI', view, position + 10)
+                bits = struct.unpack_from('<H', view, position + 22)[0]
+                if channels != 1 or bits != 16:
+                    raise Exception("Envie áudio mono de 16 bits")
+                self.sample_rate = sample_rate
+                self.sample_width = 2
+            position += 8 + chunk_size + (chunk_size & 1)
+        return False
+
+    def receive(self, body):
+        """Escreve o corpo do pedido no buffer e alimenta o motor incremental"""
+        self.last_chunk = time.monotonic()
+        self.buffer.fill_from(body)
+        if self.data_offset is None and not self._parse_header():
+            return
+        if not self.backend.incremental:
+            return
+        if self.stream is None:
+            self.stream = self.backend.open_stream(self.sample_rate, self.sample_width)
+            self.fed = self.data_offset
+        # Entregar apenas amostras completas
+        end = self.buffer.length - (self.buffer.length - self.data_offset) % self.sample_width
+        if end > self.fed:
+            self.stream.accept(self.buffer.view[self.fed:end])
+            self.fed = end
+
+    def partial(self):
+        return self.stream.partial() if self.stream is not None else ''
+
+    def finish(self):
+        """Devolve o texto reconhecido"""
+        if self.data_offset is None:
+            raise sr.UnknownValueError()
+        if self.stream is not None:
+            return self.stream.finish()
+        frames = self.buffer.view[self.data_offset:self.buffer.length]
+        if numpy_available():
+            # Reconhecer só a fala: o silêncio antes e depois é cortado sem cópias
+            start, end = speech_bounds(frames, self.sample_rate)
+            if start == end:
+                raise sr.UnknownValueError()
+            trimmed = len(frames) - (end - start)
+            METRICS.inc('zeus_vad_trimmed_seconds_total', trimmed / (self.sample_rate * self.sample_width),
+                        source='upload')
+            frames = frames[start:end]
+        return self.backend.recognize(sr.AudioData(frames, self.sample_rate, self.sample_width))
+
+    def release(self):
+        if self.buffer is not None:
+            self.pool.release(self.buffer)
+            self.buffer = None
+
+
+class RecordingSession:
+    """Estado de gravação de um cliente (browser, quiosque, telemóvel)"""
+
+    def __init__(self, session_id):
+        self.id = session_id
+        self.lock = threading.Lock()
+        # Detido durante o reconhecimento: uma nova gravação espera por ele
+        self.recognition_lock = threading.Lock()
+        self._recognizer = None
+        self.is_recording = False
+        self.recording_thread = None
+        self.audio_queue = queue.Queue(maxsize=1)
+        self.stop_recording = threading.Event()
+        self.streaming_recognition = None
+        # A gravação terminou por deteção do fim da fala (e não por /stop_recording)
+        self.auto_stopped = False
+        # Buffer da captura no servidor, reutilizado entre gravações da sessão
+        self.capture = None
+        self.upload = None
+        # O envio em pedaços foi abandonado e o seu buffer libertado
+        self.upload_expired = False
+        self.recording_started = None
+        self.last_activity = time.monotonic()
+        # Resultado do último reconhecimento, para quem espera por ele (/listen)
+        self.recognized = threading.Event()
+        self.last_text = None
+        self.last_error = None
+        self.waiters = []
+
+    @property
+    def recognizer(self):
+        # Só as sessões que gravam no servidor precisam do speech_recognition
+        if self._recognizer is None:
+            self._recognizer = sr.Recognizer()
+        return self._recognizer
+
+    def touch(self):
+        self.last_activity = time.monotonic()
+
+    def reset_recognition(self):
+        with self.lock:
+            self.recognized.clear()
+            self.last_text = None
+            self.last_error = None
+
+    def finish_recognition(self, text=None, error=None):
+        """Publica o resultado e acorda quem espera (threads e event loops)"""
+        with self.lock:
+            self.last_text = text
+            self.last_error = error
+            self.recognized.set()
+            waiters, self.waiters = self.waiters, []
+        for callback in waiters:
+            callback()
+
+    def add_waiter(self, callback):
+        """Chama callback quando houver resultado (já, se existir)"""
+        with self.lock:
+            if not self.recognized.is_set():
+                self.waiters.append(callback)
+                return
+        callback()
+
+    def abort(self):
+        """Interrompe a gravação sem esperar pelo reconhecimento"""
+        if self.is_recording:
+            self.finish_recognition(error=Exception("Sessão terminada"))
+        self.stop_recording.set()
+        self.is_recording = False
+        if self.streaming_recognition is not None:
+            self.streaming_recognition.buffer.close()
+        upload, self.upload = self.upload, None
+        if upload is not None:
+            upload.release()
+        self.capture = None
+
+
+class SessionManager:
+    """Sessões de gravação independentes, com limites e remoção das inativas"""
+
+    def __init__(self, max_sessions=32, idle_timeout=300.0, max_recording_seconds=60.0,
+                 reap_interval=5.0, upload_idle_timeout=UPLOAD_IDLE_TIMEOUT):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.upload_idle_timeout = upload_idle_timeout
+        self.max_recording_seconds = max_recording_seconds
+        self.reap_interval = reap_interval
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.reaped = 0
+        self.uploads_expired = 0
+        self.reaper = threading.Thread(target=self._reap_loop, daemon=True)
+        self.reaper.start()
+
+    def create(self):
+        with self.lock:
+            if len(self.sessions) >= self.max_sessions:
+                self._reap_locked()
+            if len(self.sessions) >= self.max_sessions:
+                raise Exception("Demasiadas sessões de gravação ativas, tente mais tarde")
+            session = RecordingSession(uuid.uuid4().hex)
+            self.sessions[session.id] = session
+            return session
+
+    def get(self, session_id):
+        with self.lock:
+            session = self.sessions.get(session_id)
+        if session is not None:
+            session.touch()
+        return session
+
+    def get_or_create(self, session_id):
+        return (session_id and self.get(session_id)) or self.create()
+
+    def close(self, session_id):
+        with self.lock:
+            session = self.sessions.pop(session_id, None)
+        if session is not None:
+            session.abort()
+
+    def _reap_locked(self):
+        now = time.monotonic()
+        for session_id, session in list(self.sessions.items()):
+            if session.is_recording:
+                expired = now - session.recording_started > self.max_recording_seconds
+            else:
+                expired = now - session.last_activity > self.idle_timeout
+            if expired:
+                log.info("🧹 Sessão %s removida por inatividade", session_id[:8])
+                del self.sessions[session_id]
+                session.abort()
+                self.reaped += 1
+
+    def _expire_uploads_locked(self):
+        now = time.monotonic()
+        expired = 0
+        for session in self.sessions.values():
+            upload = session.upload
+            if upload is None or now - upload.last_chunk <= self.upload_idle_timeout:
+                continue
+            # Sessão ocupada (a receber um pedaço): não está parada
+            if not session.lock.acquire(blocking=False):
+                continue
+            try:
+                if session.upload is upload:
+                    log.info("🧹 Envio de áudio da sessão %s abandonado", session.id[:8])
+                    session.upload = None
+                    session.upload_expired = True
+                    upload.release()
+                    expired += 1
+            finally:
+                session.lock.release()
+        self.uploads_expired += expired
+        return expired
+
+    def expire_uploads(self):
+        """Liberta os buffers dos envios em pedaços parados há mais de upload_idle_timeout"""
+        with self.lock:
+            return self._expire_uploads_locked()
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(self.reap_interval)
+            with self.lock:
+                self._reap_locked()
+                self._expire_uploads_locked()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'active': len(self.sessions),
+                'recording': sum(1 for session in self.sessions.values() if session.is_recording),
+                'max_sessions': self.max_sessions,
+                'reaped': self.reaped,
+                'uploads_expired': self.uploads_expired,
+            }
+
+
+TTS_QUEUE_SIZE = 4
+TTS_CACHE_SIZE = 128
+TTS_SYNTH_TIMEOUT = 15.0
+
+# Áudio sintetizado guardado em disco (para reproduzir localmente ou enviar ao browser)
+SpeechAudio = namedtuple('SpeechAudio', ['path', 'content_type', 'size'])
+
+
+class SpeechJob:
+    """Pedido pendente de síntese: falar localmente e/ou devolver o áudio"""
+
+    def __init__(self, text, speak, fetch):
+        self.text = text
+        self.speak = speak
+        self.fetch = fetch
+        self.done = threading.Event()
+        self.audio = None
+        self.error = None
+
+
+class TTSWorker:
+    """Thread única de síntese de voz com fila limitada e cache de áudio.
+
+    Pedidos repetidos para o mesmo texto são agrupados; com a fila cheia, o
+    pedido mais antigo é descartado (uma resposta falada atrasada já não
+    interessa). O áudio fica em cache por texto, pelo que respostas frequentes
+    ("Por favor, diga um comando válido") não voltam a ser sintetizadas.
+    """
+
+    def __init__(self, engine_factory=None, max_pending=TTS_QUEUE_SIZE, cache_size=TTS_CACHE_SIZE,
+                 voice='Joana'):
+        # O motor é criado na própria thread de síntese, no primeiro uso
+        self.engine_factory = engine_factory
+        self._engine = None
+        self.engine_loaded = False
+        self.voice = voice
+        self.max_pending = max_pending
+        self.cache_size = cache_size
+        self.say = shutil.which('say')
+        self.player = shutil.which('afplay') or shutil.which('aplay')
+        self.cache_dir = tempfile.mkdtemp(prefix='zeus-tts-')
+        self.cache = OrderedDict()
+        self.pending = OrderedDict()
+        self.cond = threading.Condition()
+        self.closed = False
+        self.dropped = 0
+        self.coalesced = 0
+        self.hits = 0
+        self.misses = 0
+        self.thread = threading.Thread(target=self._run, name='zeus-tts', daemon=True)
+        self.thread.start()
+
+    def warm_up(self):
+        """Carregar o motor de síntese em segundo plano"""
+        self._submit('', speak=False, fetch=False)
+
+    def speak(self, text):
+        """Falar no servidor, sem bloquear quem chama"""
+        self._submit(text, speak=True, fetch=False)
+
+    def synthesize(self, text, timeout=TTS_SYNTH_TIMEOUT):
+        """Devolve o SpeechAudio do texto, sintetizando-o se não estiver em cache"""
+        # A falha na cache é contada pela thread de síntese (uma só vez)
+        audio = self._cached(text, count_miss=False)
+        if audio is not None:
+            return audio
+        job = self._submit(text, speak=False, fetch=True)
+        if not job.done.wait(timeout):
+            raise Exception("Tempo esgotado na síntese de voz")
+        if job.error is not None:
+            raise job.error
+        return job.audio
+
+    def _submit(self, text, speak, fetch):
+        with self.cond:
+            job = self.pending.get(text)
+            if job is not None:
+                self.coalesced += 1
+                job.speak = job.speak or speak
+                job.fetch = job.fetch or fetch
+                return job
+            while len(self.pending) >= self.max_pending:
+                _, oldest = self.pending.popitem(last=False)
+                oldest.error = Exception("Fila de síntese de voz cheia")
+                oldest.done.set()
+                self.dropped += 1
+            job = self.pending[text] = SpeechJob(text, speak, fetch)
+            self.cond.notify()
+            return job
+
+    def read(self, text, timeout=TTS_SYNTH_TIMEOUT):
+        """Conteúdo e tipo do áudio do texto.
+
+        O ficheiro é lido sob o lock da cache, para não ser apagado por uma
+        remoção da cache a meio da leitura.
+        """
+        for _ in range(2):
+            audio = self.synthesize(text, timeout)
+            with self.cond:
+                if self.cache.get(text) is audio:
+                    with open(audio.path, 'rb') as f:
+                        return f.read(), audio.content_type
+        raise Exception("Áudio removido da cache durante a leitura")
+
+    def _cached(self, text, count_miss=True):
+        with self.cond:
+            audio = self.cache.get(text)
+            if audio is None:
+                if count_miss:
+                    self.misses += 1
+                return None
+            self.cache.move_to_end(text)
+            self.hits += 1
+            return audio
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self.closed:
+                    self.cond.wait()
+                if self.closed:
+                    return
+                _, job = self.pending.popitem(last=False)
+            try:
+                if not job.text:
+                    self._get_engine()
+                    job.done.set()
+                    continue
+                audio = None
+                with METRICS.stage('tts'):
+                    if job.fetch or self.player:
+                        audio = self._cached(job.text) or self._synthesize(job.text)
+                    if job.speak:
+                        self._play(job.text, audio)
+                job.audio = audio
+            except Exception as e:
+                log.error("❌ Erro na síntese de voz: %s", e)
+                job.error = e
+            job.done.set()
+
+    def _get_engine(self):
+        if not self.engine_loaded:
+            # Uma única tentativa: sem motor disponível, a síntese fica desativada
+            self.engine_loaded = True
+            if self.engine_factory is not None:
+                try:
+                    self._engine = self.engine_factory()
+                except Exception as e:
+                    log.error("❌ Motor de síntese de voz indisponível: %s", e)
+        return self._engine
+
+    def _synthesize(self, text):
+        path = os.path.join(self.cache_dir, hashlib.sha1(text.encode('utf-8')).hexdigest() + '.wav')
+        if self.say:
+            # O texto vai pelo stdin (-f -): nunca é interpretado como opção
+            subprocess.run(['say', '-v', self.voice, '-o', path, '--file-format=WAVE',
+                            '--data-format=LEI16@22050', '-f', '-'],
+                           input=text.encode('utf-8'), check=True, timeout=TTS_SYNTH_TIMEOUT)
+        elif self._get_engine() is not None:
+            self._engine.save_to_file(text, path)
+            self._engine.runAndWait()
+        else:
+            raise Exception("Nenhum motor de síntese de voz disponível")
+        with open(path, 'rb') as f:
+            header = f.read(4)
+        content_type = 'audio/aiff' if header == b'FORM' else 'audio/wav'
+        audio = SpeechAudio(path, content_type, os.path.getsize(path))
+        with self.cond:
+            self.cache[text] = audio
+            while len(self.cache) > self.cache_size:
+                _, evicted = self.cache.popitem(last=False)
+                if evicted.path != path:
+                    os.remove(evicted.path)
+        return audio
+
+    def _play(self, text, audio):
+        if audio is not None and self.player:
+            subprocess.run([self.player, audio.path], check=True)
+        elif self.say:
+            subprocess.run(['say', '-v', self.voice, '-f', '-'], input=text.encode('utf-8'), check=True)
+        elif self._get_engine() is not None:
+            self._engine.say(text)
+            self._engine.runAndWait()
+        else:
+            return
+        log.debug("✅ Síntese de voz concluída")
+
+    def stats(self):
+        with self.cond:
+            return {
+                'pending': len(self.pending),
+                'dropped': self.dropped,
+                'coalesced': self.coalesced,
+                'cached': len(self.cache),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+
+# Rotas HTTP: métodos, caminho, handler, pool de execução ('io' ou 'asr') e se o
+# handler recebe o corpo do pedido em bruto (stream) em vez de JSON; local
+# restringe a rota a pedidos do próprio computador ou com o token partilhado
+Route = namedtuple('Route', ['methods', 'path', 'handler', 'pool', 'raw', 'local'], defaults=(False,))
+RawResponse = namedtuple('RawResponse', ['body', 'content_type', 'status'])
+
+# Cabeçalho com o token partilhado que autoriza as rotas locais a partir de outra máquina
+UPDATES_TOKEN_HEADER = 'X-Zeus-Token'
+
+# Corpo máximo de um pedido HTTP: chega para UPLOAD_MAX_SECONDS de áudio
+# ou um lote de API_BATCH_MAX comandos
+REQUEST_MAX_BYTES = 4 << 20
+
+
+class AsgiApp:
+    """Aplicação ASGI com as mesmas rotas da interface Flask.
+
+    Os handlers bloqueantes correm em pools de threads separados (reconhecimento
+    e restantes operações) e são aguardados sem ocupar o event loop; /listen
+    espera pelo resultado da sessão sem ocupar thread nenhuma.
+    """
+
+    def __init__(self, finder, io_workers=16, asr_workers=4):
+        self.finder = finder
+        self.routes = {}
+        for route in finder.get_routes():
+            for method in route.methods:
+                self.routes[(method, route.path)] = route
+        self.executors = {
+            'io': futures.ThreadPoolExecutor(io_workers, thread_name_prefix='zeus-io'),
+            'asr': futures.ThreadPoolExecutor(asr_workers, thread_name_prefix='zeus-asr'),
+        }
+        self.async_handlers = {'/listen': self.listen}
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+        route = self.routes.get((scope['method'], scope['path']))
+        if route is None:
+            await self.send_result(send, RawResponse(b'Not Found', 'text/plain', 404))
+            return
+
+        params = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+        headers = dict(scope.get('headers', []))
+        if route.local:
+            client = scope.get('client') or (None,)
+            token = headers.get(UPDATES_TOKEN_HEADER.lower().encode('latin-1'))
+            if not self.finder.local_request_allowed(client[0], token and token.decode('latin-1')):
+                await self.send_result(send, self.finder.forbidden(route))
+                return
+        mimetype = headers.get(b'content-type', b'').decode('latin-1').split(';')[0].strip().lower()
+        body = await self.read_body(receive, headers)
+        if body is None:
+            error = {'success': False, 'error': f"Pedido demasiado grande (máximo {REQUEST_MAX_BYTES} bytes)"}
+            await self.send_result(send, RawResponse(json.dumps(error, ensure_ascii=False),
+                                                     'application/json', 413))
+            return
+        if route.raw:
+            args = (params, io.BytesIO(body), mimetype)
+        else:
+            if mimetype == 'application/json' and body:
+                try:
+                    data = json.loads(body)
+                except ValueError:
+                    data = None
+                if isinstance(data, dict):
+                    params.update(data)
+            args = (params,)
+
+        started = time.perf_counter()
+        try:
+            if route.path in self.async_handlers:
+                result = await self.async_handlers[route.path](*args)
+            else:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(self.executors[route.pool], route.handler, *args)
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+        METRICS.observe('zeus_request_seconds', time.perf_counter() - started, route=route.path)
+        await self.send_result(send, result)
+
+    async def listen(self, params):
+        """/listen: inicia a gravação e aguarda o /stop_recording da mesma sessão"""
+        finder = self.finder
+        loop = asyncio.get_running_loop()
+        try:
+            session = finder.sessions.get_or_create(params.get('session_id'))
+            await loop.run_in_executor(self.executors['io'], finder.start_continuous_recording, session)
+            done = loop.create_future()
+
+            def wake():
+                if not done.done():
+                    done.set_result(None)
+            session.add_waiter(lambda: loop.call_soon_threadsafe(wake))
+            try:
+                await asyncio.wait_for(done, finder.sessions.max_recording_seconds + 10)
+            except asyncio.TimeoutError:
+                raise Exception("Tempo máximo de gravação excedido")
+            return finder.listen_response(finder.recognition_result(session))
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(finder.recognition_error(e))
+            }
+
+    async def read_body(self, receive, headers):
+        """Corpo do pedido, ou None se exceder REQUEST_MAX_BYTES"""
+        try:
+            if int(headers.get(b'content-length', 0)) > REQUEST_MAX_BYTES:
+                return None
+        except ValueError:
+            pass
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > REQUEST_MAX_BYTES:
+                return None
+            chunks.append(chunk)
+            if not message.get('more_body', False):
+                break
+        return b''.join(chunks)
+
+    async def send_result(self, send, result):
+        if isinstance(result, RawResponse):
+            body = result.body.encode('utf-8') if isinstance(result.body, str) else result.body
+            content_type, status = result.content_type, result.status
+        else:
+            body = json.dumps(result, ensure_ascii=False).encode('utf-8')
+            content_type, status = 'application/json', 200
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', content_type.encode('latin-1')),
+                        (b'content-length', str(len(body)).encode('latin-1'))],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                for executor in self.executors.values():
+                    executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+def create_asgi_app():
+    """Fábrica usada pelos processos do servidor ASGI (--asgi --workers N)"""
+    finder = EVChargingFinder(streaming=os.environ.get('ZEUS_STREAMING') == '1',
+                              asr=os.environ.get('ZEUS_ASR', 'google'),
+                              asr_model=os.environ.get('ZEUS_VOSK_MODEL'),
+                              asr_workers=int(os.environ.get('ZEUS_ASR_WORKERS', '1')),
+                              text_only=os.environ.get('ZEUS_TEXT_ONLY') == '1',
+                              warm_up=os.environ.get('ZEUS_WARM_UP') == '1',
+                              max_utterance=float(os.environ.get('ZEUS_MAX_UTTERANCE', CAPTURE_MAX_SECONDS)),
+                              capture_overflow=os.environ.get('ZEUS_CAPTURE_OVERFLOW', 'stop'))
+    return AsgiApp(finder)
+
+
+def run_asgi_server(app, workers=1):
+    """Servir a aplicação ASGI com uvicorn (um ou vários processos)"""
+    try:
+        import uvicorn
+    except ImportError:
+        print("❌ O modo ASGI requer o uvicorn: pip install uvicorn")
+        return
+    print("⚡ Iniciando servidor ASGI...")
+    print("📱 Acesse: http://localhost:8002")
+    if workers > 1:
+        # Cada processo constrói o seu próprio EVChargingFinder a partir do ambiente
+        print(f"🧵 {workers} processos de trabalho")
+        uvicorn.run('ZEUS:create_asgi_app', factory=True, host='0.0.0.0', port=8002,
+                    workers=workers, log_level='warning')
+    else:
+        uvicorn.run(app, host='0.0.0.0', port=8002, log_level='warning')
+
+
+# Importação do catálogo de carregadores (CSV, JSON ou NDJSON)
+IMPORT_CHUNK_SIZE = 5000
+IMPORT_READ_SIZE = 1 << 16
+# Acima deste tamanho os índices FTS/R*Tree são reconstruídos no fim da
+# importação, em vez de atualizados linha a linha pelos triggers
+IMPORT_BULK_BYTES = 1 << 20
+# Um registo de um array JSON que não se consegue ler com este tamanho em
+# memória é dado como malformado (em vez de ler o resto do ficheiro para o buffer)
+IMPORT_MAX_RECORD_BYTES = 1 << 20
+# Fim de um objeto do array: '}' seguido de ',' ou ']'
+JSON_RECORD_END_RE = re.compile(r'\}\s*(?=[,\]])')
+
+# Nomes de coluna aceites (normalizados) para cada campo da tabela
+IMPORT_ALIASES = {
+    'id': 'id', 'station_id': 'id', 'codigo': 'id', 'uid': 'id',
+    'location': 'location', 'localizacao': 'location', 'cidade': 'location',
+    'city': 'location', 'municipio': 'location', 'concelho': 'location',
+    'address': 'address', 'endereco': 'address', 'morada': 'address',
+    'price': 'price', 'preco': 'price', 'tarifa': 'price',
+    'power': 'power', 'potencia': 'power', 'power_kw': 'power', 'kw': 'power',
+    'available': 'available', 'disponivel': 'available', 'estado': 'available',
+    'latitude': 'latitude', 'lat': 'latitude',
+    'longitude': 'longitude', 'lon': 'longitude', 'lng': 'longitude',
+}
+
+UNAVAILABLE_VALUES = frozenset(('0', 'false', 'nao', 'no', 'n', 'indisponivel', 'offline', 'fora de servico'))
+
+UPSERT_SQL = '''
+    INSERT INTO charging_stations (id, location, address, price, power, available, latitude, longitude)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        location = excluded.location,
+        address = excluded.address,
+        price = excluded.price,
+        power = excluded.power,
+        available = excluded.available,
+        latitude = COALESCE(excluded.latitude, latitude),
+        longitude = COALESCE(excluded.longitude, longitude)
+    WHERE (location, address, price, power, available) IS NOT
+          (excluded.location, excluded.address, excluded.price, excluded.power, excluded.available)
+       OR excluded.latitude IS NOT COALESCE(latitude, excluded.latitude)
+       OR excluded.longitude IS NOT COALESCE(longitude, excluded.longitude)
+'''
+
+
+def iter_csv_records(f):
+    """Linhas de um CSV (separador ',' ou ';' detetado no cabeçalho)"""
+    header = f.readline()
+    delimiter = ';' if header.count(';') > header.count(',') else ','
+    fields = next(csv.reader([header], delimiter=delimiter))
+    yield from csv.DictReader(f, fieldnames=fields, delimiter=delimiter)
+
+
+def iter_ndjson_records(f):
+    """Um objeto JSON por linha"""
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_json_records(f):
+    """Objetos de um array JSON, lidos aos bocados (sem carregar o ficheiro).
+
+    Um registo malformado é saltado até ao fim do objeto e devolvido como o
+    erro (ValueError) no seu lugar, para ser contado como rejeitado.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    started = False
+    eof = False
+    error = None
+    while True:
+        if error is not None:
+            # A saltar um registo malformado
+            match = JSON_RECORD_END_RE.search(buffer, pos)
+            if match:
+                yield error
+                error = None
+                pos = match.end()
+                continue
+            if eof:
+                raise ValueError("Array JSON incompleto")
+            # Só o último '}' pode ainda ser o fim do registo
+            last = buffer.rfind('}', pos)
+            pos = last if last >= 0 else len(buffer)
+        else:
+            # Saltar espaços e separadores entre elementos
+            while pos < len(buffer) and (buffer[pos].isspace() or (started and buffer[pos] == ',')):
+                pos += 1
+            if pos < len(buffer):
+                if not started:
+                    if buffer[pos] != '[':
+                        raise ValueError("O ficheiro JSON deve conter um array de carregadores")
+                    started = True
+                    pos += 1
+                    continue
+                if buffer[pos] == ']':
+                    return
+                try:
+                    record, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError as e:
+                    # Sem o fim do ficheiro pode faltar só o resto do registo
+                    if eof or len(buffer) - pos > IMPORT_MAX_RECORD_BYTES:
+                        error = ValueError(f"JSON inválido: {e.msg}")
+                        continue
+                else:
+                    yield record
+                    pos = end
+                    continue
+            elif eof:
+                raise ValueError("Array JSON incompleto")
+        chunk = f.read(IMPORT_READ_SIZE)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+
+def detect_import_format(path, f):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.ndjson', '.jsonl'):
+        return 'ndjson'
+    # .json: array ou um objeto por linha, conforme o primeiro carácter
+    first = f.read(IMPORT_READ_SIZE).lstrip()[:1]
+    f.seek(0)
+    return 'ndjson' if first == '{' else 'json'
+
+
+IMPORT_READERS = {
+    'csv': iter_csv_records,
+    'json': iter_json_records,
+    'ndjson': iter_ndjson_records,
+}
+
+
+def import_float(value):
+    if isinstance(value, str):
+        value = value.strip().replace(',', '.')
+        if not value:
+            return None
+    return float(value) if value is not None else None
+
+
+def import_field_name(key):
+    """'Potência (kW)' -> 'potencia', 'Station ID' -> 'station_id'"""
+    name = re.sub(r'\(.*?\)', '', normalize_text(str(key))).strip()
+    return re.sub(r'[\s-]+', '_', name)
+
+
+def station_record(record, aliases):
+    """Converte um registo importado no tuplo de UPSERT_SQL (ValueError se inválido)"""
+    fields = {}
+    for key, value in record.items():
+        if key not in aliases:
+            aliases[key] = IMPORT_ALIASES.get(import_field_name(key))
+        field = aliases[key]
+        if field:
+            fields[field] = value
+    try:
+        station_id = str(fields['id']).strip()
+        location = str(fields['location']).strip()
+        address = str(fields['address']).strip()
+        price = import_float(fields['price'])
+        power = import_float(fields['power'])
+    except KeyError as e:
+        raise ValueError(f"campo em falta: {e.args[0]}")
+    if not station_id or not location or price is None or power is None:
+        raise ValueError("campos obrigatórios vazios")
+    available = fields.get('available', True)
+    if isinstance(available, str):
+        available = normalize_text(available.strip()) not in UNAVAILABLE_VALUES
+    latitude = import_float(fields.get('latitude'))
+    longitude = import_float(fields.get('longitude'))
+    if latitude is None or longitude is None:
+        latitude = longitude = None
+    return (station_id, location, address, price, int(round(power)), bool(available), latitude, longitude)
+
+
+# Alterações de disponibilidade/preço recebidas do exterior (price ou
+# available a None: campo não alterado)
+StationDelta = namedtuple('StationDelta', ['id', 'available', 'price', 'received'])
+
+UPDATE_BATCH_SIZE = 1000
+UPDATE_QUEUE_SIZE = 100000
+UPDATE_TAIL_INTERVAL = 0.2
+
+UPDATE_SQL = 'UPDATE charging_stations SET available = ?, price = ? WHERE id = ?'
+
+
+def parse_delta(record, received):
+    """Converte {'id', 'available'?, 'price'?} num StationDelta (ValueError se inválido)"""
+    if not isinstance(record, dict):
+        raise ValueError("alteração não é um objeto")
+    station_id = str(record.get('id') or '').strip()
+    if not station_id:
+        raise ValueError("id em falta")
+    available = record.get('available', record.get('disponivel'))
+    if isinstance(available, str):
+        available = normalize_text(available.strip()) not in UNAVAILABLE_VALUES
+    elif available is not None:
+        available = bool(available)
+    price = import_float(record.get('price', record.get('preco')))
+    if price is not None and price < 0:
+        raise ValueError("preço inválido")
+    if available is None and price is None:
+        raise ValueError("sem available nem price")
+    return StationDelta(station_id, available, price, received)
+
+
+class UpdateFeed:
+    """Alterações de disponibilidade e preço, aplicadas em lotes.
+
+    As alterações chegam por HTTP (/updates, só local ou com o token de
+    ZEUS_UPDATES_TOKEN), por um ficheiro seguido como o 'tail -f' ou pelo
+    stdin, um objeto JSON por linha. Uma thread de escrita junta tudo o que
+    estiver pendente numa só transação (várias alterações ao mesmo
+    carregador ficam numa), atualiza o índice em memória no lugar e
+    invalida só as entradas da cache das cidades afetadas.
+
+    Com vários processos (--asgi --workers N) isto só vale para o processo
+    que aplica o lote: os outros detetam a escrita pelo data_version do
+    SQLite e recarregam o índice inteiro e limpam toda a cache de
+    resultados, uma vez por lote.
+    """
+
+    def __init__(self, db, station_index, result_cache, batch_size=UPDATE_BATCH_SIZE,
+                 max_pending=UPDATE_QUEUE_SIZE):
+        self.db = db
+        self.station_index = station_index
+        self.result_cache = result_cache
+        self.batch_size = batch_size
+        self.queue = queue.Queue(max_pending)
+        self.lock = threading.Lock()
+        self.closed = False
+        self.started = time.monotonic()
+        self.metrics = {
+            'received': 0,
+            'rejected': 0,
+            'dropped': 0,
+            'applied': 0,
+            'changed': 0,
+            'unknown': 0,
+            'batches': 0,
+            'write_time_total': 0.0,
+            'lag_last': 0.0,
+            'lag_max': 0.0,
+            'lag_total': 0.0,
+        }
+        self.writer = threading.Thread(target=self._run, name='zeus-updates', daemon=True)
+        self.writer.start()
+
+    def submit(self, records):
+        """Põe alterações na fila de escrita; devolve (aceites, rejeitadas)"""
+        received = time.monotonic()
+        accepted = rejected = dropped = 0
+        for record in records:
+            try:
+                delta = parse_delta(record, received)
+            except (ValueError, TypeError):
+                rejected += 1
+                continue
+            try:
+                self.queue.put_nowait(delta)
+                accepted += 1
+            except queue.Full:
+                dropped += 1
+        with self.lock:
+            self.metrics['received'] += accepted
+            self.metrics['rejected'] += rejected
+            self.metrics['dropped'] += dropped
+        return accepted, rejected + dropped
+
+    def submit_line(self, line):
+        line = line.strip()
+        if not line:
+            return
+        try:
+            record = json.loads(line)
+        except ValueError:
+            with self.lock:
+                self.metrics['rejected'] += 1
+            return
+        self.submit(record if isinstance(record, list) else [record])
+
+    def follow_file(self, path, from_start=False):
+        """Segue um ficheiro de alterações (como 'tail -f', tolera rotação)"""
+        threading.Thread(target=self._tail, args=(path, from_start), name='zeus-updates-tail',
+                         daemon=True).start()
+        log.info("📡 A seguir alterações em %s", path)
+
+    def follow_stream(self, stream):
+        """Lê alterações de um stream (ex.: stdin) até ao fim"""
+        def read():
+            for line in stream:
+                self.submit_line(line)
+        threading.Thread(target=read, name='zeus-updates-stream', daemon=True).start()
+
+    def _tail(self, path, from_start):
+        f = None
+        inode = None
+        partial = ''
+        while not self.closed:
+            if f is None:
+                try:
+                    f = open(path, encoding='utf-8')
+                except FileNotFoundError:
+                    # Quando o ficheiro aparecer, todo o seu conteúdo é novo
+                    from_start = True
+                    time.sleep(UPDATE_TAIL_INTERVAL)
+                    continue
+                inode = os.fstat(f.fileno()).st_ino
+                if not from_start:
+                    f.seek(0, os.SEEK_END)
+                from_start = True  # ficheiros novos (rotação) são lidos desde o início
+            line = f.readline()
+            if line:
+                partial += line
+                if partial.endswith('\n'):
+                    self.submit_line(partial)
+                    partial = ''
+                continue
+            try:
+                stat = os.stat(path)
+                rotated = stat.st_ino != inode or stat.st_size < f.tell()
+            except FileNotFoundError:
+                rotated = True
+            if rotated:
+                f.close()
+                f = None
+                partial = ''
+            else:
+                time.sleep(UPDATE_TAIL_INTERVAL)
+        if f is not None:
+            f.close()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            # Tudo o que chegou entretanto vai na mesma transação
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                return
+            try:
+                self._apply(batch)
+            except Exception as e:
+                log.error("❌ Erro ao aplicar alterações: %s", e)
+
+    def _apply(self, batch):
+        started = time.monotonic()
+        self.station_index.refresh_if_changed()
+        merged = {}
+        for delta in batch:
+            fields = merged.setdefault(delta.id, {})
+            if delta.available is not None:
+                fields['available'] = delta.available
+            if delta.price is not None:
+                fields['price'] = delta.price
+        
+        # Comparar com o índice: alterações sem efeito não chegam à base de dados
+        updates = {}
+        rows = []
+        unknown = 0
+        for station_id, fields in merged.items():
+            station = self.station_index.by_id.get(station_id)
+            if station is None:
+                unknown += 1
+                continue
+            available = fields.get('available', station['available'])
+            price = fields.get('price', station['price'])
+            if available != station['available'] or price != station['price']:
+                updates[station_id] = {'available': available, 'price': price}
+                rows.append((available, price, station_id))
+        
+        if rows:
+            with self.db.connection() as conn:
+                conn.executemany(UPDATE_SQL, rows)
+            locations = self.station_index.apply_updates(updates)
+            self.result_cache.invalidate_tags(
+                [('city', location) for location in locations] + [CACHE_GLOBAL_TAG])
+        
+        finished = time.monotonic()
+        lag = finished - min(delta.received for delta in batch)
+        with self.lock:
+            metrics = self.metrics
+            metrics['batches'] += 1
+            metrics['applied'] += len(batch)
+            metrics['changed'] += len(rows)
+            metrics['unknown'] += unknown
+            metrics['write_time_total'] += finished - started
+            metrics['lag_last'] = lag
+            metrics['lag_max'] = max(metrics['lag_max'], lag)
+            metrics['lag_total'] += lag
+
+    def stats(self):
+        with self.lock:
+            metrics = dict(self.metrics)
+        batches = metrics['batches']
+        write_time = metrics.pop('write_time_total')
+        lag_total = metrics.pop('lag_total')
+        metrics['pending'] = self.queue.qsize()
+        metrics['updates_per_second'] = round(metrics['applied'] / write_time, 1) if write_time else 0.0
+        metrics['lag_last_ms'] = round(metrics.pop('lag_last') * 1000, 2)
+        metrics['lag_max_ms'] = round(metrics.pop('lag_max') * 1000, 2)
+        metrics['lag_avg_ms'] = round(lag_total / batches * 1000, 2) if batches else 0.0
+        return metrics
+
+    def close(self):
+        self.closed = True
+        self.queue.put(None)
+
+
+# API de consulta só de texto (/api/query e /api/query/batch)
+API_DEFAULT_LIMIT = 5
+API_MAX_LIMIT = 50
+API_BATCH_MAX = 10000
+
+# Parâmetros da API que descrevem o carregamento a estimar (campo de ChargeRequest)
+API_CHARGE_PARAMS = {
+    'kwh': 'energy_kwh',
+    'soc': 'soc',
+    'target_soc': 'target_soc',
+    'battery_kwh': 'battery_kwh',
+    'vehicle_kw': 'vehicle_kw',
+}
+
+TEXT_ONLY_MESSAGE = "Áudio desativado: o ZEUS está em modo só texto"
+
+
+def create_tts_engine():
+    """Motor pyttsx3 com voz portuguesa (se existir)"""
+    engine = pyttsx3.init()
+    voices = engine.getProperty('voices')
+    # Set Portuguese voice if available
+    for voice in voices:
+        if 'pt' in voice.languages:
+            engine.setProperty('voice', voice.id)
+            break
+    engine.setProperty('rate', 150)
+    return engine
+
 
 class EVChargingFinder:
-    def __init__(self):
-        # Initialize speech recognizer
-        self.recognizer = sr.Recognizer()
-        
-        # Configure for M3 Mac
-        sr.AudioData.FLAC_CONVERTER = "flac"
-        sr.AudioData.FLAC_CONVERTER_PATHNAME = "/opt/homebrew/bin/flac"
-        
-        # Initialize text-to-speech engine with Portuguese
-        self.tts_engine = pyttsx3.init()
-        voices = self.tts_engine.getProperty('voices')
-        # Set Portuguese voice if available
-        for voice in voices:
-            if 'pt' in voice.languages:
-                self.tts_engine.setProperty('voice', voice.id)
-                break
-        self.tts_engine.setProperty('rate', 150)
+    def __init__(self, recognizer_backend=None, streaming=False, asr='google', asr_model=None, asr_workers=1,
+                 text_only=False, warm_up=False, max_utterance=CAPTURE_MAX_SECONDS, capture_overflow='stop'):
+        setup_logging()
+        # Tempo de arranque (ms) de cada subsistema, incluindo os carregados mais tarde
+        self.startup_timings = OrderedDict()
+        # Em modo só texto as bibliotecas de áudio nunca são importadas
+        self.text_only = text_only
+        
+        # Reconhecimento de voz: criado no primeiro uso (ver recognizer_backend)
+        self._recognizer = None
+        self._recognizer_backend = recognizer_backend
+        self.asr_config = (asr, asr_model, asr_workers)
+        self.init_lock = threading.RLock()
+        # Em modo streaming o áudio é reconhecido enquanto o utilizador fala
+        self.streaming = streaming
+        
+        # Uma única thread de síntese, que cria o motor pyttsx3 quando for preciso
+        self.tts = None if text_only else TTSWorker(
+            lambda: self.load_subsystem('tts', create_tts_engine))
+        # Assina os textos das respostas: /speech só sintetiza o que o servidor produziu
+        # (os processos ASGI partilham a chave por ZEUS_SPEECH_KEY)
+        self.speech_key = (os.environ.get('ZEUS_SPEECH_KEY') or secrets.token_hex(32)).encode('utf-8')
         
         # Initialize SQLite database
-        self.db_path = 'charging_stations.db'
-        self.init_database()
+        with self.startup_step('db'):
+            self.db_path = 'charging_stations.db'
+            self.db = ConnectionManager(self.db_path)
+            self.init_database()
         
-        # Variáveis para controle de gravação contínua
-        self.is_recording = False
-        self.recording_thread = None
-        self.audio_queue = queue.Queue()
-        self.stop_recording = threading.Event()
+        # Índice em memória para buscas por localização
+        with self.startup_step('index'):
+            self.station_index = StationIndex(self.db)
+            self.station_index.load()
+        
+        # Cache de resultados, invalidada sempre que a tabela muda
+        self.result_cache = ResultCache(maxsize=1024, ttl=60.0)
+        self.station_index.add_listener(self.result_cache.clear)
         
-        # Initialize Flask app
-        self.app = Flask(__name__)
-        self.setup_routes()
+        # Modelos das respostas compilados uma vez, com cache dos textos gerados
+        self.responses = ResponseRenderer()
+        
+        # Alterações de disponibilidade/preço aplicadas sem recarregar o índice
+        self.updates = UpdateFeed(self.db, self.station_index, self.result_cache)
+        
+        # Sessões de gravação contínua (uma por cliente)
+        self.sessions = SessionManager()
+        
+        # Perfis de ruído do microfone do servidor, calibrados uma vez por formato
+        self.noise_profiles = {}
+        
+        # Cada gravação escreve num buffer com a duração máxima de uma elocução
+        if capture_overflow not in CAPTURE_OVERFLOW_POLICIES:
+            raise ValueError(f"Política de overflow desconhecida: {capture_overflow}")
+        self.max_utterance = max_utterance
+        self.capture_overflow = capture_overflow
+        self.console_capture = None
+        
+        # Buffers pré-alocados para o áudio enviado pelos browsers
+        self.upload_buffers = None
+        if not text_only:
+            with self.startup_step('buffers'):
+                self.upload_buffers = PCMBufferPool(
+                    UPLOAD_BUFFERS, UPLOAD_SAMPLE_RATE * 2 * UPLOAD_MAX_SECONDS)
+        
+        # A aplicação Flask é criada no primeiro uso (ver app)
+        self._app = None
         self.running = True
+        
+        log.info("⏱️ Arranque: %s", ", ".join(f"{name} {ms} ms" for name, ms in self.startup_timings.items()))
+        if warm_up:
+            threading.Thread(target=self.warm_up, name='zeus-warm-up', daemon=True).start()
+
+    @contextmanager
+    def startup_step(self, name):
+        started = time.perf_counter()
+        yield
+        self.startup_timings[name] = round((time.perf_counter() - started) * 1000, 2)
+
+    def load_subsystem(self, name, factory):
+        """Cria um subsistema preguiçoso e regista o tempo que demorou"""
+        with self.startup_step(name):
+            return factory()
+
+    @property
+    def recognizer(self):
+        if self._recognizer is None:
+            if self.text_only:
+                raise Exception(TEXT_ONLY_MESSAGE)
+            with self.init_lock:
+                if self._recognizer is None:
+                    # Configure for M3 Mac
+                    sr.AudioData.FLAC_CONVERTER = "flac"
+                    sr.AudioData.FLAC_CONVERTER_PATHNAME = "/opt/homebrew/bin/flac"
+                    self._recognizer = sr.Recognizer()
+        return self._recognizer
+
+    @property
+    def recognizer_backend(self):
+        """Motor de reconhecimento: carregado uma única vez e mantido quente"""
+        if self._recognizer_backend is None:
+            if self.text_only:
+                raise Exception(TEXT_ONLY_MESSAGE)
+            with self.init_lock:
+                if self._recognizer_backend is None:
+                    self._recognizer_backend = self.load_subsystem('asr', self.create_recognizer)
+        return self._recognizer_backend
+
+    def create_recognizer(self):
+        asr, asr_model, asr_workers = self.asr_config
+        return create_recognizer_backend(asr, self.recognizer, asr_model, asr_workers)
+
+    @property
+    def app(self):
+        """Aplicação Flask (não é importada nos modos consola e ASGI sem página)"""
+        if self._app is None:
+            with self.init_lock:
+                if self._app is None:
+                    def create_app():
+                        app = flask.Flask(__name__)
+                        app.config['MAX_CONTENT_LENGTH'] = REQUEST_MAX_BYTES
+                        self._app = app
+                        self.setup_routes()
+                        return app
+                    self.load_subsystem('flask', create_app)
+        return self._app
+
+    def warm_up(self):
+        """Carregar em segundo plano o que os primeiros pedidos vão precisar"""
+        try:
+            if not self.text_only:
+                self.recognizer_backend
+                self.tts.warm_up()
+            self.app
+            self.execute_sql_query(*self.text_to_sql('carregador em lisboa'))
+            log.info("🔥 Aquecimento concluído")
+        except Exception as e:
+            log.error("❌ Erro no aquecimento: %s", e)
+
+    def vad_available(self, source):
+        return numpy_available() and source.SAMPLE_WIDTH == 2
+
+    def noise_profile(self, source):
+        """Perfil de ruído do microfone: calibrado na primeira gravação e reutilizado"""
+        key = (source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+        profile = self.noise_profiles.get(key)
+        if profile is None:
+            with self.init_lock:
+                profile = self.noise_profiles.get(key)
+                if profile is None:
+                    log.info("🔊 Calibrando para ruído ambiente...")
+                    size = source.SAMPLE_RATE * source.SAMPLE_WIDTH * VAD_CALIBRATION_MS // 1000
+                    pcm = bytearray()
+                    while len(pcm) < size:
+                        pcm += source.stream.read(source.CHUNK)
+                    profile = self.noise_profiles[key] = calibrate_noise(pcm, source.SAMPLE_RATE)
+                    log.info("✅ Calibração concluída (ruído %.1f dBFS)", profile.energy_db)
+        return profile
+
+    def create_endpointer(self, source):
+        """Endpointer para o microfone, ou None sem NumPy ou com amostras que não são de 16 bits"""
+        if not self.vad_available(source):
+            return None
+        return Endpointer(self.noise_profile(source), source.SAMPLE_RATE)
+
+    def capture_utterance(self, source, sink, stop=None, no_speech_timeout=None):
+        """Lê o microfone e entrega a fala a sink até ao fim da elocução ou até stop.
+
+        Devolve True se a captura terminou sozinha (fim da fala, duração
+        máxima, ou sink devolveu False); sem deteção de voz todo o áudio é
+        entregue até stop.
+        """
+        endpointer = self.create_endpointer(source)
+        while stop is None or not stop.is_set():
+            chunk = source.stream.read(source.CHUNK)
+            if endpointer is None:
+                if sink(chunk) is False:
+                    return True
+                continue
+            speech = endpointer.feed(chunk)
+            if speech and sink(speech) is False:
+                endpointer.ended = True
+            if endpointer.ended or endpointer.elapsed >= self.sessions.max_recording_seconds:
+                METRICS.inc('zeus_vad_endpoints_total')
+                METRICS.inc('zeus_vad_trimmed_seconds_total', endpointer.trimmed, source='microphone')
+                return True
+            if not endpointer.started and no_speech_timeout and endpointer.elapsed >= no_speech_timeout:
+                raise sr.WaitTimeoutError("listening timed out while waiting for phrase to start")
+        if endpointer is not None:
+            METRICS.inc('zeus_vad_trimmed_seconds_total', endpointer.trimmed, source='microphone')
+        return False
+
+    def capture_buffer(self, source, buffer=None):
+        """CaptureBuffer para o formato do microfone; reutiliza buffer se tiver o tamanho certo"""
+        capacity = int(self.max_utterance * source.SAMPLE_RATE) * source.SAMPLE_WIDTH
+        if buffer is None or len(buffer.data) != capacity:
+            buffer = CaptureBuffer(capacity, self.capture_overflow)
+        buffer.reset()
+        return buffer
+
+    def captured_audio(self, buffer, source):
+        """sr.AudioData sobre o conteúdo do buffer (memoryview, sem cópia); None se vazio"""
+        if buffer.dropped:
+            METRICS.inc('zeus_capture_overflows_total', policy=buffer.overflow)
+            log.warning("⚠️ Elocução com mais de %s s (%s)", self.max_utterance, buffer.overflow)
+        if not buffer.length:
+            return None
+        return sr.AudioData(buffer.contents(), source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+
+    def capture_audio(self, source, no_speech_timeout=None):
+        """Uma elocução do microfone, já sem o silêncio à volta"""
+        if not self.vad_available(source):
+            # Sem NumPy: deteção de fala do speech_recognition (limiar dinâmico)
+            return self.recognizer.listen(source, timeout=no_speech_timeout,
+                                          phrase_time_limit=self.max_utterance)
+        self.console_capture = self.capture_buffer(source, self.console_capture)
+        self.capture_utterance(source, self.console_capture.write, no_speech_timeout=no_speech_timeout)
+        return self.captured_audio(self.console_capture, source)
 
     def listen_for_command(self):
         """Método original para uso em linha de comando"""
+        if self.text_only:
+            try:
+                return input("⌨️ Comando: ").strip()
+            except EOFError:
+                return None
         with sr.Microphone() as source:
             print("\n=== Sistema de Reconhecimento de Voz ===")
-            print("🎤 Ajustando microfone...")
-            
-            # Ajustes para captura mais completa
-            self.recognizer.dynamic_energy_threshold = False
-            self.recognizer.energy_threshold = 1000
-            self.recognizer.pause_threshold = 1.2
-            self.recognizer.phrase_threshold = 0.3
-            self.recognizer.non_speaking_duration = 1.0
-            
-            # Ajuste de ruído com feedback
-            print("🔊 Calibrando para ruído ambiente...")
-            self.recognizer.adjust_for_ambient_noise(source, duration=1)
-            print("✅ Calibração concluída")
+            if self.vad_available(source):
+                # Só na primeira vez; as tentativas seguintes reutilizam o perfil
+                self.noise_profile(source)
             
             max_attempts = 3  # Limite máximo de tentativas
             attempt = 0
@@ -69,10 +3162,11 @@ class EVChargingFinder:
             while attempt < max_attempts:
                 try:
                     print("\n🎙️  Pode falar agora...")
-                    audio = self.recognizer.listen(source, timeout=10, phrase_time_limit=None)
+                    audio = self.capture_audio(source, no_speech_timeout=VAD_NO_SPEECH_TIMEOUT)
                     print("🔍 Processando áudio...")
                     
-                    command = self.recognizer.recognize_google(audio, language='pt-PT')
+                    with METRICS.stage('asr'):
+                        command = self.recognizer_backend.recognize(audio)
                     print("\n📝 Texto reconhecido:")
                     print(f"==> {command}")
                     
@@ -88,134 +3182,224 @@ class EVChargingFinder:
                             print(f"Tentativa {attempt + 1} de {max_attempts}...")
                         continue
                         
-                except sr.WaitTimeoutError:
+                except sr.WaitTimeoutError as e:
+                    self.count_recognition_failure(e)
                     print("❌ Nenhuma fala detectada no tempo limite")
                     return None
-                except sr.UnknownValueError:
+                except sr.UnknownValueError as e:
+                    self.count_recognition_failure(e)
                     print("❌ Não foi possível entender o áudio, tente novamente")
                     attempt += 1
                     if attempt < max_attempts:
                         print(f"Tentativa {attempt + 1} de {max_attempts}...")
                     continue
                 except sr.RequestError as e:
-                    print(f"❌ Erro na requisição ao Google: {str(e)}")
+                    self.count_recognition_failure(e)
+                    print(f"❌ Erro no motor de reconhecimento ({self.recognizer_backend.name}): {str(e)}")
                     return None
                 except Exception as e:
+                    self.count_recognition_failure(e)
                     print(f"❌ Erro inesperado: {str(e)}")
                     return None
             
             print("\n❌ Número máximo de tentativas atingido")
             return None
     
-    def start_continuous_recording(self):
-        """Inicia gravação contínua em thread separada"""
-        if self.is_recording:
-            return
-            
-        self.is_recording = True
-        self.stop_recording.clear()
-        self.audio_queue = queue.Queue()
+    def start_continuous_recording(self, session):
+        """Inicia gravação contínua da sessão em thread separada"""
+        if self.text_only:
+            raise Exception(TEXT_ONLY_MESSAGE)
+        # Esperar que o reconhecimento anterior acabe: ele lê o CaptureBuffer
+        # da sessão (sem cópia), que a nova gravação vai reutilizar
+        with session.recognition_lock, session.lock:
+            if session.is_recording:
+                return
+            session.is_recording = True
+            session.recording_started = time.monotonic()
+        session.reset_recognition()
+        session.stop_recording.clear()
+        session.audio_queue = queue.Queue(maxsize=1)
+        session.streaming_recognition = None
+        session.auto_stopped = False
         
         def record_audio():
             try:
                 with sr.Microphone() as source:
-                    print("🎤 Iniciando gravação contínua...")
-                    
-                    # Configurações básicas
-                    self.recognizer.dynamic_energy_threshold = False
-                    self.recognizer.energy_threshold = 300
-                    
-                    # Ajuste rápido de ruído
-                    print("🔊 Ajustando ruído ambiente...")
-                    self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                    print("✅ Pronto para gravar")
-                    
-                    # Gravar em chunks pequenos continuamente
-                    audio_data = []
-                    while not self.stop_recording.is_set():
-                        try:
-                            # Capturar chunk pequeno de áudio (1 segundo)
-                            chunk = self.recognizer.listen(source, timeout=1, phrase_time_limit=1)
-                            audio_data.append(chunk.frame_data)
-                            print("📼 Chunk gravado...")
-                        except sr.WaitTimeoutError:
-                            # Timeout é normal, continuar gravando
-                            continue
-                        except Exception as e:
-                            print(f"⚠️ Erro no chunk: {e}")
-                            continue
-                    
-                    # Combinar todos os chunks em um único áudio
-                    if audio_data:
-                        print("🔗 Combinando áudio gravado...")
-                        combined_data = b''.join(audio_data)
-                        combined_audio = sr.AudioData(combined_data, source.SAMPLE_RATE, source.SAMPLE_WIDTH)
-                        self.audio_queue.put(combined_audio)
-                        print("✅ Áudio combinado e pronto para processamento")
+                    log.info("🎤 Iniciando gravação contínua (sessão %s)...", session.id[:8])
                     
+                    if self.streaming:
+                        # Enviar a fala para o reconhecimento à medida que é capturada
+                        pipeline = StreamingRecognition(self.recognizer_backend,
+                                                        source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+                        session.streaming_recognition = pipeline
+                        ended = self.capture_utterance(source, pipeline.feed, stop=session.stop_recording)
+                        captured = pipeline
+                    else:
+                        # Buffer pré-alocado: a memória da sessão não cresce com a gravação
+                        session.capture = buffer = self.capture_buffer(source, session.capture)
+                        ended = self.capture_utterance(source, buffer.write, stop=session.stop_recording)
+                        # Sem fala não há nada a reconhecer
+                        captured = (self.captured_audio(buffer, source)
+                                    or sr.UnknownValueError("Nenhuma fala detetada"))
+                    session.auto_stopped = ended
+                    session.audio_queue.put(captured)
+            except BufferError as e:
+                # Elocução demasiado longa (política 'error'): o erro é o resultado
+                log.warning("⚠️ %s (sessão %s)", e, session.id[:8])
+                METRICS.inc('zeus_capture_overflows_total', policy='error')
+                session.auto_stopped = ended = True
+                session.audio_queue.put(e)
             except Exception as e:
-                print(f"❌ Erro na gravação: {e}")
-                self.audio_queue.put(None)
+                log.error("❌ Erro na gravação: %s", e)
+                if session.streaming_recognition is not None:
+                    # Libertar a thread consumidora do reconhecimento
+                    session.streaming_recognition.buffer.close()
+                session.audio_queue.put(None)
+                return
+            
+            if ended:
+                # Fim da elocução detetado: reconhecer sem esperar por /stop_recording
+                log.debug("🔚 Fim da fala detetado (sessão %s)", session.id[:8])
+                try:
+                    self.stop_and_recognize(session)
+                except Exception:
+                    pass  # o erro fica publicado na sessão
         
-        self.recording_thread = threading.Thread(target=record_audio, daemon=True)
-        self.recording_thread.start()
-        print("🎙️ Gravação contínua iniciada")
+        session.recording_thread = threading.Thread(target=record_audio, daemon=True)
+        session.recording_thread.start()
+        log.debug("🎙️ Gravação contínua iniciada")
     
-    def stop_continuous_recording(self):
-        """Para a gravação contínua e retorna o áudio"""
-        if not self.is_recording:
-            return None
+    def stop_continuous_recording(self, session):
+        """Para a gravação contínua da sessão e retorna o áudio"""
+        with session.lock:
+            if not session.is_recording:
+                return None
+            session.is_recording = False
             
-        print("🛑 Parando gravação...")
-        self.stop_recording.set()
-        self.is_recording = False
+        log.debug("🛑 Parando gravação...")
+        session.stop_recording.set()
         
         # Aguardar o áudio processado
         try:
-            audio = self.audio_queue.get(timeout=5)
+            with METRICS.stage('capture'):
+                audio = session.audio_queue.get(timeout=5)
             if audio is None:
                 raise Exception("Erro na captura de áudio")
+            if isinstance(audio, Exception):
+                raise audio
             return audio
         except queue.Empty:
             raise Exception("Timeout ao processar áudio")
     
-    def listen_for_web(self):
-        """Método para uso na interface web - gravação contínua controlada pelo usuário"""
+    def stop_and_recognize(self, session):
+        """Para a gravação contínua da sessão e devolve o texto reconhecido"""
+        with session.recognition_lock:
+            if session.auto_stopped and not session.is_recording:
+                # A gravação terminou sozinha e já foi reconhecida: devolver o resultado
+                return self.recognition_result(session)
+            return self._stop_and_recognize(session)
+    
+    def _stop_and_recognize(self, session):
         try:
-            # Iniciar gravação contínua
-            self.start_continuous_recording()
-            
-            # Aguardar até que o usuário pare a gravação
-            # (isso será controlado pela interface web)
-            while self.is_recording:
-                time.sleep(0.1)
-            
-            # Obter o áudio gravado
-            audio = self.stop_continuous_recording()
-            
-            if audio is None:
+            captured = self.stop_continuous_recording(session)
+            if captured is None:
                 raise Exception("Nenhum áudio foi capturado")
             
-            print("🔍 Processando áudio capturado...")
+            log.debug("🔍 Processando áudio capturado...")
+            with METRICS.stage('asr'):
+                if isinstance(captured, StreamingRecognition):
+                    # O reconhecimento já decorreu durante a gravação
+                    command = captured.finish()
+                else:
+                    command = self.recognizer_backend.recognize(captured)
+        except Exception as e:
+            self.count_recognition_failure(e)
+            session.finish_recognition(error=e)
+            raise
+        log.info("✅ Texto reconhecido: %s", command)
+        command = command.lower().strip()
+        session.finish_recognition(text=command)
+        return command
+    
+    def get_partial_transcript(self, session):
+        """Transcrição parcial da gravação em curso (apenas em modo streaming)"""
+        pipeline = session.streaming_recognition
+        if pipeline is None or not session.is_recording:
+            return ''
+        return pipeline.partial_text
+    
+    def recognize_upload(self, session, body, sample_rate, final):
+        """Recebe um pedaço de áudio do cliente; devolve o texto se final=True,
+        senão a transcrição parcial"""
+        with session.lock:
+            try:
+                if session.upload is None:
+                    if session.upload_expired:
+                        session.upload_expired = False
+                        raise Exception("Envio de áudio expirado por inatividade, recomece a gravação")
+                    if not self.upload_buffers.available():
+                        # Conjunto esgotado: recuperar já os buffers dos envios abandonados
+                        self.sessions.expire_uploads()
+                    session.upload = AudioUpload(self.upload_buffers, self.recognizer_backend, sample_rate)
+                upload = session.upload
+                with METRICS.stage('capture'):
+                    upload.receive(body)
+                if not final:
+                    return upload.partial()
+                session.upload = None
+                try:
+                    with METRICS.stage('asr'):
+                        command = upload.finish()
+                finally:
+                    upload.release()
+            except Exception as e:
+                self.count_recognition_failure(e)
+                if session.upload is not None:
+                    session.upload.release()
+                    session.upload = None
+                raise
+        log.info("✅ Texto reconhecido: %s", command)
+        return command.lower().strip()
+    
+    def listen_for_web(self, session):
+        """Método para uso na interface web - gravação contínua controlada pelo usuário"""
+        try:
+            # Iniciar gravação contínua
+            self.start_continuous_recording(session)
             
-            # Reconhecer comando usando Google Speech Recognition
-            command = self.recognizer.recognize_google(audio, language='pt-PT')
-            print(f"✅ Texto reconhecido: {command}")
-            return command.lower().strip()
-                
-        except sr.UnknownValueError:
-            print("❌ Erro: Não foi possível entender o áudio")
-            raise Exception("Não foi possível entender o áudio. Tente falar mais claramente.")
-        except sr.RequestError as e:
-            print(f"❌ Erro na requisição ao Google: {str(e)}")
-            raise Exception(f"Erro na requisição ao Google: {str(e)}")
+            # Aguardar (sem polling) que o usuário pare a gravação pela interface
+            # web: /stop_recording reconhece o áudio e publica o resultado
+            if not session.recognized.wait(self.sessions.max_recording_seconds + 10):
+                raise Exception("Tempo máximo de gravação excedido")
+            return self.recognition_result(session)
         except Exception as e:
-            print(f"❌ Erro inesperado: {str(e)}")
-            raise Exception(f"Erro inesperado: {str(e)}")
+            raise self.recognition_error(e)
+    
+    def recognition_result(self, session):
+        """Texto publicado pelo último reconhecimento da sessão"""
+        if session.last_error is not None:
+            raise session.last_error
+        return session.last_text
+    
+    def count_recognition_failure(self, error):
+        METRICS.inc('zeus_recognition_failures_total', reason=type(error).__name__)
+    
+    def recognition_error(self, error):
+        """Converte erros de reconhecimento em mensagens para o utilizador"""
+        if self.text_only:
+            return error
+        if isinstance(error, sr.UnknownValueError):
+            log.warning("❌ Erro: Não foi possível entender o áudio")
+            return Exception("Não foi possível entender o áudio. Tente falar mais claramente.")
+        if isinstance(error, sr.RequestError):
+            log.error("❌ Erro no motor de reconhecimento (%s): %s", self.recognizer_backend.name, error)
+            return Exception(f"Erro no motor de reconhecimento: {str(error)}")
+        log.error("❌ Erro inesperado: %s", error)
+        return Exception(f"Erro inesperado: {str(error)}")
 
     def init_database(self):
         # Inicializar o banco de dados SQLite
-        with sqlite3.connect(self.db_path) as conn:
+        with self.db.connection() as conn:
             cursor = conn.cursor()
             
             # Criar tabela se não existir
@@ -231,8 +3415,8 @@ class EVChargingFinder:
             ''')
             
             # Verificar se já existem dados
-            cursor.execute('SELECT COUNT(*) FROM charging_stations')
-            if cursor.fetchone()[0] == 0:
+            cursor.execute('SELECT 1 FROM charging_stations LIMIT 1')
+            if cursor.fetchone() is None:
                 # Inserir dados realistas baseados na rede mobiE
                 cursor.execute('''
                     INSERT INTO charging_stations (id, location, address, price, power, available)
@@ -296,362 +3480,839 @@ class EVChargingFinder:
                         ('MOBI-VIS-001', 'Viseu', 'Rua Direita 76', 0.28, 22, true),
                         ('MOBI-VIS-002', 'Viseu', 'Palácio do Gelo Shopping - Rua Cidade de Ourém', 0.37, 50, true)
                 ''')
-                conn.commit()
-    
-    def get_charging_stations(self, location):
-        # Buscar carregadores por localização
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Normalizar acentos para a busca
-            def normalize_text(text):
-                replacements = {
-                    'á': 'a', 'à': 'a', 'â': 'a', 'ã': 'a',
-                    'é': 'e', 'ê': 'e',
-                    'í': 'i',
-                    'ó': 'o', 'ô': 'o', 'õ': 'o',
-                    'ú': 'u', 'ü': 'u',
-                    'ç': 'c'
-                }
-                text = text.lower()
-                for accented, normal in replacements.items():
-                    text = text.replace(accented, normal)
-                return text
             
-            # Buscar com normalização de acentos
-            cursor.execute('''
-                SELECT id, location, address, price, power, available
-                FROM charging_stations
+            # Base de dados já migrada: o arranque não repete migrações nem ANALYZE
+            if conn.execute('PRAGMA user_version').fetchone()[0] < SCHEMA_VERSION:
+                self.migrate_database(conn)
+    
+    def migrate_database(self, conn):
+        """Aplica as migrações de esquema (pode ser executado várias vezes)"""
+        existing = {row[1] for row in conn.execute('PRAGMA table_xinfo(charging_stations)')}
+        for column, definition in SCHEMA_COLUMNS:
+            if column not in existing:
+                log.info("🛠️ Migração: a adicionar coluna %s", column)
+                conn.execute(f'ALTER TABLE charging_stations ADD COLUMN {column} {definition}')
+        for statement in SCHEMA_INDEXES:
+            conn.execute(statement)
+        
+        fts_exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stations_fts'"
+        ).fetchone()
+        if not fts_exists:
+            log.info("🛠️ Migração: a criar índice de texto integral dos endereços")
+            conn.execute(FTS_TABLE)
+            conn.execute("INSERT INTO stations_fts (stations_fts) VALUES ('rebuild')")
+        for statement in FTS_TRIGGERS:
+            conn.execute(statement)
+        
+        rtree_exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stations_rtree'"
+        ).fetchone()
+        if not rtree_exists:
+            log.info("🛠️ Migração: a criar índice espacial")
+            conn.execute(RTREE_TABLE)
+            conn.execute('''
+                INSERT INTO stations_rtree
+                SELECT rowid, latitude, latitude, longitude, longitude FROM charging_stations
+                WHERE latitude IS NOT NULL AND longitude IS NOT NULL
             ''')
-            
-            all_stations = cursor.fetchall()
-            normalized_location = normalize_text(location)
-            
-            stations = []
-            for row in all_stations:
-                if normalize_text(row[1]) == normalized_location:
-                    stations.append({
-                        'id': row[0],
-                        'location': row[1],
-                        'address': row[2],
-                        'price': row[3],
-                        'power': row[4],
-                        'available': bool(row[5])
-                    })
-            
-            return stations
+        for statement in RTREE_TRIGGERS:
+            conn.execute(statement)
+        # Coordenadas da carga inicial (os triggers atualizam o índice espacial)
+        conn.executemany(
+            'UPDATE charging_stations SET latitude = ?, longitude = ? WHERE id = ? AND latitude IS NULL',
+            [(lat, lon, station_id) for station_id, (lat, lon) in SEED_COORDINATES.items()]
+        )
+        conn.execute('ANALYZE charging_stations')
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
     
-    def text_to_sql(self, command):
-        """Converte texto natural em query SQL usando AI local"""
-        command = command.lower().strip()
-        print(f"Convertendo comando para SQL: {command}")
-        
-        # Schema da tabela para contexto
-        schema_info = """
-        Tabela: charging_stations
-        Colunas:
-        - id (VARCHAR): Identificador único do carregador
-        - location (VARCHAR): Cidade onde está localizado
-        - address (VARCHAR): Endereço completo
-        - price (DECIMAL): Preço por kWh em euros
-        - power (INTEGER): Potência em kW
-        - available (BOOLEAN): Se está disponível
-        
-        Cidades disponíveis: Lisboa, Porto, Matosinhos, Coimbra, Braga, Aveiro, Faro, Évora, Setúbal, Leiria, Viseu
-        """
+    def import_stations(self, path, fmt=None, chunk_size=IMPORT_CHUNK_SIZE):
+        """Importa (upsert por id) um catálogo CSV/JSON/NDJSON numa só transação.
         
-        # Padrões de conversão baseados em regras inteligentes
-        sql_patterns = {
-            # Busca por "em cidade" ou "do/da cidade" (mais específico)
-            r'(?:em|no|na|de|para|do|da)\s+(\w+)':
-                lambda m: f"SELECT * FROM charging_stations WHERE LOWER(location) LIKE '%{m.group(1).lower()}%' ORDER BY price ASC",
-            
-            # Busca por "melhor carregador do/da cidade"
-            r'(?:melhor|bom).*?(?:carregador|posto).*?(?:do|da)\s+(\w+)':
-                lambda m: f"SELECT * FROM charging_stations WHERE LOWER(location) LIKE '%{m.group(1).lower()}%' ORDER BY price ASC LIMIT 1",
-            
-            # Busca por cidade específica
-            r'(?:carregador|posto|carregamento).*?(?:em|no|na|de|para)\s+(\w+)': 
-                lambda m: f"SELECT * FROM charging_stations WHERE LOWER(location) LIKE '%{m.group(1).lower()}%' ORDER BY price ASC",
-            
-            # Busca por preço
-            r'(?:mais\s+)?(?:barato|económico|menor\s+preço)(?:.*?(?:em|no|na|de|para)\s+(\w+))?':
-                lambda m: f"SELECT * FROM charging_stations WHERE LOWER(location) LIKE '%{m.group(1).lower() if m.group(1) else ''}%' ORDER BY price ASC LIMIT 1" if m.group(1) else "SELECT * FROM charging_stations ORDER BY price ASC LIMIT 1",
-            
-            # Busca por potência
-            r'(?:mais\s+)?(?:rápido|potente|alta\s+potência)(?:.*?(?:em|no|na|de|para)\s+(\w+))?':
-                lambda m: f"SELECT * FROM charging_stations WHERE LOWER(location) LIKE '%{m.group(1).lower() if m.group(1) else ''}%' ORDER BY power DESC LIMIT 1" if m.group(1) else "SELECT * FROM charging_stations ORDER BY power DESC LIMIT 1",
-            
-            # Busca por potência específica
-            r'(?:carregador|posto).*?(\d+)\s*kw(?:.*?(?:em|no|na|de|para)\s+(\w+))?':
-                lambda m: f"SELECT * FROM charging_stations WHERE power >= {m.group(1)} AND LOWER(location) LIKE '%{m.group(2).lower() if m.group(2) else ''}%' ORDER BY price ASC" if m.group(2) else f"SELECT * FROM charging_stations WHERE power >= {m.group(1)} ORDER BY price ASC",
-            
-            # Busca genérica por cidade
-            r'^(\w+)$':
-                lambda m: f"SELECT * FROM charging_stations WHERE LOWER(location) LIKE '%{m.group(1).lower()}%' ORDER BY price ASC",
-            
-            # Busca por universidade/campus
-            r'(?:universidade|campus|faculdade)(?:.*?(?:em|no|na|de|para)\s+(\w+))?':
-                lambda m: f"SELECT * FROM charging_stations WHERE LOWER(address) LIKE '%universidade%' AND LOWER(location) LIKE '%{m.group(1).lower() if m.group(1) else ''}%' ORDER BY price ASC" if m.group(1) else "SELECT * FROM charging_stations WHERE LOWER(address) LIKE '%universidade%' ORDER BY price ASC",
-            
-            # Busca por shopping/centro comercial
-            r'(?:shopping|centro\s+comercial|mall)(?:.*?(?:em|no|na|de|para)\s+(\w+))?':
-                lambda m: f"SELECT * FROM charging_stations WHERE (LOWER(address) LIKE '%shopping%' OR LOWER(address) LIKE '%forum%' OR LOWER(address) LIKE '%centro%') AND LOWER(location) LIKE '%{m.group(1).lower() if m.group(1) else ''}%' ORDER BY price ASC" if m.group(1) else "SELECT * FROM charging_stations WHERE (LOWER(address) LIKE '%shopping%' OR LOWER(address) LIKE '%forum%' OR LOWER(address) LIKE '%centro%') ORDER BY price ASC",
-            
-            # Busca por aeroporto
-            r'(?:aeroporto|airport)(?:.*?(?:em|no|na|de|para)\s+(\w+))?':
-                lambda m: f"SELECT * FROM charging_stations WHERE LOWER(address) LIKE '%aeroporto%' AND LOWER(location) LIKE '%{m.group(1).lower() if m.group(1) else ''}%' ORDER BY price ASC" if m.group(1) else "SELECT * FROM charging_stations WHERE LOWER(address) LIKE '%aeroporto%' ORDER BY price ASC"
-        }
+        O ficheiro é lido em streaming e escrito em blocos de chunk_size linhas,
+        pelo que a memória usada não depende do tamanho do ficheiro. As colunas
+        normalizadas são calculadas pelo SQLite; em ficheiros grandes os índices
+        FTS/R*Tree são reconstruídos uma vez no fim em vez de linha a linha.
+        """
+        started = time.perf_counter()
+        imported = 0
+        rejected = 0
+        changed = 0
+        with_coordinates = 0
+        aliases = {}
+        bulk = os.path.getsize(path) > IMPORT_BULK_BYTES
         
-        # Tentar encontrar padrão correspondente
-        for pattern, sql_generator in sql_patterns.items():
-            match = re.search(pattern, command)
-            if match:
+        def valid_rows(records):
+            nonlocal rejected
+            for number, record in enumerate(records, 1):
                 try:
-                    sql_query = sql_generator(match)
-                    print(f"SQL gerado: {sql_query}")
-                    return sql_query
-                except Exception as e:
-                    print(f"Erro ao gerar SQL: {e}")
-                    continue
+                    if isinstance(record, ValueError):
+                        raise record
+                    if not isinstance(record, dict):
+                        raise ValueError("registo não é um objeto")
+                    yield station_record(record, aliases)
+                except (ValueError, TypeError) as e:
+                    rejected += 1
+                    if rejected <= 10:
+                        log.warning("⚠️ Registo %d ignorado: %s", number, e)
         
-        # Fallback: busca genérica
-        print("Usando busca genérica")
-        return "SELECT * FROM charging_stations ORDER BY price ASC LIMIT 5"
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            fmt = fmt or detect_import_format(path, f)
+            rows = valid_rows(IMPORT_READERS[fmt](f))
+            with self.db.connection() as conn:
+                # Uma só transação (também para o DDL): os leitores veem o catálogo
+                # antigo ou o novo, nunca um estado intermédio
+                conn.execute('BEGIN IMMEDIATE')
+                if bulk:
+                    triggers = conn.execute(
+                        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'charging_stations'"
+                    ).fetchall()
+                    for (name,) in triggers:
+                        conn.execute(f'DROP TRIGGER {name}')
+                while True:
+                    chunk = list(itertools.islice(rows, chunk_size))
+                    if not chunk:
+                        break
+                    # Linhas iguais às existentes não são reescritas (WHERE do upsert)
+                    changed += conn.executemany(UPSERT_SQL, chunk).rowcount
+                    imported += len(chunk)
+                    with_coordinates += sum(1 for row in chunk if row[6] is not None)
+                if bulk and changed:
+                    conn.execute("INSERT INTO stations_fts (stations_fts) VALUES ('rebuild')")
+                    # O upsert mantém o rowid: sem coordenadas novas o R*Tree continua válido
+                    if with_coordinates:
+                        conn.execute('DELETE FROM stations_rtree')
+                        conn.execute('''
+                            INSERT INTO stations_rtree
+                            SELECT rowid, latitude, latitude, longitude, longitude FROM charging_stations
+                            WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+                        ''')
+                if bulk:
+                    for statement in FTS_TRIGGERS + RTREE_TRIGGERS:
+                        conn.execute(statement)
+                if changed:
+                    conn.execute('ANALYZE charging_stations')
+        
+        # O índice em memória e a cache de resultados veem a nova data_version
+        self.station_index.refresh_if_changed()
+        elapsed = time.perf_counter() - started
+        log.info("📥 Importados %d carregadores (%d alterados, %d rejeitados) em %.2f s",
+                 imported, changed, rejected, elapsed)
+        return {'imported': imported, 'changed': changed, 'rejected': rejected, 'seconds': round(elapsed, 3)}
+    
+    def get_charging_stations(self, location):
+        # Buscar carregadores por localização (normalizada) no índice em memória
+        return self.station_index.get_by_location(location)
+    
+    def get_charging_station(self, station_id):
+        """Devolve um carregador pelo seu id, ou None"""
+        return self.station_index.get_by_id(station_id)
+    
+    def find_nearest(self, lat, lon, k=5, min_power=0, max_price=None):
+        """Devolve os k carregadores disponíveis mais próximos de (lat, lon).
+
+        Usa o índice R*Tree com uma caixa que duplica de tamanho até conter
+        pelo menos k carregadores dentro do raio pesquisado.
+        """
+        max_price = float('inf') if max_price is None else max_price
+        radius = NEAREST_START_RADIUS_KM
+        candidates = {}
+        with self.db.connection() as conn:
+            while True:
+                dlat = radius / KM_PER_DEGREE_LAT
+                dlon = radius / (KM_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 0.01))
+                rows = conn.execute(NEAREST_SQL, (lat + dlat, lat - dlat, lon + dlon, lon - dlon,
+                                                  min_power, max_price))
+                for row in rows:
+                    if row[0] not in candidates:
+                        station = row_to_station(row)
+                        station['latitude'] = row[6]
+                        station['longitude'] = row[7]
+                        station['distance_km'] = round(haversine_km(lat, lon, row[6], row[7]), 3)
+                        candidates[row[0]] = station
+                within = sum(1 for station in candidates.values() if station['distance_km'] <= radius)
+                if within >= k or radius >= NEAREST_MAX_RADIUS_KM:
+                    break
+                radius *= 2
+        
+        return sorted(candidates.values(), key=lambda station: station['distance_km'])[:k]
+    
+    def search_address(self, text, limit=5, conn=None):
+        """Pesquisa livre nos endereços via FTS5, ordenada por relevância (BM25)"""
+        terms = [word for word in re.findall(r'\w+', normalize_text(text))
+                 if len(word) >= 3 and word not in FREE_TEXT_STOPWORDS]
+        if not terms:
+            return []
+        sql_query = (f'SELECT {STATION_COLUMNS_QUALIFIED} FROM stations_fts '
+                     'JOIN charging_stations s ON s.rowid = stations_fts.rowid '
+                     'WHERE stations_fts MATCH ? ORDER BY bm25(stations_fts), s.price ASC LIMIT ?')
+        return self.execute_sql_query(sql_query, (fts_query(terms), limit), conn)
+    
+    def parse_intent(self, command):
+        """Interpreta o comando e devolve a Intent estruturada"""
+        with METRICS.stage('text_to_sql'):
+            intent = parse_intent(command)
+        log.debug("Intenção: %s", intent)
+        return intent
+    
+    def text_to_sql(self, command):
+        """Converte texto natural num QueryPlan (SQL parametrizado + valores)"""
+        command = command.lower().strip()
+        log.debug("Convertendo comando para SQL: %s", command)
+        
+        plan = intent_to_plan(self.parse_intent(command))
+        log.debug("SQL gerado: %s %s", plan.sql, plan.params)
+        return plan
     
-    def execute_sql_query(self, sql_query):
-        """Executa query SQL e retorna resultados"""
+    def execute_sql_query(self, sql_query, params=(), conn=None, tags=(CACHE_GLOBAL_TAG,)):
+        """Executa query SQL (com parâmetros '?') e retorna resultados.
+        
+        Com conn, usa essa conexão em vez de pedir uma ao pool (pedidos em lote).
+        """
+        self.station_index.refresh_if_changed(conn)
+        key = ('sql', sql_query, tuple(params))
+        results = self.result_cache.get(key)
+        if results is not ResultCache.MISSING:
+            return results
+        
+        if conn is None:
+            with self.db.connection() as conn:
+                return self.execute_sql_query(sql_query, params, conn, tags)
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with METRICS.stage('sql'):
                 cursor = conn.cursor()
-                cursor.execute(sql_query)
-                
-                results = []
-                for row in cursor.fetchall():
-                    results.append({
-                        'id': row[0],
-                        'location': row[1],
-                        'address': row[2],
-                        'price': row[3],
-                        'power': row[4],
-                        'available': bool(row[5])
-                    })
-                
-                print(f"Encontrados {len(results)} carregadores")
-                return results
+                cursor.execute(sql_query, params)
+                results = [row_to_station(row) for row in cursor.fetchall()]
+            
+            log.debug("Encontrados %d carregadores", len(results))
+            self.result_cache.put(key, results, tags)
+            return results
                 
         except Exception as e:
-            print(f"Erro ao executar SQL: {e}")
+            log.error("Erro ao executar SQL: %s", e)
             return []
     
     def extract_location(self, command):
         """Método mantido para compatibilidade - agora usa AI para SQL"""
         # Este método agora é um wrapper que usa o novo sistema AI
-        sql_query = self.text_to_sql(command)
-        results = self.execute_sql_query(sql_query)
+        plan = self.text_to_sql(command)
+        results = self.execute_sql_query(*plan)
         
         if results:
             # Retornar a localização do primeiro resultado
             return results[0]['location'].lower()
         
-        print("Nenhuma localização encontrada no comando")
+        log.debug("Nenhuma localização encontrada no comando")
         return None
 
-    def find_best_charger(self, command):
+    def find_best_charger(self, command, intent=None):
         """Encontra o melhor carregador usando AI para interpretar o comando"""
-        print(f"Processando comando com AI: {command}")
+        log.debug("Processando comando com AI: %s", command)
         
-        # Usar AI para converter texto em SQL
-        sql_query = self.text_to_sql(command)
-        results = self.execute_sql_query(sql_query)
-        
-        if results:
-            # Retornar o primeiro resultado (já ordenado pela query SQL)
-            best_charger = results[0]
-            print(f"Melhor carregador encontrado: {best_charger['id']} em {best_charger['location']}")
+        # A cache é indexada pela intenção normalizada, não pelo texto
+        if intent is None:
+            intent = self.parse_intent(command)
+        self.station_index.refresh_if_changed()
+        key = ('best', intent)
+        best_charger = self.result_cache.get(key)
+        if best_charger is not ResultCache.MISSING:
             return best_charger
         
-        print("Nenhum carregador encontrado")
-        return None
+        tags = intent_cache_tags(intent)
+        results = self.rank_intent(intent, limit=1)
+        if not results:
+            # Sem correspondência pela intenção: tentar pesquisa livre no endereço
+            # (o resultado passa a depender do texto, não só da intenção)
+            key = ('best', intent, normalize_text(command.strip()))
+            best_charger = self.result_cache.get(key)
+            if best_charger is not ResultCache.MISSING:
+                return best_charger
+            results = self.search_address(command)
+            tags = (CACHE_GLOBAL_TAG,)
+        
+        best_charger = results[0] if results else None
+        self.result_cache.put(key, best_charger, tags)
+        if best_charger:
+            # Retornar o primeiro resultado (já ordenado pela pontuação)
+            log.debug("Melhor carregador encontrado: %s em %s", best_charger['id'], best_charger['location'])
+        else:
+            log.debug("Nenhum carregador encontrado")
+        return best_charger
 
-    def speak_response(self, text):
-        print(f"Falando: {text}")
-        responses = {
-            "Please specify a location in Portugal": "Por favor, especifique uma localização em Portugal",
-            "Sorry, I couldn't find any charging stations in": "Desculpe, não encontrei nenhum posto de carregamento em",
-            "The best charging station in": "O melhor posto de carregamento em",
-            "is at": "está em",
-            "with a price of": "com um preço de",
-            "euros per kWh": "euros por kWh"
-        }
+    def rank_intent(self, intent, profile=None, origin=None, charge=None, limit=1, conn=None):
+        """Ordena os candidatos da intenção pela pontuação multicritério.
         
-        # Translate the response
-        for eng, pt in responses.items():
-            text = text.replace(eng, pt)
+        Os candidatos (com coordenadas, em arrays NumPy) ficam na cache de
+        resultados com as etiquetas da intenção; cada pedido só recalcula as
+        pontuações. São no máximo RANK_MAX_CANDIDATES, pela ordem do SQL: além
+        disso a ordenação é aproximada. Sem NumPy, devolve a ordem do SQL. Com um pedido de
+        carregamento (charge, ou o da intenção), cada resultado traz a duração
+        e o custo estimados.
+        """
+        charge = charge or intent.charge
+        window = charge_window(charge) if charge is not None else None
+        if not numpy_available():
+            plan = intent_to_plan(intent._replace(limit=limit))
+            results = self.execute_sql_query(*plan, conn, intent_cache_tags(intent))
+            if window is None:
+                return results
+            return [self.station_estimate(station, window) for station in results]
         
-        # Usar comando 'say' nativo do macOS para evitar problemas com pyttsx3
-        def speak_in_thread():
-            try:
-                import subprocess
-                # Usar o comando 'say' nativo do macOS com voz em português
-                subprocess.run(['say', '-v', 'Joana', text], check=True)
-                print("✅ Síntese de voz concluída")
-            except subprocess.CalledProcessError as e:
-                print(f"❌ Erro no comando 'say': {e}")
-                # Fallback para pyttsx3 se o comando 'say' falhar
-                try:
-                    tts = pyttsx3.init()
-                    tts.say(text)
-                    tts.runAndWait()
-                    tts.stop()
-                except Exception as e2:
-                    print(f"❌ Erro no fallback pyttsx3: {e2}")
-            except Exception as e:
-                print(f"❌ Erro na síntese de voz: {e}")
+        candidates = self.intent_candidates(intent, conn)
+        with METRICS.stage('ranking'):
+            return rank_candidates(candidates, profile or intent.profile, origin, window, limit,
+                                   superlative_key(intent))
+    
+    def station_estimate(self, station, window):
+        """Cópia do posto com a duração e o custo estimados do carregamento"""
+        minutes, euros = estimate_charging(station['power'], station['price'], window)
+        return dict(station, charge_minutes=round(minutes, 1), charge_cost=round(euros, 2))
+    
+    def intent_candidates(self, intent, conn=None):
+        """Candidatos da intenção em arrays NumPy, guardados na cache de resultados"""
+        plan = intent_to_plan(intent._replace(limit=RANK_MAX_CANDIDATES), with_coordinates=True)
+        log.debug("SQL gerado: %s %s", plan.sql, plan.params)
+        self.station_index.refresh_if_changed(conn)
+        key = ('candidates', plan)
+        candidates = self.result_cache.get(key)
+        if candidates is ResultCache.MISSING:
+            with self.db.connection() if conn is None else nullcontext(conn) as conn:
+                with METRICS.stage('sql'):
+                    candidates = CandidateSet(conn.execute(*plan).fetchall())
+            if len(candidates) >= RANK_MAX_CANDIDATES:
+                log.warning("⚠️ Mais de %d candidatos para %s: ordenação aproximada",
+                            RANK_MAX_CANDIDATES, plan.params)
+                METRICS.inc('zeus_rank_truncated_total')
+            self.result_cache.put(key, candidates, intent_cache_tags(intent))
+        return candidates
+    
+    def estimate_charge(self, intent, charge=None, profile=None, origin=None, conn=None):
+        """Duração e custo estimados do carregamento em todos os candidatos da intenção.
         
-        threading.Thread(target=speak_in_thread, daemon=True).start()
+        Devolve o intervalo de custos e durações, o carregamento assumido e o
+        melhor posto (já com a sua estimativa), ou None sem candidatos.
+        """
+        window = charge_window(charge or intent.charge or ChargeRequest())
+        log.debug("Estimativa de carregamento: %s", window)
+        if numpy_available():
+            candidates = self.intent_candidates(intent, conn)
+            if not len(candidates):
+                return None
+            # Uma só passagem vetorizada por todos os postos da cidade
+            with METRICS.stage('ranking'):
+                minutes, euros = estimate_charging(candidates.power, candidates.price, window)
+                best = rank_candidates(candidates, profile or intent.profile, origin, window, 1,
+                                       superlative_key(intent))[0]
+            count = len(candidates)
+        else:
+            plan = intent_to_plan(intent._replace(limit=RANK_MAX_CANDIDATES))
+            stations = self.execute_sql_query(*plan, conn, intent_cache_tags(intent))
+            if not stations:
+                return None
+            estimates = [estimate_charging(station['power'], station['price'], window) for station in stations]
+            minutes = [estimate[0] for estimate in estimates]
+            euros = [estimate[1] for estimate in estimates]
+            best = self.station_estimate(stations[0], window)
+            count = len(stations)
+        return {
+            'charge': {field: round(value, 2) for field, value in window._asdict().items()},
+            'stations': count,
+            'cost': {'min': round(float(min(euros)), 2), 'max': round(float(max(euros)), 2)},
+            'minutes': {'min': round(float(min(minutes)), 1), 'max': round(float(max(minutes)), 1)},
+            'best': best
+        }
     
-    def setup_routes(self):
-        """Configurar rotas Flask para a interface web"""
+    def query(self, command, limit=API_DEFAULT_LIMIT, conn=None, intents=None, profile=None,
+              origin=None, charge=None):
+        """Os limit melhores carregadores para o comando, sem síntese de voz.
         
-        @self.app.route('/')
-        def index():
-            return render_template('index.html')
+        intents é uma cache texto normalizado -> Intent partilhada entre
+        comandos do mesmo lote (os registos repetem muito as mesmas frases).
+        """
+        text = normalize_text(command.strip())
+        intent = intents.get(text) if intents is not None else None
+        if intent is None:
+            with METRICS.stage('text_to_sql'):
+                intent = parse_intent(text)
+            if intents is not None:
+                intents[text] = intent
+        self.count_intent(intent)
         
-        @self.app.route('/start_recording', methods=['POST'])
-        def start_recording():
-            try:
-                self.start_continuous_recording()
-                return jsonify({
-                    'success': True,
-                    'message': 'Gravação iniciada'
-                })
-            except Exception as e:
-                return jsonify({
-                    'success': False,
-                    'error': str(e)
-                })
+        # Superlativos pedem 1 resultado; a API devolve sempre os limit primeiros
+        results = self.rank_intent(intent, profile, origin, charge, limit, conn)
+        if not results:
+            results = self.search_address(text, limit, conn)
+        intent_fields = intent._asdict()
+        if intent.charge is not None:
+            intent_fields['charge'] = intent.charge._asdict()
+        return {
+            'command': command,
+            'intent': intent_fields,
+            'results': results,
+            'messages': self.responses.batch(intent, results)
+        }
+    
+    def count_intent(self, intent):
+        kind = 'estimate' if intent.charge is not None else self.responses.template_for(intent)
+        METRICS.inc('zeus_intents_total', type=kind)
+    
+    def answer(self, command):
+        """Resposta a um comando (web e consola): resultado estruturado e texto"""
+        if not command.strip():
+            return {
+                'success': False,
+                'error': self.responses.render('empty_command')
+            }
         
-        @self.app.route('/stop_recording', methods=['POST'])
-        def stop_recording():
-            try:
-                audio = self.stop_continuous_recording()
-                if audio is None:
-                    raise Exception("Nenhum áudio foi capturado")
-                
-                # Reconhecer o áudio
-                command = self.recognizer.recognize_google(audio, language='pt-PT')
-                print(f"✅ Texto reconhecido: {command}")
-                
-                return jsonify({
+        # Pedidos de estimativa ("quanto custa carregar 40 kWh no Porto")
+        intent = self.parse_intent(command)
+        self.count_intent(intent)
+        if intent.charge is not None:
+            estimate = self.estimate_charge(intent)
+            if estimate:
+                return {
                     'success': True,
-                    'text': command.lower().strip(),
-                    'command': command.lower().strip()
-                })
-            except Exception as e:
-                return jsonify({
-                    'success': False,
-                    'error': str(e)
-                })
+                    'charger': estimate['best'],
+                    'estimate': estimate,
+                    'message': self.responses.estimate(intent, estimate)
+                }
         
-        @self.app.route('/listen', methods=['POST'])
-        def listen():
-            try:
-                command = self.listen_for_web()
-                return jsonify({
-                    'success': True,
-                    'text': command,
-                    'command': command  # Manter compatibilidade
-                })
-            except Exception as e:
-                return jsonify({
-                    'success': False,
-                    'error': str(e)
-                })
+        # Usar AI para processar o comando completo
+        best_charger = self.find_best_charger(command, intent)
         
-        @self.app.route('/process', methods=['POST'])
-        def process():
-            try:
-                data = request.get_json()
-                command = data.get('command', '')
-                
-                if not command.strip():
-                    error_msg = "Por favor, diga um comando válido"
-                    self.speak_response(error_msg)
-                    return jsonify({
-                        'success': False,
-                        'error': error_msg
-                    })
-                
-                # Usar AI para processar o comando completo
-                best_charger = self.find_best_charger(command)
-                
-                if best_charger:
-                    # Gerar resposta inteligente baseada no tipo de busca
-                    if 'barato' in command.lower() or 'económico' in command.lower():
-                        response_text = (f"O carregador mais barato encontrado está em {best_charger['location']}, "
-                                       f"localizado em {best_charger['address']}, "
-                                       f"com um preço de {best_charger['price']} euros por kWh")
-                    elif 'rápido' in command.lower() or 'potente' in command.lower():
-                        response_text = (f"O carregador mais rápido encontrado está em {best_charger['location']}, "
-                                       f"localizado em {best_charger['address']}, "
-                                       f"com {best_charger['power']} kW de potência e preço de {best_charger['price']} euros por kWh")
-                    elif 'universidade' in command.lower() or 'campus' in command.lower():
-                        response_text = (f"Encontrei um carregador na universidade em {best_charger['location']}, "
-                                       f"localizado em {best_charger['address']}, "
-                                       f"com preço de {best_charger['price']} euros por kWh")
-                    elif 'shopping' in command.lower() or 'centro comercial' in command.lower():
-                        response_text = (f"Encontrei um carregador no shopping em {best_charger['location']}, "
-                                       f"localizado em {best_charger['address']}, "
-                                       f"com preço de {best_charger['price']} euros por kWh")
-                    elif 'aeroporto' in command.lower():
-                        response_text = (f"Encontrei um carregador no aeroporto em {best_charger['location']}, "
-                                       f"localizado em {best_charger['address']}, "
-                                       f"com preço de {best_charger['price']} euros por kWh")
-                    else:
-                        response_text = (f"O melhor carregador encontrado está em {best_charger['location']}, "
-                                       f"localizado em {best_charger['address']}, "
-                                       f"com um preço de {best_charger['price']} euros por kWh")
-                    
-                    # Falar a resposta
-                    self.speak_response(response_text)
-                    
-                    return jsonify({
-                        'success': True,
-                        'charger': best_charger,
-                        'message': response_text
-                    })
+        # O modelo da resposta depende da intenção, não do texto do comando
+        response_text = self.responses.charger(intent, best_charger)
+        if best_charger:
+            return {
+                'success': True,
+                'charger': best_charger,
+                'message': response_text
+            }
+        return {
+            'success': False,
+            'error': response_text
+        }
+    
+    def speak_response(self, text):
+        # O texto já vem em português, gerado pelo ResponseRenderer
+        log.debug("Falando: %s", text)
+        
+        # Uma thread de síntese dedicada fala as respostas, uma de cada vez
+        if self.tts is not None:
+            self.tts.speak(text)
+    
+    def voice_response(self, result, text, params):
+        """Fala a resposta no servidor ou, se o cliente pedir tts=client,
+        devolve o endereço do áudio para ser reproduzido no browser"""
+        if self.tts is None:
+            return result
+        if params.get('tts') == 'client':
+            result['audio_url'] = '/speech?' + urlencode({'text': text, 'sig': self.speech_signature(text)})
+        else:
+            self.speak_response(text)
+        return result
+    
+    def get_routes(self):
+        """Tabela de rotas HTTP, partilhada pelos servidores Flask e ASGI"""
+        return [
+            Route(('GET',), '/', self.handle_index, 'io', False),
+            Route(('POST',), '/start_recording', self.handle_start_recording, 'io', False),
+            Route(('POST',), '/stop_recording', self.handle_stop_recording, 'asr', False),
+            Route(('GET',), '/partial', self.handle_partial, 'io', False),
+            Route(('POST',), '/recognize', self.handle_recognize, 'asr', True),
+            Route(('POST',), '/end_session', self.handle_end_session, 'io', False),
+            Route(('POST',), '/listen', self.handle_listen, 'asr', False),
+            Route(('POST',), '/process', self.handle_process, 'io', False),
+            Route(('GET', 'POST'), '/nearest', self.handle_nearest, 'io', False),
+            Route(('GET', 'POST'), '/api/query', self.handle_api_query, 'io', False),
+            Route(('POST',), '/api/query/batch', self.handle_api_query_batch, 'io', False),
+            Route(('POST',), '/updates', self.handle_updates, 'io', False, local=True),
+            Route(('GET',), '/speech', self.handle_speech, 'asr', False),
+            Route(('GET',), '/stats', self.handle_stats, 'io', False),
+            Route(('GET',), '/metrics', self.handle_metrics, 'io', False),
+            Route(('POST',), '/exit', self.handle_exit, 'io', False),
+        ]
+    
+    def setup_routes(self):
+        """Configurar rotas Flask para a interface web"""
+        for route in self.get_routes():
+            self.app.add_url_rule(route.path, route.path, self.flask_view(route),
+                                  methods=list(route.methods))
+    
+    def flask_view(self, route):
+        """Adapta um handler da tabela de rotas a uma view Flask"""
+        def view():
+            params = flask.request.args.to_dict()
+            with METRICS.timer('zeus_request_seconds', route=route.path):
+                if route.local and not self.local_request_allowed(
+                        flask.request.remote_addr, flask.request.headers.get(UPDATES_TOKEN_HEADER)):
+                    result = self.forbidden(route)
+                elif route.raw:
+                    result = route.handler(params, flask.request.stream, flask.request.mimetype)
                 else:
-                    error_msg = "Desculpe, não encontrei nenhum carregador que corresponda ao seu pedido"
-                    self.speak_response(error_msg)
-                    return jsonify({
-                        'success': False,
-                        'error': error_msg
-                    })
-                    
-            except Exception as e:
-                error_msg = f"Erro ao processar comando: {str(e)}"
-                return jsonify({
-                    'success': False,
-                    'error': error_msg
-                })
-        
-        @self.app.route('/exit', methods=['POST'])
-        def exit_app():
-            self.running = False
-            # Usar threading para parar o servidor após um pequeno delay
-            def shutdown():
-                import time
-                time.sleep(1)
-                os.kill(os.getpid(), signal.SIGTERM)
+                    data = flask.request.get_json(silent=True)
+                    if isinstance(data, dict):
+                        params.update(data)
+                    result = route.handler(params)
+            if isinstance(result, RawResponse):
+                return flask.Response(result.body, status=result.status, content_type=result.content_type)
+            return flask.jsonify(result)
+        return view
+    
+    def local_request_allowed(self, remote_addr, token):
+        """Rotas locais: pedidos do próprio computador (loopback) ou com o token
+        de ZEUS_UPDATES_TOKEN no cabeçalho X-Zeus-Token"""
+        expected = os.environ.get('ZEUS_UPDATES_TOKEN')
+        if expected and token and hmac.compare_digest(token.encode('utf-8'), expected.encode('utf-8')):
+            return True
+        try:
+            address = ipaddress.ip_address(remote_addr)
+        except (TypeError, ValueError):
+            return False
+        return address.is_loopback or bool(getattr(address, 'ipv4_mapped', None)
+                                           and address.ipv4_mapped.is_loopback)
+    
+    def forbidden(self, route):
+        log.warning("🚫 Pedido recusado em %s (não é local nem traz o token)", route.path)
+        error = {'success': False, 'error': f"Acesso negado: {route.path} só aceita pedidos locais ou com token"}
+        return RawResponse(json.dumps(error, ensure_ascii=False), 'application/json', 403)
+    
+    def bad_request(self, message):
+        error = {'success': False, 'error': message}
+        return RawResponse(json.dumps(error, ensure_ascii=False), 'application/json', 400)
+    
+    def require_session(self, params):
+        session = self.sessions.get(params.get('session_id'))
+        if session is None:
+            raise Exception("Sessão de gravação inexistente ou expirada")
+        return session
+    
+    def handle_index(self, params):
+        with self.app.app_context():
+            return RawResponse(flask.render_template('index.html'), 'text/html; charset=utf-8', 200)
+    
+    def handle_start_recording(self, params):
+        try:
+            session = self.sessions.get_or_create(params.get('session_id'))
+            self.start_continuous_recording(session)
+            return {
+                'success': True,
+                'session_id': session.id,
+                'message': 'Gravação iniciada'
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def handle_stop_recording(self, params):
+        try:
+            command = self.stop_and_recognize(self.require_session(params))
             
-            threading.Thread(target=shutdown).start()
-            return jsonify({'success': True})
+            return {
+                'success': True,
+                'text': command,
+                'command': command
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def handle_partial(self, params):
+        session = self.sessions.get(params.get('session_id'))
+        return {
+            'success': True,
+            'streaming': self.streaming,
+            'text': self.get_partial_transcript(session) if session else '',
+            # O fim da fala foi detetado: o cliente pode pedir o resultado
+            'ended': bool(session and session.auto_stopped)
+        }
+    
+    def handle_recognize(self, params, body, mimetype):
+        # Áudio do microfone do cliente: PCM 16 bits mono (audio/l16) ou WAV,
+        # enviado num só pedido ou em pedaços (final=0) com o mesmo session_id
+        final = params.get('final', '1') != '0'
+        if self.text_only:
+            return {
+                'success': False,
+                'error': TEXT_ONLY_MESSAGE
+            }
+        try:
+            if mimetype.startswith(('audio/ogg', 'audio/webm', 'audio/opus')):
+                raise Exception("Formato não suportado: envie PCM 16 bits (audio/l16) ou WAV")
+            sample_rate = UPLOAD_SAMPLE_RATE
+            if params.get('rate') is not None:
+                sample_rate = int(self.api_number(params, 'rate', UPLOAD_MIN_RATE, UPLOAD_MAX_RATE))
+            session_id = params.get('session_id')
+            session = self.sessions.get_or_create(session_id)
+            try:
+                text = self.recognize_upload(session, body, sample_rate, final)
+            finally:
+                if final and not session_id:
+                    # Pedido único sem sessão: não deixar a sessão criada pendurada
+                    self.sessions.close(session.id)
+            if not final:
+                return {
+                    'success': True,
+                    'session_id': session.id,
+                    'partial': text
+                }
+            return {
+                'success': True,
+                'session_id': session.id,
+                'text': text,
+                'command': text
+            }
+        except sr.UnknownValueError:
+            return {
+                'success': False,
+                'error': "Não foi possível entender o áudio. Tente falar mais claramente."
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def handle_end_session(self, params):
+        self.sessions.close(params.get('session_id'))
+        return {'success': True}
+    
+    def handle_listen(self, params):
+        try:
+            command = self.listen_for_web(self.sessions.get_or_create(params.get('session_id')))
+            return self.listen_response(command)
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def listen_response(self, command):
+        return {
+            'success': True,
+            'text': command,
+            'command': command  # Manter compatibilidade
+        }
+    
+    def handle_process(self, params):
+        command = params.get('command', '')
+        if not isinstance(command, str):
+            return self.bad_request("Parâmetro command deve ser um texto")
+        try:
+            result = self.answer(command)
+            # Falar a resposta
+            return self.voice_response(result, result.get('message') or result['error'], params)
+        except Exception as e:
+            return {
+                'success': False,
+                'error': self.responses.render('error', {'error': str(e)})
+            }
+    
+    def handle_nearest(self, params):
+        if params.get('lat') is None or params.get('lon') is None:
+            return self.bad_request('Parâmetros inválidos: lat e lon são obrigatórios')
+        try:
+            lat = self.api_number(params, 'lat', -90, 90)
+            lon = self.api_number(params, 'lon', -180, 180)
+            k = self.api_number(params, 'k', 1, API_MAX_LIMIT) if params.get('k') is not None else 5
+            if k != int(k):
+                raise ValueError(f"Parâmetro k deve ser um inteiro entre 1 e {API_MAX_LIMIT}")
+            min_power = self.api_number(params, 'min_power') if params.get('min_power') is not None else 0
+            max_price = self.api_number(params, 'max_price') if params.get('max_price') is not None else None
+        except ValueError as e:
+            return self.bad_request(f"Parâmetros inválidos: {e}")
+        
+        try:
+            chargers = self.find_nearest(lat, lon, int(k), min_power, max_price)
+            return {
+                'success': True,
+                'chargers': chargers
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f"Erro ao procurar carregadores próximos: {str(e)}"
+            }
+    
+    def api_limit(self, params):
+        limit = params.get('limit', API_DEFAULT_LIMIT)
+        if isinstance(limit, str) and limit.strip().isdigit():
+            limit = int(limit)
+        if isinstance(limit, float) and limit.is_integer():
+            limit = int(limit)
+        if isinstance(limit, bool) or not isinstance(limit, int) or not 1 <= limit <= API_MAX_LIMIT:
+            raise ValueError(f"Parâmetro limit deve ser um inteiro entre 1 e {API_MAX_LIMIT}")
+        return limit
+    
+    def api_number(self, params, name, low=None, high=None):
+        """Parâmetro numérico do pedido (texto ou número JSON), validado"""
+        value = params[name]
+        try:
+            if isinstance(value, bool):
+                raise ValueError
+            value = float(value)
+        except (TypeError, ValueError):
+            value = math.nan
+        if not math.isfinite(value) or (low is not None and not low <= value <= high):
+            limits = f" entre {low:g} e {high:g}" if low is not None else ""
+            raise ValueError(f"Parâmetro {name} deve ser um número{limits}")
+        return value
+    
+    def api_ranking(self, params):
+        """Perfil de pesos, origem (lat/lon) e carregamento pedido (kwh, soc,
+        target_soc, battery_kwh, vehicle_kw) do pedido"""
+        profile = params.get('profile')
+        if profile is not None and profile not in RANKING_PROFILES:
+            raise ValueError(f"Perfil desconhecido: {profile} (use {', '.join(RANKING_PROFILES)})")
+        origin = None
+        if params.get('lat') is not None and params.get('lon') is not None:
+            origin = (self.api_number(params, 'lat', -90, 90), self.api_number(params, 'lon', -180, 180))
+        charge = {field: self.api_number(params, name) for name, field in API_CHARGE_PARAMS.items()
+                  if params.get(name) is not None}
+        charge = ChargeRequest(**charge) if charge else None
+        return {'profile': profile, 'origin': origin, 'charge': charge}
+    
+    def handle_api_query(self, params):
+        # Consulta só de texto: os N melhores resultados, sem falar a resposta
+        command = params.get('command', '')
+        if not isinstance(command, str):
+            return self.bad_request("Parâmetro command deve ser um texto")
+        try:
+            if not command.strip():
+                raise ValueError("Parâmetro command em falta")
+            return dict(self.query(command, self.api_limit(params), **self.api_ranking(params)),
+                        success=True)
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def handle_api_query_batch(self, params):
+        # Lote de comandos resolvido com uma só conexão e cache de intenções
+        # comum; um comando com erro não impede a resposta aos restantes
+        commands = params.get('commands')
+        if not isinstance(commands, list) or not all(isinstance(c, str) for c in commands):
+            return self.bad_request("Parâmetro commands deve ser uma lista de textos")
+        try:
+            if len(commands) > API_BATCH_MAX:
+                raise ValueError(f"Lote demasiado grande (máximo {API_BATCH_MAX} comandos)")
+            limit = self.api_limit(params)
+            ranking = self.api_ranking(params)
+            intents = {}
+            results = []
+            with self.db.connection() as conn:
+                for command in commands:
+                    try:
+                        results.append(self.query(command, limit, conn, intents, **ranking))
+                    except Exception as e:
+                        log.warning("⚠️ Comando do lote com erro (%r): %s", command, e)
+                        results.append({'command': command, 'error': str(e)})
+            return {
+                'success': True,
+                'count': len(results),
+                'results': results
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def handle_updates(self, params):
+        # Alterações enviadas por HTTP: {"updates": [...]} ou um único {"id": ...}
+        updates = params.get('updates')
+        if updates is None and 'id' in params:
+            updates = [params]
+        if not isinstance(updates, list):
+            return {
+                'success': False,
+                'error': 'Envie {"updates": [{"id": ..., "available": ..., "price": ...}]}'
+            }
+        accepted, rejected = self.updates.submit(updates)
+        return {
+            'success': True,
+            'accepted': accepted,
+            'rejected': rejected
+        }
+    
+    def speech_signature(self, text):
+        return hmac.new(self.speech_key, text.encode('utf-8'), hashlib.sha256).hexdigest()
+    
+    def handle_speech(self, params):
+        # Áudio da resposta para o browser (em cache por texto), só com a
+        # assinatura devolvida por /process
+        text = params.get('text', '')
+        signature = params.get('sig', '')
+        if self.tts is None:
+            return RawResponse(TEXT_ONLY_MESSAGE, 'text/plain; charset=utf-8', 503)
+        if not isinstance(text, str) or not text.strip():
+            return RawResponse('Parâmetro text em falta', 'text/plain; charset=utf-8', 400)
+        if not isinstance(signature, str) or not hmac.compare_digest(signature, self.speech_signature(text)):
+            return RawResponse('Assinatura inválida: só são sintetizadas respostas do servidor',
+                               'text/plain; charset=utf-8', 403)
+        try:
+            body, content_type = self.tts.read(text)
+            return RawResponse(body, content_type, 200)
+        except Exception as e:
+            return RawResponse(f"Erro na síntese de voz: {e}", 'text/plain; charset=utf-8', 503)
+    
+    def handle_stats(self, params):
+        return {
+            'cache': self.result_cache.stats(),
+            'responses': self.responses.stats(),
+            'db': self.db.get_metrics(),
+            'sessions': self.sessions.stats(),
+            'updates': self.updates.stats(),
+            'tts': self.tts.stats() if self.tts is not None else None,
+            'startup': {
+                'subsystems': dict(self.startup_timings),
+                'imports': dict(IMPORT_TIMINGS)
+            },
+            'latency': METRICS.summary()
+        }
+    
+    def handle_metrics(self, params):
+        # Formato de texto do Prometheus; as caches e filas são lidas no momento do pedido
+        caches = {'results': self.result_cache.stats(), 'responses': self.responses.stats()}
+        if self.tts is not None:
+            caches['tts'] = self.tts.stats()
+        samples = []
+        for name, stats in caches.items():
+            samples.append(('zeus_cache_hits_total', {'cache': name}, stats['hits']))
+            samples.append(('zeus_cache_misses_total', {'cache': name}, stats['misses']))
+        updates, db = self.updates.stats(), self.db.get_metrics()
+        samples.extend((
+            ('zeus_sessions_active', {}, self.sessions.stats()['active']),
+            ('zeus_updates_applied_total', {}, updates['applied']),
+            ('zeus_updates_pending', {}, updates['pending']),
+            ('zeus_db_connections_in_use', {}, db['pool_size'] - db['idle']),
+        ))
+        if self.tts is not None:
+            samples.append(('zeus_tts_pending', {}, caches['tts']['pending']))
+            samples.append(('zeus_tts_dropped_total', {}, caches['tts']['dropped']))
+        return RawResponse(METRICS.render(samples), 'text/plain; version=0.0.4; charset=utf-8', 200)
+    
+    def handle_exit(self, params):
+        self.running = False
+        # Usar threading para parar o servidor após um pequeno delay
+        def shutdown():
+            time.sleep(1)
+            os.kill(os.getpid(), signal.SIGTERM)
+        
+        threading.Thread(target=shutdown).start()
+        return {'success': True}
 
     def run(self, mode='web'):
-        """Executar o sistema em modo web ou linha de comando"""
+        """Executar o sistema em modo web, ASGI ou linha de comando"""
         if mode == 'web':
             self.run_web()
+        elif mode == 'asgi':
+            run_asgi_server(AsgiApp(self))
         else:
             self.run_console()
     
@@ -674,42 +4335,113 @@ class EVChargingFinder:
             print("Diga o seu comando...")  # "Say your command..." in Portuguese
             command = self.listen_for_command()
             
+            if self.text_only and (command is None or command.lower() == 'q'):
+                break
             if command:
-                best_charger = self.find_best_charger(command)
-                
-                if best_charger:
-                    # Gerar resposta inteligente baseada no tipo de busca
-                    if 'barato' in command.lower() or 'económico' in command.lower():
-                        response = (f"O carregador mais barato encontrado está em {best_charger['location']}, "
-                                  f"localizado em {best_charger['address']}, "
-                                  f"com um preço de {best_charger['price']} euros por kWh")
-                    elif 'rápido' in command.lower() or 'potente' in command.lower():
-                        response = (f"O carregador mais rápido encontrado está em {best_charger['location']}, "
-                                  f"localizado em {best_charger['address']}, "
-                                  f"com {best_charger['power']} kW de potência e preço de {best_charger['price']} euros por kWh")
-                    else:
-                        response = (f"O melhor carregador encontrado está em {best_charger['location']}, "
-                                  f"localizado em {best_charger['address']}, "
-                                  f"com um preço de {best_charger['price']} euros por kWh")
-                else:
-                    response = "Desculpe, não encontrei nenhum carregador que corresponda ao seu pedido"
-                
+                try:
+                    result = self.answer(command)
+                except ValueError as e:
+                    # Pedido impossível (ex.: mais energia do que cabe na bateria)
+                    result = {'error': self.responses.render('error', {'error': str(e)})}
+                response = result.get('message') or result['error']
+                print(f"💬 {response}")
                 self.speak_response(response)
             
+            if self.text_only:
+                # Em modo só texto o próximo comando é pedido de imediato ('q' para sair)
+                continue
             print("\nPressione Enter para pesquisar novamente ou 'q' para sair")
             if input().lower() == 'q':
                 break
 
 if __name__ == "__main__":
-    import sys
+    parser = argparse.ArgumentParser(description="ZEUS - Assistente de Carregadores EV")
+    parser.add_argument('--console', action='store_true', help="modo linha de comando")
+    parser.add_argument('--streaming', action='store_true', help="reconhecer enquanto o utilizador fala")
+    parser.add_argument('--asr', choices=sorted(RECOGNIZER_BACKENDS), default='google',
+                        help="motor de reconhecimento de voz")
+    parser.add_argument('--asr-model', help="caminho do modelo local (vosk)")
+    parser.add_argument('--asr-workers', type=int, default=1,
+                        help="processos de reconhecimento em paralelo (motores locais)")
+    parser.add_argument('--asgi', action='store_true',
+                        help="servidor assíncrono (ASGI, requer uvicorn)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="processos do servidor ASGI")
+    parser.add_argument('--import', dest='import_path', metavar='FICHEIRO',
+                        help="importar um catálogo de carregadores (CSV, JSON ou NDJSON) e sair")
+    parser.add_argument('--import-format', choices=sorted(IMPORT_READERS),
+                        help="formato do ficheiro a importar (por omissão, pela extensão)")
+    parser.add_argument('--updates-file', metavar='FICHEIRO',
+                        help="seguir um ficheiro de alterações de disponibilidade/preço (JSON por linha)")
+    parser.add_argument('--updates-stdin', action='store_true',
+                        help="ler alterações de disponibilidade/preço do stdin (JSON por linha)")
+    parser.add_argument('--text-only', action='store_true',
+                        help="sem reconhecimento nem síntese de voz (comandos escritos)")
+    parser.add_argument('--warm-up', action='store_true',
+                        help="carregar os motores de voz em segundo plano logo no arranque")
+    parser.add_argument('--max-utterance', type=float, default=CAPTURE_MAX_SECONDS, metavar='SEGUNDOS',
+                        help="duração máxima de uma elocução gravada no servidor")
+    parser.add_argument('--capture-overflow', choices=CAPTURE_OVERFLOW_POLICIES, default='stop',
+                        help="ao exceder a duração máxima: terminar (stop), manter o fim (drop_oldest) ou falhar (error)")
+    parser.add_argument('--log-level', choices=LOG_LEVELS,
+                        help="nível do registo (por omissão INFO; DEBUG mostra cada pedido)")
+    args = parser.parse_args()
+    if args.log_level:
+        # Também herdado pelos processos de trabalho (ASGI e reconhecimento)
+        os.environ['ZEUS_LOG_LEVEL'] = args.log_level
+    
+    if args.import_path:
+        # A importação não precisa de áudio nem do servidor web
+        EVChargingFinder(text_only=True).import_stations(args.import_path, args.import_format)
+        sys.exit(0)
+    
+    if args.updates_stdin and args.console and args.text_only:
+        parser.error("--updates-stdin não pode ser usado com comandos escritos na consola")
+    
+    if args.asgi and args.workers > 1:
+        # Os processos de trabalho criam a aplicação com create_asgi_app
+        os.environ['ZEUS_ASR'] = args.asr
+        os.environ['ZEUS_ASR_WORKERS'] = str(args.asr_workers)
+        os.environ['ZEUS_STREAMING'] = '1' if args.streaming else '0'
+        os.environ['ZEUS_TEXT_ONLY'] = '1' if args.text_only else '0'
+        os.environ['ZEUS_WARM_UP'] = '1' if args.warm_up else '0'
+        # A mesma chave em todos os processos: /speech pode cair noutro processo que /process
+        os.environ.setdefault('ZEUS_SPEECH_KEY', secrets.token_hex(32))
+        os.environ['ZEUS_MAX_UTTERANCE'] = str(args.max_utterance)
+        os.environ['ZEUS_CAPTURE_OVERFLOW'] = args.capture_overflow
+        if args.asr_model:
+            os.environ['ZEUS_VOSK_MODEL'] = args.asr_model
+        if args.updates_file or args.updates_stdin:
+            # As alterações são escritas uma só vez, neste processo; os
+            # processos de trabalho veem-nas pela base de dados (ver UpdateFeed)
+            feeder = EVChargingFinder(text_only=True)
+            if args.updates_file:
+                feeder.updates.follow_file(args.updates_file)
+            if args.updates_stdin:
+                feeder.updates.follow_stream(sys.stdin)
+        run_asgi_server(None, workers=args.workers)
+        sys.exit(0)
     
-    finder = EVChargingFinder()
+    finder = EVChargingFinder(streaming=args.streaming, asr=args.asr,
+                              asr_model=args.asr_model, asr_workers=args.asr_workers,
+                              text_only=args.text_only, warm_up=args.warm_up,
+                              max_utterance=args.max_utterance, capture_overflow=args.capture_overflow)
+    if args.updates_file:
+        finder.updates.follow_file(args.updates_file)
+    if args.updates_stdin:
+        finder.updates.follow_stream(sys.stdin)
     
     # Verificar argumentos de linha de comando
-    if len(sys.argv) > 1 and sys.argv[1] == '--console':
+    if args.console:
         print("🎤 Iniciando modo linha de comando...")
         finder.run(mode='console')
+    elif args.asgi:
+        finder.run(mode='asgi')
     else:
         print("🌐 Iniciando modo interface web...")
         print("💡 Para usar modo linha de comando: python3 ZEUS.py --console")
-        finder.run(mode='web')
\ No newline at end of file
+        print("💡 Para reconhecer enquanto fala: python3 ZEUS.py --streaming")
+        print("💡 Para reconhecimento local: python3 ZEUS.py --asr vosk --asr-model <pasta>")
+        print("💡 Para servidor assíncrono: python3 ZEUS.py --asgi [--workers N]")
+        print("💡 Para comandos escritos, sem áudio: python3 ZEUS.py --console --text-only")
+        finder.run(mode='web')
@@ -0,0 +1,451 @@
+"""Benchmarks do pipeline de pesquisa do ZEUS (totalmente offline).
+
+Gera catálogos sintéticos de carregadores (por omissão 1k, 100k e 1M) nas
+cidades conhecidas, importa-os com o importador do ZEUS e mede débito e
+percentis de latência de text_to_sql, execute_sql_query,
+get_charging_stations e find_best_charger sobre um corpus de comandos em
+português. Um servidor HTTP local recebe carga em /process, com o
+reconhecimento de voz e a síntese substituídos por versões simuladas.
+
+Os resultados ficam num ficheiro JSON, que pode ser comparado com o de
+outro commit:
+
+    python3 benchmarks/bench_zeus.py --sizes 1k,100k --output atual.json
+    python3 benchmarks/bench_zeus.py --sizes 1k,100k --compare anterior.json
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import http.client
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import ZEUS  # noqa: E402
+
+# Centro aproximado de cada cidade e peso relativo no catálogo
+CITY_CENTERS = {
+    'Lisboa': (38.7223, -9.1393, 6), 'Porto': (41.1579, -8.6291, 4),
+    'Matosinhos': (41.1820, -8.6890, 1), 'Coimbra': (40.2033, -8.4103, 2),
+    'Braga': (41.5454, -8.4265, 2), 'Aveiro': (40.6405, -8.6538, 1),
+    'Faro': (37.0194, -7.9322, 1), 'Évora': (38.5714, -7.9135, 1),
+    'Setúbal': (38.5244, -8.8882, 1), 'Leiria': (39.7436, -8.8071, 1),
+    'Viseu': (40.6566, -7.9125, 1),
+}
+# (potência em kW, peso, preço base em euros/kWh)
+POWER_CLASSES = ((7.4, 3, 0.20), (11, 3, 0.22), (22, 4, 0.25), (50, 3, 0.35),
+                 (100, 1, 0.42), (150, 2, 0.45), (350, 1, 0.55))
+STREETS = ('Rua', 'Avenida', 'Praça', 'Largo', 'Travessa', 'Estrada')
+STREET_NAMES = ('da Liberdade', 'da República', 'Central', 'do Mar', 'dos Combatentes',
+                'Dom Afonso Henriques', '25 de Abril', 'da Estação', 'do Comércio', 'Nova')
+POI_ADDRESSES = ('Centro Comercial {city}', 'Forum {city}', 'Universidade de {city} - Polo {n}',
+                 'Campus {n}', 'Aeroporto de {city}')
+
+COMMAND_TEMPLATES = (
+    'carregador mais barato em {city}',
+    'carregador mais rápido no {city}',
+    'melhor carregador em {city}',
+    '{city}',
+    'carregador de {kw} kW em {city}',
+    'carregador no centro comercial em {city}',
+    'carregador na universidade em {city}',
+    'carregador no aeroporto',
+    'quanto custa carregar {kwh} kWh em {city}',
+    'carregador barato perto da avenida da liberdade',
+)
+
+SIZE_SUFFIXES = {'k': 1000, 'm': 1000000}
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    if text[-1:] in SIZE_SUFFIXES:
+        return int(float(text[:-1]) * SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+
+def size_label(size):
+    if size >= 1000000 and size % 1000000 == 0:
+        return f'{size // 1000000}M'
+    if size >= 1000 and size % 1000 == 0:
+        return f'{size // 1000}k'
+    return str(size)
+
+
+def write_catalogue(path, size, seed):
+    """Catálogo CSV sintético e reprodutível (mesma semente, mesmo ficheiro)"""
+    rng = random.Random(seed)
+    cities = list(CITY_CENTERS)
+    city_weights = [CITY_CENTERS[city][2] for city in cities]
+    power_weights = [weight for _, weight, _ in POWER_CLASSES]
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(('id', 'location', 'address', 'price', 'power', 'available', 'latitude', 'longitude'))
+        for n in range(size):
+            city = rng.choices(cities, city_weights)[0]
+            lat, lon, _ = CITY_CENTERS[city]
+            power, _, base_price = rng.choices(POWER_CLASSES, power_weights)[0]
+            if rng.random() < 0.05:
+                address = rng.choice(POI_ADDRESSES).format(city=city, n=rng.randint(1, 5))
+            else:
+                address = f'{rng.choice(STREETS)} {rng.choice(STREET_NAMES)} {rng.randint(1, 999)}'
+            writer.writerow((
+                f'BENCH-{n:07d}', city, address,
+                round(base_price + rng.uniform(-0.05, 0.08), 3), power,
+                1 if rng.random() < 0.85 else 0,
+                round(lat + rng.gauss(0, 0.03), 6), round(lon + rng.gauss(0, 0.03), 6),
+            ))
+
+
+def command_corpus(count, seed):
+    """Corpus de comandos em português, com a mesma distribuição em cada execução"""
+    rng = random.Random(seed)
+    cities = list(CITY_CENTERS)
+    return [
+        rng.choice(COMMAND_TEMPLATES).format(city=rng.choice(cities), kw=rng.choice((22, 50, 150)),
+                                             kwh=rng.choice((20, 30, 40, 60)))
+        for _ in range(count)
+    ]
+
+
+def summarize(latencies, elapsed):
+    ordered = sorted(latencies)
+
+    def percentile(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 4)
+    return {
+        'count': len(ordered),
+        'ops_per_second': round(len(ordered) / elapsed, 1) if elapsed else None,
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 4),
+        'p50_ms': percentile(0.50),
+        'p90_ms': percentile(0.90),
+        'p99_ms': percentile(0.99),
+        'max_ms': round(ordered[-1] * 1000, 4),
+    }
+
+
+def measure(fn, items, before=None):
+    """Latência de fn(item) para cada item; before corre fora da medição"""
+    latencies = []
+    elapsed = 0.0
+    for item in items:
+        if before is not None:
+            before()
+        started = time.perf_counter()
+        fn(item)
+        latency = time.perf_counter() - started
+        latencies.append(latency)
+        elapsed += latency
+    return summarize(latencies, elapsed)
+
+
+class StubSpeechEngine:
+    """Motor de síntese simulado: não produz som nem usa dispositivos"""
+
+    def say(self, text):
+        pass
+
+    def save_to_file(self, text, path):
+        with open(path, 'wb') as f:
+            f.write(b'RIFF\x24\x00\x00\x00WAVEfmt ')
+
+    def runAndWait(self):
+        pass
+
+
+def create_finder():
+    """EVChargingFinder com reconhecimento e síntese simulados"""
+    finder = ZEUS.EVChargingFinder(asr='stub')
+    finder.tts.close()
+    finder.tts = ZEUS.TTSWorker(StubSpeechEngine)
+    # Nunca usar os comandos de sistema (say/aplay) durante as medições
+    finder.tts.say = None
+    finder.tts.player = None
+    return finder
+
+
+def bench_pipeline(finder, commands, cold_commands):
+    """Débito e latência de cada etapa do pipeline de pesquisa"""
+    cold = commands[:cold_commands]
+    plans = [finder.text_to_sql(command) for command in commands]
+    cities = list(CITY_CENTERS) * (len(commands) // len(CITY_CENTERS) + 1)
+    clear = finder.result_cache.clear
+    return {
+        'text_to_sql': measure(finder.text_to_sql, commands),
+        'execute_sql_query_cold': measure(lambda plan: finder.execute_sql_query(*plan), plans[:cold_commands],
+                                          before=clear),
+        'execute_sql_query_warm': measure(lambda plan: finder.execute_sql_query(*plan), plans),
+        'get_charging_stations': measure(finder.get_charging_stations, cities[:len(commands)]),
+        'find_best_charger_cold': measure(finder.find_best_charger, cold, before=clear),
+        'find_best_charger_warm': measure(finder.find_best_charger, commands),
+    }
+
+
+def bench_http(finder, commands, requests, concurrency):
+    """Carga HTTP em /process (texto) e /recognize + /process (voz simulada)"""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args):
+            pass
+
+    server = make_server('127.0.0.1', 0, finder.app, threaded=True, request_handler=QuietHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    port = server.server_port
+    audio = b'\x00\x01' * ZEUS.UPLOAD_SAMPLE_RATE
+
+    def post(path, body, content_type):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        try:
+            connection.request('POST', path, body, {'Content-Type': content_type})
+            response = connection.getresponse()
+            data = response.read()
+            if response.status != 200:
+                raise Exception(f'HTTP {response.status}')
+            return json.loads(data)
+        finally:
+            connection.close()
+
+    def process(command):
+        started = time.perf_counter()
+        post('/process', json.dumps({'command': command}), 'application/json')
+        return time.perf_counter() - started
+
+    def voice(command):
+        started = time.perf_counter()
+        result = post(f'/recognize?rate={ZEUS.UPLOAD_SAMPLE_RATE}', audio, 'audio/l16')
+        if not result.get('success'):
+            raise Exception(result.get('error'))
+        post('/process', json.dumps({'command': result['text']}), 'application/json')
+        return time.perf_counter() - started
+
+    results = {}
+    try:
+        for name, scenario in (('process', process), ('voice', voice)):
+            items = [commands[i % len(commands)] for i in range(requests)]
+            latencies = []
+            errors = 0
+            started = time.perf_counter()
+            with concurrent.futures.ThreadPoolExecutor(concurrency) as pool:
+                for job in [pool.submit(scenario, item) for item in items]:
+                    try:
+                        latencies.append(job.result())
+                    except Exception:
+                        errors += 1
+            elapsed = time.perf_counter() - started
+            results[name] = dict(summarize(latencies, elapsed) if latencies else {'count': 0},
+                                 errors=errors, concurrency=concurrency)
+    finally:
+        server.shutdown()
+    return results
+
+
+def apply_updates(finder, records):
+    """Envia alterações pelo feed e espera que sejam aplicadas"""
+    expected = finder.updates.stats()['applied'] + len(records)
+    finder.updates.submit(records)
+    deadline = time.monotonic() + 10
+    while finder.updates.stats()['applied'] < expected:
+        if time.monotonic() > deadline:
+            raise Exception('Alterações não aplicadas pelo feed')
+        time.sleep(0.01)
+
+
+def check_ranking(finder):
+    """Comandos cujo melhor resultado é um carregador ocupado havendo algum livre.
+
+    Em cada cidade o carregador mais barato passa (pelo feed) a ocupado e
+    ainda mais barato; no fim os valores originais são repostos.
+    """
+    if not ZEUS.numpy_available():
+        return []
+    failures = []
+    # Caso mínimo: o ocupado é muito mais barato que todos os livres
+    candidates = ZEUS.CandidateSet([
+        ('OCUPADO', 'Lisboa', 'Rua A 1', 0.10, 150, 0, 38.72, -9.14),
+        ('LIVRE-1', 'Lisboa', 'Rua B 2', 0.40, 22, 1, 38.73, -9.15),
+        ('LIVRE-2', 'Lisboa', 'Rua C 3', 0.45, 50, 1, 38.74, -9.16),
+    ])
+    for profile in ZEUS.RANKING_PROFILES:
+        best = ZEUS.rank_candidates(candidates, profile, origin=(38.72, -9.14), limit=1)
+        if not best[0]['available']:
+            failures.append(f'rank_candidates({profile})')
+
+    for city in CITY_CENTERS:
+        intent = finder.parse_intent(f'carregador mais barato em {city}')
+        candidates = finder.intent_candidates(intent)
+        if len(candidates) < 2:
+            continue
+        cheapest = candidates.stations[int(candidates.price.argmin())]
+        apply_updates(finder, [{'id': cheapest['id'], 'available': False,
+                                'price': round(max(cheapest['price'] - 0.10, 0.01), 3)}])
+        try:
+            for template in ('carregador mais barato em {city}', 'carregador mais rápido em {city}',
+                             'melhor carregador em {city}', 'carregador perto de {city}'):
+                command = template.format(city=city)
+                intent = finder.parse_intent(command)
+                best = finder.rank_intent(intent, limit=1)
+                if best and not best[0]['available'] and finder.intent_candidates(intent).available.any():
+                    failures.append(command)
+        finally:
+            apply_updates(finder, [{'id': cheapest['id'], 'available': cheapest['available'],
+                                    'price': cheapest['price']}])
+    return failures
+
+
+def run_size(size, args, commands):
+    """Gera (ou reutiliza) o catálogo de um tamanho e corre todas as medições"""
+    label = size_label(size)
+    workdir = os.path.join(args.workdir, f'catalogue-{label}')
+    os.makedirs(workdir, exist_ok=True)
+    previous_dir = os.getcwd()
+    # O ZEUS abre charging_stations.db no diretório atual
+    os.chdir(workdir)
+    try:
+        result = {'rows': size}
+        reuse = args.reuse and os.path.exists('charging_stations.db')
+        finder = create_finder()
+        if not reuse:
+            csv_path = os.path.join(workdir, 'catalogue.csv')
+            started = time.perf_counter()
+            write_catalogue(csv_path, size, args.seed)
+            result['generate_seconds'] = round(time.perf_counter() - started, 3)
+            result['import'] = finder.import_stations(csv_path)
+            os.remove(csv_path)
+        result['ranking_failures'] = check_ranking(finder)
+        print(f'📊 {label}: pipeline...', flush=True)
+        result['pipeline'] = bench_pipeline(finder, commands, args.cold_commands)
+        if args.http_requests:
+            print(f'📊 {label}: carga HTTP...', flush=True)
+            result['http'] = bench_http(finder, commands, args.http_requests, args.concurrency)
+        finder.updates.close()
+        finder.tts.close()
+        finder.db.close_all()
+        return result
+    finally:
+        os.chdir(previous_dir)
+
+
+def metadata(args):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    info = {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'sqlite': ZEUS.sqlite3.sqlite_version,
+        'numpy': None,
+        'seed': args.seed,
+        'commands': args.commands,
+        'cold_commands': args.cold_commands,
+        'http_requests': args.http_requests,
+        'concurrency': args.concurrency,
+    }
+    if ZEUS.numpy_available():
+        info['numpy'] = ZEUS.np.__version__
+    return info
+
+
+def compare(current, previous, threshold):
+    """Mostra a variação de p50 e débito face a uma execução anterior; devolve
+    o número de regressões acima do limiar"""
+    regressions = 0
+    for label, result in current['results'].items():
+        old_result = previous.get('results', {}).get(label)
+        if old_result is None:
+            continue
+        for group in ('pipeline', 'http'):
+            for name, stats in result.get(group, {}).items():
+                old = old_result.get(group, {}).get(name)
+                if not old or not old.get('p50_ms') or not stats.get('p50_ms'):
+                    continue
+                change = stats['p50_ms'] / old['p50_ms'] - 1
+                marker = '⚠️' if change > threshold else '  '
+                regressions += change > threshold
+                print(f"{marker} {label:>5} {name:<26} p50 {old['p50_ms']:>10.4f} -> {stats['p50_ms']:>10.4f} ms "
+                      f"({change:+.1%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do pipeline de pesquisa do ZEUS")
+    parser.add_argument('--sizes', default='1k,100k,1M', help="tamanhos dos catálogos (ex.: 1k,100k,1M)")
+    parser.add_argument('--commands', type=int, default=2000, help="comandos no corpus")
+    parser.add_argument('--cold-commands', type=int, default=200,
+                        help="comandos medidos com a cache de resultados vazia")
+    parser.add_argument('--http-requests', type=int, default=500,
+                        help="pedidos por cenário HTTP (0 desativa a carga HTTP)")
+    parser.add_argument('--concurrency', type=int, default=8, help="clientes HTTP em simultâneo")
+    parser.add_argument('--seed', type=int, default=20240601, help="semente dos dados sintéticos")
+    parser.add_argument('--workdir', help="diretório dos catálogos (por omissão, temporário)")
+    parser.add_argument('--reuse', action='store_true',
+                        help="reutilizar catálogos já importados no --workdir")
+    parser.add_argument('--output', default='bench_results.json', help="ficheiro JSON dos resultados")
+    parser.add_argument('--compare', metavar='JSON', help="resultados anteriores para comparar")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="aumento relativo do p50 considerado regressão")
+    parser.add_argument('--fail-on-regression', action='store_true',
+                        help="terminar com erro se houver regressões (com --compare)")
+    args = parser.parse_args()
+
+    ZEUS.setup_logging('WARNING')
+    temporary = args.workdir is None
+    if temporary:
+        args.workdir = tempfile.mkdtemp(prefix='zeus-bench-')
+    args.workdir = os.path.abspath(args.workdir)
+    output = os.path.abspath(args.output)
+    commands = command_corpus(args.commands, args.seed)
+
+    report = {'meta': metadata(args), 'results': {}}
+    try:
+        for size in [parse_size(size) for size in args.sizes.split(',')]:
+            print(f'🏗️ Catálogo de {size_label(size)} carregadores', flush=True)
+            report['results'][size_label(size)] = run_size(size, args, commands)
+    finally:
+        if temporary:
+            shutil.rmtree(args.workdir, ignore_errors=True)
+
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f'💾 Resultados em {output}')
+
+    for label, result in report['results'].items():
+        for group in ('pipeline', 'http'):
+            for name, stats in result.get(group, {}).items():
+                if stats.get('count'):
+                    print(f"{label:>5} {name:<26} {stats['ops_per_second']:>10} op/s  "
+                          f"p50 {stats['p50_ms']:>9.3f} ms  p99 {stats['p99_ms']:>9.3f} ms")
+
+    failures = [(label, command) for label, result in report['results'].items()
+                for command in result.get('ranking_failures', ())]
+    for label, command in failures:
+        print(f"❌ {label}: '{command}' escolheu um carregador ocupado havendo livres")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,10 +5,60 @@ CREATE TABLE IF NOT EXISTS charging_stations (
     address VARCHAR(200) NOT NULL,
     price DECIMAL(10,2) NOT NULL,
     power INTEGER NOT NULL,
-    available BOOLEAN NOT NULL DEFAULT true
+    available BOOLEAN NOT NULL DEFAULT true,
+    -- Localização normalizada (minúsculas, sem acentos) para pesquisas indexadas
+    location_norm TEXT GENERATED ALWAYS AS (LOWER(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(location, 'á', 'a'), 'Á', 'a'), 'à', 'a'), 'À', 'a'), 'â', 'a'), 'Â', 'a'), 'ã', 'a'), 'Ã', 'a'), 'é', 'e'), 'É', 'e'), 'ê', 'e'), 'Ê', 'e'), 'í', 'i'), 'Í', 'i'), 'ó', 'o'), 'Ó', 'o'), 'ô', 'o'), 'Ô', 'o'), 'õ', 'o'), 'Õ', 'o'), 'ú', 'u'), 'Ú', 'u'), 'ü', 'u'), 'Ü', 'u'), 'ç', 'c'), 'Ç', 'c'))) VIRTUAL,
+    -- Endereço normalizado, indexado pelo FTS5
+    address_norm TEXT GENERATED ALWAYS AS (LOWER(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(address, 'á', 'a'), 'Á', 'a'), 'à', 'a'), 'À', 'a'), 'â', 'a'), 'Â', 'a'), 'ã', 'a'), 'Ã', 'a'), 'é', 'e'), 'É', 'e'), 'ê', 'e'), 'Ê', 'e'), 'í', 'i'), 'Í', 'i'), 'ó', 'o'), 'Ó', 'o'), 'ô', 'o'), 'Ô', 'o'), 'õ', 'o'), 'Õ', 'o'), 'ú', 'u'), 'Ú', 'u'), 'ü', 'u'), 'Ü', 'u'), 'ç', 'c'), 'Ç', 'c'))) VIRTUAL,
+    -- Coordenadas (graus decimais), indexadas pelo R*Tree
+    latitude REAL,
+    longitude REAL
 );
 
+-- Índices para as intenções mais comuns
+CREATE INDEX IF NOT EXISTS idx_stations_location_price ON charging_stations (location_norm, price);
+CREATE INDEX IF NOT EXISTS idx_stations_location_power ON charging_stations (location_norm, power DESC);
+CREATE INDEX IF NOT EXISTS idx_stations_available ON charging_stations (location_norm, price) WHERE available = 1;
+CREATE INDEX IF NOT EXISTS idx_stations_price ON charging_stations (price);
+CREATE INDEX IF NOT EXISTS idx_stations_power ON charging_stations (power DESC);
+
+-- Índice de texto integral dos endereços (mantido pelos triggers)
+CREATE VIRTUAL TABLE IF NOT EXISTS stations_fts USING fts5(
+    address_norm, content='charging_stations', content_rowid='rowid', tokenize='trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS stations_fts_insert AFTER INSERT ON charging_stations BEGIN
+    INSERT INTO stations_fts (rowid, address_norm) VALUES (new.rowid, new.address_norm);
+END;
+
+CREATE TRIGGER IF NOT EXISTS stations_fts_delete AFTER DELETE ON charging_stations BEGIN
+    INSERT INTO stations_fts (stations_fts, rowid, address_norm) VALUES ('delete', old.rowid, old.address_norm);
+END;
+
+CREATE TRIGGER IF NOT EXISTS stations_fts_update AFTER UPDATE OF address ON charging_stations BEGIN
+    INSERT INTO stations_fts (stations_fts, rowid, address_norm) VALUES ('delete', old.rowid, old.address_norm);
+    INSERT INTO stations_fts (rowid, address_norm) VALUES (new.rowid, new.address_norm);
+END;
+
+-- Índice espacial (mantido pelos triggers)
+CREATE VIRTUAL TABLE IF NOT EXISTS stations_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon);
+
+CREATE TRIGGER IF NOT EXISTS stations_rtree_insert AFTER INSERT ON charging_stations
+WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL BEGIN
+    INSERT OR REPLACE INTO stations_rtree VALUES (new.rowid, new.latitude, new.latitude, new.longitude, new.longitude);
+END;
+
+CREATE TRIGGER IF NOT EXISTS stations_rtree_delete AFTER DELETE ON charging_stations BEGIN
+    DELETE FROM stations_rtree WHERE id = old.rowid;
+END;
+
+CREATE TRIGGER IF NOT EXISTS stations_rtree_update AFTER UPDATE OF latitude, longitude ON charging_stations BEGIN
+    DELETE FROM stations_rtree WHERE id = old.rowid;
+    INSERT INTO stations_rtree SELECT new.rowid, new.latitude, new.latitude, new.longitude, new.longitude
+    WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+END;
+
 -- Inserir dados dos carregadores
-INSERT INTO charging_stations (id, location, address, price, power, available) VALUES
-('1', 'Matosinhos', 'Rua do Mar 123', 0.35, 50, true),
-('2', 'Matosinhos', 'Avenida da Praia 456', 0.40, 150, true);
\ No newline at end of file
+INSERT INTO charging_stations (id, location, address, price, power, available, latitude, longitude) VALUES
+('1', 'Matosinhos', 'Rua do Mar 123', 0.35, 50, true, 41.1820, -8.6900),
+('2', 'Matosinhos', 'Avenida da Praia 456', 0.40, 150, true, 41.1760, -8.6910);
\ No newline at end of file
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ZEUS  # noqa: E402
+
+
+@pytest.fixture
+def finder(tmp_path, monkeypatch):
+    """EVChargingFinder só de texto sobre uma base de dados nova (dados de exemplo)"""
+    monkeypatch.chdir(tmp_path)
+    finder = ZEUS.EVChargingFinder(text_only=True)
+    yield finder
+    finder.updates.close()
+    finder.db.close_all()
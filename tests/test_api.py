@@ -0,0 +1,53 @@
+import pytest
+
+
+@pytest.fixture
+def client(finder):
+    return finder.app.test_client()
+
+
+@pytest.mark.parametrize('path', ['/api/query', '/process'])
+def test_non_string_command_is_a_bad_request(client, path):
+    response = client.post(path, json={'command': 5})
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def test_batch_rejects_non_string_commands(client):
+    response = client.post('/api/query/batch', json={'commands': ['carregador em lisboa', 5]})
+    assert response.status_code == 400
+
+
+def test_batch_reports_errors_per_command(client):
+    commands = ['carregador em lisboa', 'quanto custa carregar de 90% a 20% em lisboa', 'carregador no porto']
+    response = client.post('/api/query/batch', json={'commands': commands})
+    data = response.get_json()
+    assert response.status_code == 200 and data['success']
+    assert [result['command'] for result in data['results']] == commands
+    assert 'error' not in data['results'][0] and 'error' not in data['results'][2]
+    assert data['results'][1]['error'].startswith('Carregamento impossível')
+
+
+@pytest.mark.parametrize('query', [
+    'lat=38.72&lon=-9.14&k=-2',
+    'lat=38.72&lon=-9.14&k=0',
+    'lat=38.72&lon=-9.14&k=100000',
+    'lat=38.72&lon=-9.14&k=2.5',
+    'lat=nan&lon=-9.14',
+    'lat=38.72&lon=inf',
+    'lat=91&lon=-9.14',
+    'lat=38.72&lon=-181',
+    'lat=38.72',
+    'lat=abc&lon=-9.14',
+])
+def test_nearest_rejects_invalid_parameters(client, query):
+    response = client.get(f'/nearest?{query}')
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def test_nearest(client):
+    data = client.get('/nearest?lat=38.72&lon=-9.14&k=3').get_json()
+    assert data['success'] and len(data['chargers']) == 3
+    distances = [charger['distance_km'] for charger in data['chargers']]
+    assert distances == sorted(distances)
@@ -0,0 +1,102 @@
+import io
+import time
+import types
+
+import pytest
+
+import ZEUS
+
+
+class FakeBackend:
+    incremental = False
+
+    def recognize(self, audio):
+        return 'carregador em lisboa'
+
+
+@pytest.fixture
+def uploads():
+    """recognize_upload sobre um conjunto de 2 buffers, sem motor de reconhecimento real"""
+    pool = ZEUS.PCMBufferPool(2, 16000)
+    sessions = ZEUS.SessionManager(upload_idle_timeout=0.05, reap_interval=3600)
+    finder = types.SimpleNamespace(upload_buffers=pool, recognizer_backend=FakeBackend(),
+                                   sessions=sessions, count_recognition_failure=lambda error: None)
+
+    def send(session, final=False):
+        body = io.BytesIO(b'\0' * 320)
+        return ZEUS.EVChargingFinder.recognize_upload(finder, session, body, 16000, final)
+    return pool, sessions, send
+
+
+def test_abandoned_uploads_are_reclaimed_when_the_pool_is_empty(uploads):
+    pool, sessions, send = uploads
+    abandoned = [sessions.create() for _ in range(2)]
+    for session in abandoned:
+        send(session)
+    assert pool.available() == 0
+    session = sessions.create()
+    with pytest.raises(Exception, match='Servidor ocupado'):
+        send(session)
+    time.sleep(0.1)
+    send(session)
+    assert pool.available() == 1
+    assert sessions.stats()['uploads_expired'] == 2
+    # O cliente que desistiu é avisado uma vez e pode recomeçar
+    with pytest.raises(Exception, match='expirado'):
+        send(abandoned[0])
+    send(abandoned[0])
+    assert pool.available() == 0
+
+
+def test_active_upload_is_kept(uploads, monkeypatch):
+    pool, sessions, send = uploads
+    # Silêncio: não deixar a deteção de fala cortar tudo
+    monkeypatch.setattr(ZEUS, 'speech_bounds', lambda frames, sample_rate: (0, len(frames)))
+    session = sessions.create()
+    send(session)
+    assert sessions.expire_uploads() == 0
+    assert send(session, final=True) == 'carregador em lisboa'
+    assert pool.available() == 2
+
+
+def test_capture_buffer_keeps_order_without_wrapping():
+    buffer = ZEUS.CaptureBuffer(8)
+    assert buffer.write(b'abc') and buffer.write(b'def')
+    assert bytes(buffer.contents()) == b'abcdef'
+    assert buffer.dropped == 0
+
+
+@pytest.mark.parametrize('chunks, expected, dropped', [
+    ([b'abcdef', b'ghij'], b'cdefghij', 2),
+    ([b'abcdefgh', b'ij', b'kl'], b'efghijkl', 4),
+    ([b'abc', b'defghijklmnopqrs'], b'lmnopqrs', 11),
+    ([b'abcdefg', b'hi', b'jklmnopqrstu'], b'nopqrstu', 13),
+])
+def test_capture_buffer_drop_oldest_wraps_in_order(chunks, expected, dropped):
+    buffer = ZEUS.CaptureBuffer(8, 'drop_oldest')
+    for chunk in chunks:
+        assert buffer.write(chunk)
+    assert bytes(buffer.contents()) == expected
+    assert buffer.dropped == dropped
+    # contents() põe o anel por ordem: pode ser pedido de novo e continuar a escrever
+    assert bytes(buffer.contents()) == expected
+    buffer.write(b'vw')
+    assert bytes(buffer.contents()) == expected[2:] + b'vw'
+
+
+def test_capture_buffer_stop_and_error_policies():
+    stop = ZEUS.CaptureBuffer(4, 'stop')
+    assert not stop.write(b'abcdef')
+    assert bytes(stop.contents()) == b'abcd' and stop.dropped == 2
+    error = ZEUS.CaptureBuffer(4, 'error')
+    error.write(b'abc')
+    with pytest.raises(BufferError):
+        error.write(b'de')
+
+
+def test_capture_buffer_reset():
+    buffer = ZEUS.CaptureBuffer(4, 'drop_oldest')
+    buffer.write(b'abcdef')
+    buffer.reset()
+    buffer.write(b'xy')
+    assert bytes(buffer.contents()) == b'xy' and buffer.dropped == 0
@@ -0,0 +1,95 @@
+import io
+import json
+
+import pytest
+
+import ZEUS
+from ZEUS import iter_json_records
+
+
+def records(count, start=0):
+    return [{'id': f'T-{i}', 'location': 'Lisboa', 'address': f'Rua {i}', 'price': 0.3, 'power': 22}
+            for i in range(start, start + count)]
+
+
+@pytest.fixture
+def small_reads(monkeypatch):
+    monkeypatch.setattr(ZEUS, 'IMPORT_READ_SIZE', 64)
+    monkeypatch.setattr(ZEUS, 'IMPORT_MAX_RECORD_BYTES', 256)
+
+
+def test_json_array(small_reads):
+    data = records(20)
+    assert list(iter_json_records(io.StringIO(json.dumps(data)))) == data
+
+
+def test_malformed_record_is_skipped(small_reads):
+    good = ', '.join(json.dumps(record) for record in records(50))
+    bad = '{"id": "MAU", "price": 0.3 "power": 22}'
+    text = f'[{good}, {bad}, {good}]'
+    result = list(iter_json_records(io.StringIO(text)))
+    assert len(result) == 101
+    assert isinstance(result[50], ValueError)
+    assert result[:50] == result[51:] == records(50)
+
+
+def test_malformed_record_does_not_buffer_the_rest_of_the_file(small_reads):
+    bad = '{"id": "MAU", "price": 0.3 "power": 22}'
+    tail = ', '.join(json.dumps(record) for record in records(1000))
+    f = io.StringIO(f'[{bad}, {tail}]')
+    first = next(iter_json_records(f))
+    assert isinstance(first, ValueError)
+    assert f.tell() < 1024
+
+
+def test_malformed_last_record(small_reads):
+    result = list(iter_json_records(io.StringIO('[{"id": "A"}, {"id": }]')))
+    assert result[0] == {'id': 'A'} and isinstance(result[1], ValueError)
+
+
+def test_truncated_array(small_reads):
+    with pytest.raises(ValueError, match='incompleto'):
+        list(iter_json_records(io.StringIO('[{"id": "A"}, {"id": "B"')))
+
+
+def test_import_counts_malformed_records_as_rejected(finder, tmp_path):
+    good = ', '.join(json.dumps(record) for record in records(3))
+    path = tmp_path / 'catalogo.json'
+    path.write_text(f'[{good}, {{"id": "MAU", "price": }}, {json.dumps(records(1, 3)[0])}]', encoding='utf-8')
+    result = finder.import_stations(str(path))
+    assert result['imported'] == 4
+    assert result['rejected'] == 1
+
+
+def write_catalog(path, data):
+    path.write_text(json.dumps(data), encoding='utf-8')
+    return str(path)
+
+
+def test_import_upserts_and_skips_unchanged_rows(finder, tmp_path):
+    data = records(5)
+    path = write_catalog(tmp_path / 'catalogo.json', data)
+    first = finder.import_stations(path)
+    assert (first['imported'], first['changed'], first['rejected']) == (5, 5, 0)
+    assert finder.station_index.get_by_id('T-0')['price'] == 0.3
+
+    # Reimportar o mesmo catálogo não reescreve nada
+    again = finder.import_stations(path)
+    assert (again['imported'], again['changed']) == (5, 0)
+
+    # Só a linha alterada e a nova contam; o resto fica como estava
+    data[2]['price'] = 0.45
+    path = write_catalog(tmp_path / 'catalogo.json', data + records(1, 5))
+    update = finder.import_stations(path)
+    assert (update['imported'], update['changed']) == (6, 2)
+    assert finder.station_index.get_by_id('T-2')['price'] == 0.45
+    assert finder.station_index.get_by_id('T-5') is not None
+
+
+def test_no_op_import_keeps_the_cache(finder, tmp_path):
+    path = write_catalog(tmp_path / 'catalogo.json', records(3))
+    finder.import_stations(path)
+    finder.intent_candidates(finder.parse_intent('carregador em lisboa'))
+    invalidations = finder.result_cache.stats()['invalidations']
+    finder.import_stations(path)
+    assert finder.result_cache.stats()['invalidations'] == invalidations
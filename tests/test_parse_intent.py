@@ -0,0 +1,50 @@
+import pytest
+
+from ZEUS import parse_intent
+
+
+@pytest.mark.parametrize('command, city', [
+    ('carregador em lisboa', 'Lisboa'),
+    ('carregador mais barato no porto', 'Porto'),
+    ('porto', 'Porto'),
+    ('carregador em braga de 50 kw', 'Braga'),
+    ('carregador na rua do carmo em lisboa', 'Lisboa'),
+    ('carregador em sintra', 'sintra'),
+])
+def test_city(command, city):
+    assert parse_intent(command).city == city
+
+
+@pytest.mark.parametrize('command', [
+    'carregador de 150kw',
+    'carregador de 150 kw',
+    'carregador barato perto da avenida da liberdade',
+    'carregador no centro de saúde',
+    'carregador no centro comercial',
+])
+def test_no_city_from_units_nouns_or_features(command):
+    assert parse_intent(command).city is None
+
+
+def test_power_is_not_a_place():
+    intent = parse_intent('carregador de 150kw')
+    assert intent.min_kw == 150
+    assert intent.city is None
+
+
+def test_shopping_poi():
+    assert parse_intent('carregador no centro comercial').poi == 'shopping'
+    assert parse_intent('carregador no centro de saúde').poi is None
+
+
+def test_superlatives():
+    cheap = parse_intent('carregador mais barato em lisboa')
+    assert (cheap.sort, cheap.limit, cheap.profile) == ('price', 1, 'cheap')
+    fast = parse_intent('carregador mais rápido no porto')
+    assert (fast.sort, fast.limit, fast.profile) == ('power', 1, 'fast')
+
+
+def test_charge_request():
+    intent = parse_intent('carregar de 20% para 80% em coimbra')
+    assert intent.city == 'Coimbra'
+    assert (intent.charge.soc, intent.charge.target_soc) == (20.0, 80.0)
@@ -0,0 +1,57 @@
+import pytest
+
+import ZEUS
+from ZEUS import CandidateSet, parse_intent, rank_candidates, superlative_key
+
+pytestmark = pytest.mark.skipif(not ZEUS.numpy_available(), reason='requer NumPy')
+
+# A: o mais barato; B: quase tão barato e muito mais rápido; C: caro e lento
+STATIONS = [
+    ('A', 'Lisboa', 'Rua A 1', 0.30, 22, 1, 38.72, -9.14),
+    ('B', 'Lisboa', 'Rua B 2', 0.31, 150, 1, 38.73, -9.15),
+    ('C', 'Lisboa', 'Rua C 3', 0.50, 22, 1, 38.74, -9.16),
+]
+
+
+def ids(ranked):
+    return [station['id'] for station in ranked]
+
+
+def test_cheapest_superlative_ranks_by_price():
+    intent = parse_intent('carregador mais barato em lisboa')
+    assert superlative_key(intent) == 'price'
+    ranked = rank_candidates(CandidateSet(STATIONS), intent.profile, limit=3, primary=superlative_key(intent))
+    assert ids(ranked) == ['A', 'B', 'C']
+
+
+def test_fastest_superlative_ranks_by_power():
+    intent = parse_intent('carregador mais rápido em lisboa')
+    assert superlative_key(intent) == 'power'
+    ranked = rank_candidates(CandidateSet(STATIONS), intent.profile, limit=1, primary=superlative_key(intent))
+    assert ids(ranked) == ['B']
+
+
+def test_score_breaks_ties_on_primary_key():
+    # Mesmo preço: desempata a pontuação (mais potência)
+    stations = [('A', 'Lisboa', 'Rua A 1', 0.30, 22, 1, 38.72, -9.14),
+                ('B', 'Lisboa', 'Rua B 2', 0.30, 150, 1, 38.73, -9.15)]
+    assert ids(rank_candidates(CandidateSet(stations), 'cheap', limit=2, primary='price')) == ['B', 'A']
+
+
+def test_non_superlatives_use_the_weighted_score():
+    assert superlative_key(parse_intent('melhor carregador em lisboa')) is None
+    assert superlative_key(parse_intent('carregador de 50 kw em lisboa')) is None
+    assert superlative_key(parse_intent('carregador em lisboa')) is None
+
+
+@pytest.mark.parametrize('primary', [None, 'price', 'power'])
+@pytest.mark.parametrize('profile', sorted(ZEUS.RANKING_PROFILES))
+def test_free_before_occupied(profile, primary):
+    stations = [('OCUPADO', 'Lisboa', 'Rua A 1', 0.10, 350, 0, 38.72, -9.14),
+                ('LIVRE', 'Lisboa', 'Rua B 2', 0.40, 22, 1, 38.73, -9.15)]
+    ranked = rank_candidates(CandidateSet(stations), profile, origin=(38.72, -9.14), limit=2, primary=primary)
+    assert ids(ranked) == ['LIVRE', 'OCUPADO']
+
+
+def test_empty_candidates():
+    assert rank_candidates(CandidateSet([]), 'balanced') == []
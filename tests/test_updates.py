@@ -0,0 +1,52 @@
+import time
+
+
+def wait_applied(finder, count, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while finder.updates.stats()['applied'] < count:
+        assert time.monotonic() < deadline, 'alterações não aplicadas a tempo'
+        time.sleep(0.01)
+
+
+def cached_plans(finder):
+    return {key for key in finder.result_cache.entries if key[0] == 'candidates'}
+
+
+def test_update_invalidates_only_the_affected_city(finder):
+    lisboa = finder.parse_intent('carregador em lisboa')
+    porto = finder.parse_intent('carregador no porto')
+    finder.intent_candidates(lisboa)
+    finder.intent_candidates(porto)
+    before = cached_plans(finder)
+    assert len(before) == 2
+
+    station = finder.station_index.get_by_location('Lisboa')[0]
+    assert finder.updates.submit([{'id': station['id'], 'price': station['price'] + 0.5}]) == (1, 0)
+    wait_applied(finder, 1)
+
+    after = cached_plans(finder)
+    assert len(after) == 1
+    assert finder.result_cache.stats()['invalidations'] == 0
+    assert finder.station_index.get_by_id(station['id'])['price'] == station['price'] + 0.5
+    # A cidade alterada é lida de novo; a outra continua em cache
+    assert station['price'] + 0.5 in finder.intent_candidates(lisboa).price
+    hits = finder.result_cache.stats()['hits']
+    finder.intent_candidates(porto)
+    assert finder.result_cache.stats()['hits'] == hits + 1
+
+
+def test_no_op_update_keeps_the_cache(finder):
+    lisboa = finder.parse_intent('carregador em lisboa')
+    finder.intent_candidates(lisboa)
+    station = finder.station_index.get_by_location('Lisboa')[0]
+    finder.updates.submit([{'id': station['id'], 'price': station['price'], 'available': station['available']},
+                           {'id': 'NAO-EXISTE', 'price': 0.1}])
+    wait_applied(finder, 2)
+    stats = finder.updates.stats()
+    assert stats['changed'] == 0 and stats['unknown'] == 1
+    assert len(cached_plans(finder)) == 1
+
+
+def test_invalid_updates_are_rejected(finder):
+    assert finder.updates.submit([{'price': 0.3}, {'id': 'X', 'price': 'caro'}]) == (0, 2)
+    assert finder.updates.stats()['rejected'] == 2